@@ -1,13 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
+from db_worker import get_worker, deliver
+from money import to_piasters, from_piasters
 from utils import ColorManager
 from datetime import datetime, timedelta
 
+# الجداول التي تعرض قائمة الحسابات بياناتها (بصمة Database.fingerprint)
+ACCOUNTS_TABLES = ('sellers_accounts', 'seller_transactions')
+
 class AccountsPage:
-    def __init__(self, parent_window):
+    # آخر أرصدة محملة لكل قاعدة بيانات: {db: (البصمة، الحسابات)}
+    # فتح الصفحة مرة أخرى بدون تعديل لا يعيد القراءة
+    _loaded = {}
+
+    def __init__(self, parent_window, db=None):
         self.parent = parent_window
-        self.db = Database()
+        self.db = db or get_database()
         
         # الألوان الجديدة المطلوبة
         self.colors = {
@@ -155,6 +164,9 @@ class AccountsPage:
         self.all_accounts = [] # لتخزين كل البيانات للبحث
         self.load_data()
         
+        # عند الرجوع للنافذة (بعد كشف حساب أو تحصيل) تحدث القائمة إذا تغيرت البيانات فقط
+        self.window.bind('<FocusIn>', lambda e: self.load_data())
+        
         # أزرار أسفل الجدول (في المنتصف)
         bottom_buttons_style = {
             'font': ('Playpen Sans Arabic', 14, 'bold'),
@@ -199,10 +211,18 @@ class AccountsPage:
         self.filter_data(query)
 
     def load_data(self):
-        """تحميل البيانات من قاعدة البيانات"""
-        # استخدام الدالة الجديدة لجلب الأرصدة المحسوبة
-        self.all_accounts = self.db.get_sellers_with_balances()
-        self.filter_data("")
+        """تحميل البيانات من قاعدة البيانات (إذا تغيرت منذ آخر تحميل)"""
+        fingerprint = self.db.fingerprint(ACCOUNTS_TABLES)
+        loaded = AccountsPage._loaded.get(self.db)
+        if loaded is not None and loaded[0] == fingerprint:
+            if self.all_accounts is loaded[1]:
+                return  # المعروض هو نفس البيانات
+            self.all_accounts = loaded[1]
+        else:
+            # استخدام الدالة الجديدة لجلب الأرصدة المحسوبة
+            self.all_accounts = self.db.get_sellers_with_balances()
+            AccountsPage._loaded[self.db] = (fingerprint, self.all_accounts)
+        self.filter_data(self.search_var.get().strip().lower())
 
     def filter_data(self, query):
         """عرض البيانات المصفاة"""
@@ -217,12 +237,13 @@ class AccountsPage:
                     del row_entries[0].seller_name
 
         # تصفية البيانات
-        filtered_accounts = []
-        for acc in self.all_accounts:
-            # acc: id, seller_name, calculated_remaining, calculated_allowance, phone
-            name = acc[1]
-            if query in name.lower():
-                filtered_accounts.append(acc)
+        if query:
+            # البحث من فهرس search_index (أحمد = احمد، فاطمة = فاطمه، مصطفى = مصطفي)
+            matches = self.db.search(query, kinds=('seller',), limit=len(self.all_accounts))
+            matched_ids = {match.ref_id for match in matches}
+            filtered_accounts = [acc for acc in self.all_accounts if acc.id in matched_ids]
+        else:
+            filtered_accounts = self.all_accounts
         
         # ملء الجدول
         for i, account in enumerate(filtered_accounts):
@@ -307,12 +328,12 @@ class AccountsPage:
             messagebox.showwarning("تنبيه", "الرجاء تحديد بائع من الجدول أولاً")
             return
             
-        CurrentAccountPage(self.window, self.selected_account_id, self.selected_seller_name, self.colors)
+        CurrentAccountPage(self.window, self.selected_account_id, self.selected_seller_name, self.colors, db=self.db)
     
     def open_review_modify(self):
         """فتح صفحة برنامج البائعين (مراجعة وتعديل)"""
         from sellers_page import SellersPage
-        SellersPage(self.window)
+        SellersPage(self.window, db=self.db)
     
     def open_customer_income(self):
         messagebox.showinfo("وارد العملاء", "سيتم تطوير شاشة وارد العملاء لاحقاً.")
@@ -358,36 +379,17 @@ class AccountsPage:
         row_idx = 1
         
         overdue_sellers = []
-        today = datetime.now()
+        # من مر على آخر دفعة له (أو آخر معاملة إن لم يدفع أبداً) أسبوع أو أكثر
+        overdue_ids = set(self.db.get_overdue_seller_ids(datetime.now(), days=7))
         
         for seller in sellers:
-            # seller: id, name, remaining, allowance, phone
-            s_id = seller[0]
+            # seller: id, name, remaining, allowance, phone, last_payment_date, last_transaction_date
             name = seller[1]
             remaining = seller[2]
             
             if remaining > 0: # فقط من عليهم مبالغ (مدينون)
                 # التحقق من المتأخرات (مرور أسبوع دون دفع)
-                last_payment_date_str = self.db.get_last_payment_date(s_id)
-                is_overdue = False
-                
-                if last_payment_date_str:
-                    try:
-                        last_payment = datetime.strptime(last_payment_date_str, "%Y-%m-%d")
-                        if (today - last_payment).days >= 7:
-                            is_overdue = True
-                    except ValueError:
-                        pass
-                else:
-                    # لم يدفع أبداً، نتحقق من تاريخ آخر معاملة (بداية الدين)
-                    last_trans_date_str = self.db.get_last_transaction_date(s_id)
-                    if last_trans_date_str:
-                        try:
-                            last_trans = datetime.strptime(last_trans_date_str, "%Y-%m-%d")
-                            if (today - last_trans).days >= 7:
-                                is_overdue = True
-                        except ValueError:
-                            pass
+                is_overdue = seller.id in overdue_ids
                 
                 if is_overdue:
                     overdue_sellers.append(f"- {name}: {remaining:.2f}")
@@ -545,11 +547,11 @@ class AccountDialog:
 
 
 class CurrentAccountPage:
-    def __init__(self, parent, seller_id, seller_name, colors):
+    def __init__(self, parent, seller_id, seller_name, colors, db=None):
         self.seller_id = seller_id
         self.seller_name = seller_name
         self.colors = colors
-        self.db = Database()
+        self.db = db or get_database()
         
         # جلب الرصيد السابق (من جدول الحسابات الرئيسي)
         self.account_data = self.get_account_data()
@@ -672,12 +674,7 @@ class CurrentAccountPage:
 
     def get_account_data(self):
         """جلب بيانات الحساب الرئيسي للبائع"""
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, seller_name, remaining_amount, total_credit FROM sellers_accounts WHERE id = ?', (self.seller_id,))
-        res = cursor.fetchone()
-        conn.close()
-        return res
+        return self.db.get_seller_account(self.seller_id)
 
     def _on_canvas_configure(self, event):
         """تحديث عرض الإطار الداخلي ليطابق عرض الـ Canvas"""
@@ -937,11 +934,12 @@ class CurrentAccountPage:
 
         # حساب المبلغ الإجمالي المدفوع حالياً (بدون السماح)
         transactions = self.db.get_seller_transactions(self.seller_id)
-        current_total_paid = 0.0
+        current_total_paid = 0
         for trans in transactions:
             # trans: id, amount, status, count, weight, price, item_name, date, day_name, equipment, note
             if trans[2] == "مدفوع" and trans[6] != "سماح":  # status == مدفوع AND item_name != سماح
-                current_total_paid += trans[1]  # amount
+                current_total_paid += to_piasters(trans[1])  # amount
+        current_total_paid = from_piasters(current_total_paid)
 
         # إطار رئيسي
         main_frame = tk.Frame(dialog, bg=bg_color)
@@ -1305,53 +1303,23 @@ class CurrentAccountPage:
                 start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
                 end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
                 
-                # جلب جميع المعاملات من قاعدة البيانات
-                all_transactions = self.db.get_seller_transactions(self.seller_id)
-                # transactions: id, amount, status, count, weight, price, item_name, date, day_name, equipment, note
-                
-                filtered_transactions = []
+                # جلب معاملات الفترة فقط (بحث في الفهرس برقم اليوم)
+                period_transactions = self.db.get_seller_transactions_between(self.seller_id, start_date, end_date)
                 
-                # تصفية المعاملات
-                for trans in all_transactions:
-                    trans_date_str = trans[7]
-                    try:
-                        trans_date = datetime.strptime(trans_date_str, "%Y-%m-%d")
-                        if start_date <= trans_date <= end_date:
-                            # تحويل البيانات للشكل المطلوب للطباعة
-                            # (item_name, weight, count, price, amount, status)
-                            item_name = trans[6]
-                            weight = trans[4]
-                            count = trans[3]
-                            price = trans[5]
-                            amount = trans[1]
-                            status = trans[2]
-                            
-                            filtered_transactions.append((item_name, weight, count, price, amount, status))
-                            
-                    except ValueError:
-                        continue
+                # تحويل البيانات للشكل المطلوب للطباعة
+                # (item_name, weight, count, price, amount, status)
+                filtered_transactions = [
+                    (t.item_name, t.weight, t.count, t.price, t.amount, t.status)
+                    for t in period_transactions
+                ]
                 
-                # حساب الإجماليات للفترة
-                total_goods = sum(t[4] for t in filtered_transactions if t[5] != "مدفوع" and t[5] != "سماح")
-                total_paid = sum(t[4] for t in filtered_transactions if t[5] == "مدفوع")
-                total_discount = sum(t[4] for t in filtered_transactions if t[5] == "سماح")
+                # حساب الإجماليات للفترة (بالقرش)
+                total_goods = sum(to_piasters(t[4]) for t in filtered_transactions if t[5] != "مدفوع" and t[5] != "سماح")
+                total_paid = sum(to_piasters(t[4]) for t in filtered_transactions if t[5] == "مدفوع")
+                total_discount = sum(to_piasters(t[4]) for t in filtered_transactions if t[5] == "سماح")
                 
                 # حساب الرصيد السابق (قبل الفترة المحددة)
-                balance_before_period = self.old_balance
-                
-                for trans in all_transactions:
-                    trans_date_str = trans[7]
-                    try:
-                        trans_date = datetime.strptime(trans_date_str, "%Y-%m-%d")
-                        if trans_date < start_date:
-                            t_amount = trans[1]
-                            t_status = trans[2]
-                            if t_status == "مدفوع" or t_status == "سماح":
-                                balance_before_period -= t_amount
-                            else:
-                                balance_before_period += t_amount
-                    except ValueError:
-                        pass
+                balance_before_period = to_piasters(self.old_balance) + to_piasters(self.db.get_seller_balance_before(self.seller_id, start_date))
                 
                 # المتبقي النهائي = الرصيد السابق + بضاعة الفترة - مدفوعات الفترة - سماح الفترة
                 final_balance = balance_before_period + total_goods - total_paid - total_discount
@@ -1360,11 +1328,11 @@ class CurrentAccountPage:
                 report_data = {
                     'seller_name': self.seller_name,
                     'invoice_date': f"من {start_date_str} إلى {end_date_str}",
-                    'old_balance': balance_before_period,
+                    'old_balance': from_piasters(balance_before_period),
                     'transactions': filtered_transactions,
-                    'total_goods': total_goods,
-                    'total_paid': total_paid,
-                    'final_balance': final_balance
+                    'total_goods': from_piasters(total_goods),
+                    'total_paid': from_piasters(total_paid),
+                    'final_balance': from_piasters(final_balance)
                 }
                 
                 date_window.destroy()
@@ -1379,33 +1347,29 @@ class CurrentAccountPage:
 
     def load_data(self):
         # جلب البيانات
-        transactions = self.db.get_seller_transactions(self.seller_id)
+        # المعاملات مرتبة بالتاريخ من قاعدة البيانات (من الأقدم للأحدث)
+        transactions = self.db.get_seller_statement(self.seller_id)
         
         # تجميع البيانات حسب التاريخ
         from itertools import groupby
         
-        # Sort by date first (assuming date is at index 7)
-        # data format: id, amount, status, count, weight, price, item_name, date, day_name, equipment, note
-        transactions.sort(key=lambda x: x[7] if x[7] else "")
-        
         current_row_idx = 1
         
         # إضافة الرصيد السابق كأول صف إذا وجد
         # self.add_row(current_row_idx, row_type='old_balance', data=self.old_balance)
         # current_row_idx += 1
         
+        # المجاميع بالقرش حتى لا تتراكم كسور الجنيه
         grand_total = 0
         total_paid_sum = 0
         total_discount_sum = 0  # إجمالي السماح
         
-        for date, group in groupby(transactions, key=lambda x: x[7]):
-            group_list = list(group)
+        for date, group in groupby(transactions, key=lambda x: x.date):
             meal_total = 0
             
-            for trans in group_list:
-                # trans: id, amount, status, count, weight, price, item_name, date, day_name, equipment, note
-                status = trans[2]
-                amount = trans[1]
+            for trans in group:
+                status = trans.status
+                amount = to_piasters(trans.amount)
                 
                 if status == "مدفوع":
                     # صف مدفوع
@@ -1425,7 +1389,7 @@ class CurrentAccountPage:
             
             # إضافة صف "اجمالي وجبه" بعد كل مجموعة تاريخ
             if meal_total > 0:
-                self.add_row(current_row_idx, data=meal_total, row_type='meal_total')
+                self.add_row(current_row_idx, data=from_piasters(meal_total), row_type='meal_total')
                 current_row_idx += 1
         
         # إضافة صفوف فارغة في النهاية
@@ -1434,19 +1398,19 @@ class CurrentAccountPage:
             current_row_idx += 1
             
         # إضافة الإجماليات النهائية
-        self.add_row(current_row_idx, data=grand_total, row_type='grand_total')
+        self.add_row(current_row_idx, data=from_piasters(grand_total), row_type='grand_total')
         current_row_idx += 1
         
-        self.add_row(current_row_idx, data=total_paid_sum, row_type='total_paid')
+        self.add_row(current_row_idx, data=from_piasters(total_paid_sum), row_type='total_paid')
         current_row_idx += 1
         
         # إضافة إجمالي السماح
         if total_discount_sum > 0:
-            self.add_row(current_row_idx, data=total_discount_sum, row_type='total_discount')
+            self.add_row(current_row_idx, data=from_piasters(total_discount_sum), row_type='total_discount')
             current_row_idx += 1
         
         # المتبقي = الرصيد السابق + البضاعة - المدفوع - السماح
-        remaining = self.old_balance + grand_total - total_paid_sum - total_discount_sum
+        remaining = from_piasters(to_piasters(self.old_balance) + grand_total - total_paid_sum - total_discount_sum)
         self.add_row(current_row_idx, data=remaining, row_type='remaining')
         
         # تحديث خانة المتبقي في الفوتر
@@ -1465,21 +1429,21 @@ class CurrentAccountPage:
         trans_id = None
         
         if row_type == 'normal' and data:
-            # data: id, amount, status, count, weight, price, item_name, date, day_name, equipment, note
-            trans_id = data[0]
+            # data: SellerTransaction
+            trans_id = data.id
             vals = [
-                data[9], data[7], data[6], 
-                data[5], data[4], data[3], data[2], data[1]
+                data.equipment, data.date, data.item_name, 
+                data.price, data.weight, data.count, data.status, data.amount
             ]
         elif row_type == 'paid' and data:
-            trans_id = data[0]
-            vals = ["", data[7], "دفعة نقدية", "", "", "", "مدفوع", data[1]]
+            trans_id = data.id
+            vals = ["", data.date, "دفعة نقدية", "", "", "", "مدفوع", data.amount]
             bg_color = '#E74C3C' # Red
             fg_color = 'white'
             
         elif row_type == 'discount' and data:
-            trans_id = data[0]
-            vals = ["", data[7], "سماح", "", "", "", "سماح", data[1]]
+            trans_id = data.id
+            vals = ["", data.date, "سماح", "", "", "", "سماح", data.amount]
             bg_color = '#2ECC71' # Green
             fg_color = 'white'
             
@@ -1630,14 +1594,15 @@ class CurrentAccountPage:
 
     def calculate_totals(self):
         """حساب المجاميع من الجدول مباشرة"""
-        total_goods = 0.0
-        total_paid = 0.0
+        # الجمع بالقرش حتى لا تتراكم كسور الجنيه
+        total_goods = 0
+        total_paid = 0
         
         for row_entries in self.rows:
             try:
                 # المبلغ (العمود 7)
                 amount_str = row_entries[7].get().strip()
-                amount = float(amount_str) if amount_str else 0.0
+                amount = to_piasters(float(amount_str)) if amount_str else 0
                 
                 # الحالة (العمود 6)
                 status = row_entries[6].get().strip()
@@ -1651,12 +1616,12 @@ class CurrentAccountPage:
                 pass
         
         # تحديث واجهة المستخدم
-        self.lbl_invoice_total.config(text=f"{total_goods:.2f}")
-        self.lbl_paid_total.config(text=f"{total_paid:.2f}")
+        self.lbl_invoice_total.config(text=f"{from_piasters(total_goods):.2f}")
+        self.lbl_paid_total.config(text=f"{from_piasters(total_paid):.2f}")
         
         # الحساب النهائي
         # المتبقي = (الرصيد السابق + بضاعة الفاتورة) - المدفوع
-        final_remaining = (self.old_balance + total_goods) - total_paid
+        final_remaining = from_piasters(to_piasters(self.old_balance) + total_goods - total_paid)
         self.lbl_final_total.config(text=f"{final_remaining:.2f}")
         
         return final_remaining
@@ -1664,7 +1629,8 @@ class CurrentAccountPage:
     def save_changes(self):
         """حفظ الفاتورة وتحديث الحسابات"""
         try:
-            # 1. تحديث قاعدة بيانات المعاملات
+            # 1. تجهيز تعديلات المعاملات من الجدول (في خيط الواجهة)
+            operations = []
             for row_entries in self.rows:
                 trans_id = getattr(row_entries[0], 'trans_id', None)
                 
@@ -1698,24 +1664,32 @@ class CurrentAccountPage:
                 
                 if trans_id:
                     if is_empty:
-                        self.db.delete_seller_transaction(trans_id)
+                        operations.append((self.db.delete_seller_transaction, (trans_id,)))
                     else:
-                        self.db.update_seller_transaction(trans_id, amount, status, count, weight, price, item, date, day, equipment, note)
+                        operations.append((self.db.update_seller_transaction, (trans_id, amount, status, count, weight, price, item, date, day, equipment, note)))
                 elif not is_empty:
                      # Add new transaction
-                     self.db.add_seller_transaction(self.seller_id, amount, status, count, weight, price, item, date, day, equipment, note)
+                     operations.append((self.db.add_seller_transaction, (self.seller_id, amount, status, count, weight, price, item, date, day, equipment, note)))
             
             # 2. تحديث الرصيد النهائي للبائع في الجدول الرئيسي
             final_remaining = self.calculate_totals() # يعيد حساب المتبقي النهائي
             
             # تحديث sellers_accounts
             total_credit = self.account_data[3] if self.account_data else 0.0
-            self.db.update_seller_account(self.seller_id, self.seller_name, final_remaining, total_credit)
-            
-            messagebox.showinfo("نجاح", "تم حفظ الفاتورة وتحديث رصيد البائع")
-            
+            operations.append((self.db.update_seller_account, (self.seller_id, self.seller_name, final_remaining, total_credit)))
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ أثناء الحفظ: {e}")
+            return
+        
+        # 3. الحفظ كله في معاملة واحدة في خيط الكتابة حتى لا تتجمد النافذة
+        def persist():
+            with self.db.transaction():
+                for operation, args in operations:
+                    operation(*args)
+        
+        deliver(self.window, get_worker(self.db).write(persist),
+                lambda _: messagebox.showinfo("نجاح", "تم حفظ الفاتورة وتحديث رصيد البائع", parent=self.window),
+                lambda e: messagebox.showerror("خطأ", f"حدث خطأ أثناء الحفظ: {e}", parent=self.window))
 
 
 class MealsManagerWindow:
@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
 from utils import ColorManager
 from datetime import datetime
 
 class AgricultureTransferPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         self.theme = self.color_manager.get_random_theme()
         
@@ -311,53 +311,49 @@ class AgricultureTransferPage:
             
             unit_price = float(unit_price_str) if unit_price_str else 0.0
             
-            # Resolve Item Name
-            meals = self.db.get_all_meals()
-            final_item_name = item_name_input
-            item_exists = False
+            # All writes for this row run as one unit: one commit, and nothing
+            # is left half-written if a step fails
+            with self.db.transaction():
+                # Resolve Item Name (case-insensitive lookup in the cached meals)
+                meal = self.db.find_meal_by_name(item_name_input)
+                final_item_name = meal[1] if meal else item_name_input
             
-            for meal in meals:
-                if meal[1].strip().lower() == item_name_input.lower():
-                    final_item_name = meal[1]
-                    item_exists = True
-                    break
+                # Add item if new
+                if not meal:
+                    self.db.add_meal(final_item_name, unit_price, 0)
             
-            # Add item if new
-            if not item_exists:
-                self.db.add_meal(final_item_name, unit_price, 0)
+                # Calculate amount
+                amount = 0.0
+                if weight > 0:
+                    amount = weight * unit_price
+                elif count > 0:
+                    amount = count * unit_price
             
-            # Calculate amount
-            amount = 0.0
-            if weight > 0:
-                amount = weight * unit_price
-            elif count > 0:
-                amount = count * unit_price
+                # 1. Client Action (Credit)
+                self.db.add_client_debt(client_name, -amount)
             
-            # 1. Client Action (Credit)
-            self.db.add_client_debt(client_name, -amount)
+                # Record 'in' transfer for Client
+                self.db.add_agriculture_transfer(client_name, seller_name_input, final_item_name, 
+                                                unit_price, weight, count, "", "in")
             
-            # Record 'in' transfer for Client
-            self.db.add_agriculture_transfer(client_name, seller_name_input, final_item_name, 
-                                            unit_price, weight, count, "", "in")
-            
-            # 2. Seller Action (Debit)
-            seller_data = self.db.get_seller_by_name(seller_name_input)
-            if not seller_data:
-                self.db.add_seller_account(seller_name_input, 0, 0)
+                # 2. Seller Action (Debit)
                 seller_data = self.db.get_seller_by_name(seller_name_input)
+                if not seller_data:
+                    self.db.add_seller_account(seller_name_input, 0, 0)
+                    seller_data = self.db.get_seller_by_name(seller_name_input)
             
-            seller_id = seller_data[0]
+                seller_id = seller_data[0]
             
-            # Record 'out' transfer for Seller
-            self.db.add_agriculture_transfer(client_name, seller_name_input, final_item_name, 
-                                            unit_price, weight, count, "", "out")
+                # Record 'out' transfer for Seller
+                self.db.add_agriculture_transfer(client_name, seller_name_input, final_item_name, 
+                                                unit_price, weight, count, "", "out")
             
-            # Add Transaction to Seller Account
-            note = f"نقلة من العميل {client_name}"
-            today_date = datetime.now().strftime("%Y-%m-%d")
+                # Add Transaction to Seller Account
+                note = f"نقلة من العميل {client_name}"
+                today_date = datetime.now().strftime("%Y-%m-%d")
             
-            self.db.add_seller_transaction(seller_id, amount, "متبقي", count, weight, unit_price,
-                                          final_item_name, today_date, "", "", note)
+                self.db.add_seller_transaction(seller_id, amount, "متبقي", count, weight, unit_price,
+                                              final_item_name, today_date, "", "", note)
             
             # Make current row readonly
             for widget in row:
@@ -0,0 +1,87 @@
+"""
+أرشيف المواسم المغلقة
+
+معاملات البائعين ونقلات الزراعة تزيد بلا نهاية، وكل شاشة تدفع ثمن تاريخ
+نادراً ما تعرضه. Database.archive_before ينقل الصفوف القديمة إلى ملف
+أرشيف مستقل لكل سنة بجانب قاعدة البيانات (company_accounts_archive_2024.db):
+
+- معاملات البائعين المسددين بالكامل حتى تاريخ القطع، وتحل محلها في
+  الجدول الأصلي معاملات ترحيل (carry_forward = 1) بنفس المجاميع، فتبقى
+  الأرصدة وملخص seller_balances كما هي
+- النقلات التي دخلت فواتير قبل تاريخ القطع
+
+الجدول archive_state يحفظ لكل جدول أول يوم مؤرشف واليوم الذي قبله يوجد
+أرشيف. الاستعلامات التي تطلب فترة تبدأ قبل هذا اليوم تفتح ملفات الأرشيف
+بـ ATTACH وقت الاستعلام فقط (ملفاً واحداً في كل مرة)، وتستبعد معاملات
+الترحيل لأن الأرشيف يحل محلها.
+"""
+
+import glob
+import os
+from datetime import date
+
+# اسم الصنف في معاملات الترحيل (السماح له اسم خاص حتى يبقى ضمن إجمالي السماح)
+CARRY_ITEM = 'رصيد مرحل'
+CARRY_ALLOWANCE_ITEM = 'سماح مرحل'
+
+# إصدار ملف الأرشيف في PRAGMA user_version: 1 = الأسعار بالقرش (الترحيل 16)
+ARCHIVE_VERSION = 1
+
+# أعمدة الجداول المؤرشفة كما تنسخ (عمود رقم اليوم يحفظ فعلياً في الأرشيف)
+ARCHIVE_COLUMNS = {
+    'seller_transactions': (
+        'id', 'seller_id', 'amount', 'status', 'count', 'weight', 'price', 'item_name',
+        'date', 'day_name', 'equipment', 'note', 'created_at'),
+    'agriculture_transfers': (
+        'id', 'shipment_name', 'seller_name', 'item_name', 'unit_price', 'weight', 'count',
+        'equipment', 'transfer_type', 'created_at', 'invoice_id'),
+}
+
+_ARCHIVE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS {alias}.seller_transactions (
+        id INTEGER PRIMARY KEY, seller_id INTEGER NOT NULL, amount REAL, status TEXT,
+        count REAL, weight REAL, price REAL, item_name TEXT, date TEXT, day_name TEXT,
+        equipment TEXT, note TEXT, created_at TIMESTAMP, day INTEGER
+    )''',
+    'CREATE INDEX IF NOT EXISTS {alias}.idx_seller_transactions_seller_day ON seller_transactions(seller_id, day)',
+    'CREATE INDEX IF NOT EXISTS {alias}.idx_seller_transactions_status_day ON seller_transactions(status, day, item_name, amount)',
+    '''CREATE TABLE IF NOT EXISTS {alias}.agriculture_transfers (
+        id INTEGER PRIMARY KEY, shipment_name TEXT, seller_name TEXT, item_name TEXT,
+        unit_price REAL, weight REAL, count REAL, equipment TEXT, transfer_type TEXT,
+        created_at TIMESTAMP, invoice_id INTEGER, day INTEGER
+    )''',
+    'CREATE INDEX IF NOT EXISTS {alias}.idx_agriculture_transfers_invoice_created ON agriculture_transfers(invoice_id, created_at)',
+    'CREATE INDEX IF NOT EXISTS {alias}.idx_agriculture_transfers_item ON agriculture_transfers(item_name, weight, unit_price)',
+]
+
+
+def archive_path(db_name, year):
+    """مسار ملف أرشيف سنة معينة بجانب ملف قاعدة البيانات"""
+    base, _ = os.path.splitext(db_name)
+    return f'{base}_archive_{year}.db'
+
+
+def archive_files(db_name):
+    """مسارات ملفات الأرشيف الموجودة لقاعدة بيانات (كل السنوات)"""
+    base, _ = os.path.splitext(db_name)
+    return sorted(glob.glob(f'{glob.escape(base)}_archive_*.db'))
+
+
+def archive_alias(year):
+    """اسم ملف الأرشيف داخل الاتصال بعد ATTACH"""
+    return f'archive_{year}'
+
+
+def day_year(day):
+    """السنة التي يقع فيها رقم يوم"""
+    return date.fromordinal(day).year
+
+
+def create_archive_schema(conn, alias):
+    """إنشاء جداول الأرشيف في ملف مفتوح باسم alias (إن لم تكن موجودة)"""
+    new = conn.execute(f'SELECT COUNT(*) FROM {alias}.sqlite_master').fetchone()[0] == 0
+    for statement in _ARCHIVE_SCHEMA:
+        conn.execute(statement.format(alias=alias))
+    if new:
+        # الصفوف تنسخ كما هي من قاعدة البيانات، فالملف الجديد بوحدتها الحالية
+        conn.execute(f'PRAGMA {alias}.user_version = {ARCHIVE_VERSION}')
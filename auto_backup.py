@@ -10,6 +10,9 @@
 2. أنشئ مهمة جديدة
 3. اضبطها للتشغيل يومياً في الوقت المناسب (مثلاً 11:00 مساءً)
 4. اجعلها تشغل هذا السكريبت: python auto_backup.py
+
+النسخة اليومية تحفظ التغييرات منذ آخر نسخة فقط، ونسخة كاملة كل أسبوع.
+لنسخة كاملة الآن: python auto_backup.py --full
 """
 
 import sys
@@ -31,7 +34,7 @@ def main():
         
         # تصدير البيانات
         print("\n📤 بدء عملية التصدير...")
-        filepath = sync.create_daily_backup()
+        filepath = sync.create_daily_backup(full='--full' in sys.argv)
         
         # حذف النسخ القديمة (أكثر من 30 يوم)
         print("\n🗑 حذف النسخ القديمة...")
@@ -67,7 +70,7 @@ if __name__ == "__main__":
     exit_code = main()
     
     # إذا كنت تريد أن تبقى النافذة مفتوحة لرؤية النتائج
-    if len(sys.argv) > 1 and sys.argv[1] == '--wait':
+    if '--wait' in sys.argv:
         input("\nاضغط Enter للخروج...")
     
     sys.exit(exit_code)
@@ -6,6 +6,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
 from datetime import datetime
+from money import format_money
 
 
 class ClientInvoicePrintWindow:
@@ -123,7 +124,7 @@ class ClientInvoicePrintWindow:
             weight = f"{trans[1]:.2f}" if trans[1] else ""
             count = f"{trans[2]:.0f}" if trans[2] else ""
             price = f"{trans[3]:.2f}" if trans[3] else ""
-            amount = f"{trans[4]:.2f}" if trans[4] else "0.00"
+            amount = format_money(trans[4]) if trans[4] else "0.00"
             status = trans[5] if trans[5] else ""
             
             # لون الصف حسب الحالة
@@ -159,9 +160,9 @@ class ClientInvoicePrintWindow:
             tk.Label(row, text=label, font=('Simplified Arabic', 13, 'bold'), 
                     bg=totals_frame['bg']).pack(side=tk.LEFT, padx=5)
         
-        add_total_row("إجمالي البضاعة:", f"{self.data['total_goods']:.2f} جنيه", '#FFF3CD')
-        add_total_row("إجمالي الخصومات:", f"{self.data['total_deductions']:.2f} جنيه", '#F8D7DA')
-        add_total_row("الصافي النهائي:", f"{self.data['final_total']:.2f} جنيه", '#D4EDDA')
+        add_total_row("إجمالي البضاعة:", f"{format_money(self.data['total_goods'])} جنيه", '#FFF3CD')
+        add_total_row("إجمالي الخصومات:", f"{format_money(self.data['total_deductions'])} جنيه", '#F8D7DA')
+        add_total_row("الصافي النهائي:", f"{format_money(self.data['final_total'])} جنيه", '#D4EDDA')
         
         # الفوتر (الأزرار)
         buttons_frame = tk.Frame(self.window, bg='#ECF0F1', pady=15)
@@ -327,7 +328,7 @@ class ClientInvoicePrintWindow:
                 price = f"{trans[3]:.2f}" if trans[3] else ""
                 weight = f"{trans[1]:.2f}" if trans[1] else ""
                 count = f"{trans[2]:.0f}" if trans[2] else ""
-                amount = f"{trans[4]:.2f}" if trans[4] else "0.00"
+                amount = format_money(trans[4]) if trans[4] else "0.00"
                 
                 c.drawRightString(width - 0.5*cm, y, amount)
                 c.drawRightString(width - 4*cm, y, count)
@@ -343,12 +344,12 @@ class ClientInvoicePrintWindow:
             c.line(0.3*cm, y, width - 0.3*cm, y)
             y -= 0.5*cm
             c.setFont(font_name, 8)
-            c.drawRightString(width - 0.5*cm, y, f"إجمالي البضاعة: {self.data['total_goods']:.2f}")
+            c.drawRightString(width - 0.5*cm, y, f"إجمالي البضاعة: {format_money(self.data['total_goods'])}")
             y -= 0.4*cm
-            c.drawRightString(width - 0.5*cm, y, f"إجمالي الخصومات: {self.data['total_deductions']:.2f}")
+            c.drawRightString(width - 0.5*cm, y, f"إجمالي الخصومات: {format_money(self.data['total_deductions'])}")
             y -= 0.4*cm
             c.setFont(font_name, 9)
-            c.drawRightString(width - 0.5*cm, y, f"الصافي النهائي: {self.data['final_total']:.2f}")
+            c.drawRightString(width - 0.5*cm, y, f"الصافي النهائي: {format_money(self.data['final_total'])}")
             
             c.save()
             messagebox.showinfo("نجاح", f"تم حفظ PDF بنجاح:\n{filepath}")
@@ -498,7 +499,7 @@ class ClientInvoicePrintWindow:
                     price = f"{trans[3]:.2f}" if trans[3] else ""
                     weight = f"{trans[1]:.2f}" if trans[1] else ""
                     count = f"{trans[2]:.0f}" if trans[2] else ""
-                    amount = f"{trans[4]:.2f}" if trans[4] else ""
+                    amount = format_money(trans[4]) if trans[4] else ""
                     
                     row_vals = [item, price, weight, count, amount]
                     
@@ -525,9 +526,9 @@ class ClientInvoicePrintWindow:
                     draw_text_right(f"{label}: {value}", horz_res - margin_x, y, font_header)
                     y += int(line_height * 1.3)
 
-                draw_total_row("إجمالي البضاعة", f"{self.data['total_goods']:.2f}")
-                draw_total_row("إجمالي الخصومات", f"{self.data['total_deductions']:.2f}")
-                draw_total_row("الصافي النهائي", f"{self.data['final_total']:.2f}")
+                draw_total_row("إجمالي البضاعة", f"{format_money(self.data['total_goods'])}")
+                draw_total_row("إجمالي الخصومات", f"{format_money(self.data['total_deductions'])}")
+                draw_total_row("الصافي النهائي", f"{format_money(self.data['final_total'])}")
 
                 hdc.EndPage()
                 hdc.EndDoc()
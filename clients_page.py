@@ -1,13 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
+from db_worker import get_worker, deliver
 from utils import ColorManager
 from datetime import datetime
 from ready_invoices_page import ReadyInvoicesPage
 
 class ClientsPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         
         # Design copied from AgricultureTransferPage
@@ -54,6 +55,8 @@ class ClientsPage:
         
         self.table_rows = []
         self.selected_transfer_id = None
+        self.load_request = 0  # latest load_data request (older results are dropped)
+        self.loaded_key = None  # (fingerprint, search, item) of the rows on screen
         self.selected_row_widgets = []
         
         self.setup_ui()
@@ -149,6 +152,9 @@ class ClientsPage:
             self.scrollable_frame.grid_columnconfigure(i, weight=1)
             
         self.load_data()
+        
+        # Coming back to the window reloads only if transfers changed meanwhile
+        self.window.bind('<FocusIn>', lambda e: self.load_data())
 
     def create_bottom_bar(self):
         btn_frame = tk.Frame(self.window, bg=self.colors['bg'], pady=10)
@@ -178,35 +184,40 @@ class ClientsPage:
         create_btn("بيان العملاء", lambda: None, self.colors['text_secondary']).pack(side=tk.LEFT, padx=5)
 
     def load_data(self):
+        # Filter logic (done in SQL: client transfers only, search in client/seller, item)
+        search_q = self.search_var.get().lower()
+        filter_item = self.filter_item_var.get()
+        
+        # Same filters and no transfer changed since the last load: nothing to do
+        key = (self.db.fingerprint(('agriculture_transfers',)), search_q, filter_item)
+        if key == self.loaded_key:
+            return
+        self.loaded_key = key
+        
+        # Query runs on a reader thread; typing fires a load per key, so only
+        # the latest request is shown
+        self.load_request += 1
+        request = self.load_request
+        future = get_worker(self.db).read(
+            self.db.find_agriculture_transfers,
+            transfer_type='in',
+            search=search_q or None,
+            item_name=filter_item if filter_item and filter_item != 'الكل' else None
+        )
+        deliver(self.window, future,
+                lambda rows: self.show_rows(rows) if request == self.load_request else None,
+                self.on_load_failed)
+
+    def on_load_failed(self, error):
+        self.loaded_key = None  # retry on the next load_data
+        messagebox.showerror("خطأ", f"تعذر تحميل النقلات: {error}", parent=self.window)
+
+    def show_rows(self, filtered_data):
         # Clear current rows
         for row in self.table_rows:
             for widget in row:
                 widget.destroy()
         self.table_rows = []
-        
-        transfers = self.db.get_agriculture_transfers()
-        
-        # Filter logic
-        search_q = self.search_var.get().lower()
-        filter_item = self.filter_item_var.get()
-        
-        filtered_data = []
-        for row in transfers:
-            # row: id, shipment(client), seller, item, price, weight, count, equip, type
-            if row[8] != 'in': # Only clients
-                continue
-                
-            client = str(row[1]).lower()
-            seller = str(row[2]).lower()
-            item_name = str(row[3])
-            
-            if search_q and (search_q not in client and search_q not in seller):
-                continue
-                
-            if filter_item and filter_item != 'الكل' and filter_item != item_name:
-                continue
-            
-            filtered_data.append(row)
             
         # Create Rows
         entry_style = {'font': ('Playpen Sans Arabic', 14), 'relief': tk.SUNKEN, 'bd': 1, 'justify': 'center'}
@@ -273,18 +284,12 @@ class ClientsPage:
         """Open ready invoices page with selected transfer"""
         if not self.selected_transfer_id:
             # Open empty invoice page
-            ReadyInvoicesPage(self.window, transfer_data=None)
+            ReadyInvoicesPage(self.window, transfer_data=None, db=self.db)
             return
         
         # Get selected transfer data
         transfer_id = int(self.selected_transfer_id)
-        transfers = self.db.get_agriculture_transfers()
-        
-        selected_transfer = None
-        for t in transfers:
-            if t[0] == transfer_id and t[8] == 'in':  # Only client transfers
-                selected_transfer = t
-                break
+        selected_transfer = self.db.get_agriculture_transfer(transfer_id, transfer_type='in')  # Only client transfers
         
         if not selected_transfer:
             messagebox.showwarning("تنبيه", "لم يتم العثور على النقلة المحددة")
@@ -310,7 +315,7 @@ class ClientsPage:
         transfer_data = (owner, count, weight, item, price, f"{net:.2f}", date, equipment)
         
         # Open invoice page with data
-        ReadyInvoicesPage(self.window, transfer_data=transfer_data)
+        ReadyInvoicesPage(self.window, transfer_data=transfer_data, db=self.db)
 
     def create_invoice(self, invoice_type):
         """Create invoice from selected transfer"""
@@ -320,13 +325,7 @@ class ClientsPage:
         
         # Get transfer details
         transfer_id = int(self.selected_transfer_id)
-        transfers = self.db.get_agriculture_transfers()
-        
-        selected_transfer = None
-        for t in transfers:
-            if t[0] == transfer_id:
-                selected_transfer = t
-                break
+        selected_transfer = self.db.get_agriculture_transfer(transfer_id)
         
         if not selected_transfer:
             messagebox.showerror("خطأ", "لم يتم العثور على النقلة")
@@ -525,8 +524,7 @@ class ClientsPage:
             scrollable_frame.grid_columnconfigure(i, weight=1)
         
         # Get client transfers
-        all_transfers = self.db.get_agriculture_transfers()
-        client_transfers = [t for t in all_transfers if t[1] == client_name and t[8] == 'in']
+        client_transfers = self.db.find_agriculture_transfers(transfer_type='in', client_name=client_name)
         
         # Store selected transfer
         selected_transfer = {'id': None, 'widgets': []}
@@ -665,7 +663,7 @@ class ClientsPage:
                     # Each transfer: id, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type
                     
                     # Open invoice page with deductions and list of transfers
-                    ReadyInvoicesPage(transfers_window, transfer_data=uninvoiced_transfers, deductions=deductions, is_multi=True)
+                    ReadyInvoicesPage(transfers_window, transfer_data=uninvoiced_transfers, deductions=deductions, is_multi=True, db=self.db)
                     
                 except Exception as e:
                     messagebox.showerror("خطأ", f"حدث خطأ: {e}")
@@ -780,7 +778,7 @@ class ClientsPage:
                 }
                 
                 # Open ReadyInvoicesPage
-                ReadyInvoicesPage(invoices_window, transfer_data=transfers, deductions=deductions, is_multi=True, invoice_id=invoice_id)
+                ReadyInvoicesPage(invoices_window, transfer_data=transfers, deductions=deductions, is_multi=True, invoice_id=invoice_id, db=self.db)
 
             # Buttons
             btn_frame = tk.Frame(invoices_window, bg=self.colors['bg'], pady=10)
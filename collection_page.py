@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
 from utils import ColorManager
 from datetime import datetime
 
 class CollectionPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         self.theme = self.color_manager.get_random_theme()
         
@@ -37,8 +37,23 @@ class CollectionPage:
             'table': ('Arial', 12)
         }
         
+        self.loaded_key = None  # (fingerprint, date) of the banner totals
         self.setup_ui()
         
+        # Returning to the window rebuilds the banner only if today's totals may have changed
+        self.window.bind('<FocusIn>', self.refresh_if_changed)
+        
+    def banner_key(self):
+        return (self.db.fingerprint(('seller_transactions', 'expenses')), datetime.now().strftime("%Y-%m-%d"))
+
+    def refresh_if_changed(self, event=None):
+        key = self.banner_key()
+        if key == self.loaded_key:
+            return
+        # Rebuild once, after the focus event finishes
+        self.loaded_key = key
+        self.window.after_idle(self.refresh_banner)
+        
     def setup_ui(self):
         # --- Banner Section ---
         self.create_banner()
@@ -48,7 +63,10 @@ class CollectionPage:
         
     def create_banner(self):
         banner_frame = tk.Frame(self.window, bg=self.colors['banner_bg'], pady=20, padx=20)
-        banner_frame.pack(fill=tk.X, pady=(0, 20))
+        # When rebuilt, the banner goes back above the buttons
+        siblings = self.window.pack_slaves()
+        banner_frame.pack(fill=tk.X, pady=(0, 20), **({'before': siblings[0]} if siblings else {}))
+        self.banner_frame = banner_frame
         
         # Date
         today_date = datetime.now().strftime("%Y-%m-%d")
@@ -65,6 +83,7 @@ class CollectionPage:
         stats_frame.pack(fill=tk.X, pady=20)
         
         # Calculate Totals using database method
+        self.loaded_key = self.banner_key()
         totals = self.db.calculate_daily_totals(today_date)
         total_collection = totals['total_collection']
         total_expenses = totals['total_expenses']
@@ -316,50 +335,25 @@ class CollectionPage:
         
         # Load Data
         if list_type == "collection":
-            # Need to join with seller name manually or fetch all transactions and filter
-            # Since get_seller_transactions is per seller, we might need a new DB function or iterate all sellers
-            # For efficiency, let's fetch all sellers and their transactions
-            sellers = self.db.get_all_sellers_accounts()
-            all_trans = []
-            for seller in sellers:
-                # seller: id, name, ...
-                s_id = seller[0]
-                s_name = seller[1]
-                trans = self.db.get_seller_transactions(s_id)
-                for t in trans:
-                    # t: id, amount, status, ... date ... note
-                    if t[2] == "مدفوع":
-                        all_trans.append({
-                            'date': t[7],
-                            'seller': s_name,
-                            'amount': t[1],
-                            'note': t[10]
-                        })
-            # Sort by date
-            all_trans.sort(key=lambda x: x['date'], reverse=True)
-            
-            for item in all_trans:
-                tree.insert('', tk.END, values=(item['date'], item['seller'], f"{item['amount']:.2f}", item['note']))
+            # Paid transactions of all sellers in one query, newest first
+            for t in self.db.get_paid_transactions():
+                tree.insert('', tk.END, values=(t.date, t.seller_name, f"{t.amount:.2f}", t.note))
                 
         else: # expenses
             expenses = self.db.get_all_expenses()
             for exp in expenses:
-                # exp: id, desc, amount, date, note
-                tree.insert('', tk.END, values=(exp[3], exp[1], f"{exp[2]:.2f}", exp[4]))
+                tree.insert('', tk.END, values=(exp.expense_date, exp.description, f"{exp.amount:.2f}", exp.note))
 
     def refresh_banner(self):
-        # Destroy old banner content and recreate or just update labels
-        # For simplicity, let's just close and reopen the page? No, that's bad UX.
-        # Let's update the labels if we stored references, but I didn't.
-        # I'll just re-call create_banner but I need to clear the frame first.
-        # Actually, simpler: just close this window and let user reopen it? No.
-        # Let's just update the window by destroying all children and rebuilding UI
-        for widget in self.window.winfo_children():
-            widget.destroy()
-        self.setup_ui()
+        # Rebuild only the banner: the buttons and any dialogs opened from
+        # this window (child Toplevels) stay as they are
+        if not self.window.winfo_exists():
+            return
+        self.banner_frame.destroy()
+        self.create_banner()
 
     def open_reports(self):
         """فتح صفحة التقارير"""
         from reports_page import DailyReportsPage
-        DailyReportsPage(self.window)
+        DailyReportsPage(self.window, db=self.db)
 
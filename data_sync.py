@@ -1,13 +1,138 @@
 import sqlite3
+import gzip
 import json
+import lzma
 import os
 from datetime import datetime
+from time import perf_counter
 import shutil
+from database import connect
+from money import MONEY_UNIT, pound_columns, to_piasters
+
+# الجداول التي تصدر في النسخ الاحتياطية
+EXPORT_TABLES = [
+    'sellers_accounts',
+    'seller_transactions',
+    'clients_accounts',
+    'inventory_items',
+    'meals',
+    'agriculture_transfers',
+    'expenses',
+    'client_invoices'
+]
+
+# حالة سلسلة النسخ (آخر نسخة كاملة والتغييرات بعدها) داخل مجلد التصدير
+EXPORT_STATE_FILE = 'export_state.json'
+
+# بعد هذه المدة تبدأ النسخة اليومية سلسلة جديدة بنسخة كاملة
+FULL_BACKUP_DAYS = 7
+
+# ملف النسخة (NDJSON): سطر JSON لكل سجل، فيكتب ويقرأ بدون تحميله كاملاً
+#   {"record": "header", "export_date": ..., "export_type": "full", ...}
+#   {"record": "table", "table": "expenses", "columns": ["id", ...]}
+#   [1, "...", ...]            <- صف: القيم بترتيب columns
+#   {"record": "end", "table": "expenses", "row_count": 1, "deleted": [...]}
+# النسخ القديمة (.json) ملف JSON واحد، وتستورد كما هي
+BACKUP_EXTENSION = '.ndjson'
+
+# ضغط ملفات النسخ الجديدة (None بدون ضغط)، والمستوى من 0 إلى 9
+# (gzip أسرع، و lzma أصغر حجماً)
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'lzma': '.xz'}
+BACKUP_COMPRESSION = 'gzip'
+COMPRESSION_LEVEL = 6
+
+BACKUP_EXTENSIONS = (BACKUP_EXTENSION, '.json') + tuple(
+    BACKUP_EXTENSION + suffix for suffix in COMPRESSION_SUFFIXES.values())
+
+# عدد الصفوف في كل دفعة قراءة أو كتابة
+BATCH_ROWS = 1000
+
+# النسخة الكاملة (snapshot): نسخة من ملف قاعدة البيانات نفسه، تنسخ على
+# دفعات بهذا العدد من الصفحات (4 ميجا بحجم الصفحة الافتراضي)
+SNAPSHOT_EXTENSION = '.db'
+SNAPSHOT_PAGES = 1024
+
+
+def backup_compression(filepath):
+    """طريقة ضغط ملف نسخة من امتداده (None لملف غير مضغوط)"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if filepath.endswith(suffix):
+            return compression
+    return None
+
+
+def open_backup(filepath, mode='r', compression=None, level=COMPRESSION_LEVEL):
+    """فتح ملف نسخة كنص، مضغوطاً حسب compression ('gzip' أو 'lzma' أو None)"""
+    if compression == 'gzip':
+        options = {'compresslevel': level} if mode == 'w' else {}
+        return gzip.open(filepath, mode + 't', encoding='utf-8', **options)
+    if compression == 'lzma':
+        options = {'preset': level} if mode == 'w' else {}
+        return lzma.open(filepath, mode + 't', encoding='utf-8', **options)
+    return open(filepath, mode, encoding='utf-8')
+
+
+def read_backup(filepath):
+    """
+    قراءة ملف نسخة احتياطية كسلسلة سجلات (kind, table, value)
+    
+    أولاً ('header', None, بيانات الملف)، ثم لكل جدول ('table', الجدول، الأعمدة)
+    ثم ('rows', الجدول، صفوف كقواميس) بحد أقصى BATCH_ROWS صف في كل دفعة،
+    ثم ('end', الجدول، سجل end). الملفات المضغوطة تفك أثناء القراءة، وملفات
+    .json القديمة تقرأ كاملة ثم تقسم.
+    """
+    compression = backup_compression(filepath)
+    name = filepath[:-len(COMPRESSION_SUFFIXES[compression])] if compression else filepath
+    with open_backup(filepath, 'r', compression) as f:
+        if not name.endswith(BACKUP_EXTENSION):
+            data = json.load(f)
+            yield 'header', None, {key: value for key, value in data.items() if key != 'tables'}
+            for table, table_info in data['tables'].items():
+                yield 'table', table, table_info['columns']
+                rows = table_info['data']
+                for start in range(0, len(rows), BATCH_ROWS):
+                    yield 'rows', table, rows[start:start + BATCH_ROWS]
+                yield 'end', table, {'record': 'end', 'table': table, 'row_count': len(rows),
+                                     'deleted': table_info.get('deleted', [])}
+            return
+        
+        header = json.loads(f.readline() or 'null')
+        if not isinstance(header, dict) or header.get('record') != 'header':
+            raise ValueError(f"ملف نسخة احتياطية غير صالح: {filepath}")
+        yield 'header', None, header
+        
+        table = columns = None
+        batch = []
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, list):
+                batch.append(dict(zip(columns, record)))
+                if len(batch) == BATCH_ROWS:
+                    yield 'rows', table, batch
+                    batch = []
+            elif record['record'] == 'table':
+                table, columns = record['table'], record['columns']
+                yield 'table', table, columns
+            elif record['record'] == 'end':
+                if batch:
+                    yield 'rows', table, batch
+                    batch = []
+                yield 'end', table, record
+
 
 class DataSync:
-    def __init__(self, db_name="company_accounts.db"):
+    def __init__(self, db_name="company_accounts.db", compression=BACKUP_COMPRESSION,
+                 compression_level=COMPRESSION_LEVEL):
+        if compression is not None and compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"طريقة ضغط غير معروفة: {compression}")
         self.db_name = db_name
         self.exports_folder = "data_exports"
+        # ضغط الملفات التي تصدر (الاستيراد يعرف الضغط من امتداد الملف)
+        self.compression = compression
+        self.compression_level = compression_level
+        self.extension = BACKUP_EXTENSION + COMPRESSION_SUFFIXES.get(compression, '')
         
         # إنشاء مجلد التصدير إذا لم يكن موجوداً
         if not os.path.exists(self.exports_folder):
@@ -15,11 +140,15 @@ class DataSync:
     
     def get_connection(self):
         """إنشاء اتصال بقاعدة البيانات"""
-        return sqlite3.connect(self.db_name)
+        # نفس إعدادات ودوال اتصال البرنامج (triggers فهرس البحث تحتاج arabic_normalize)
+        return connect(self.db_name)
     
     def export_all_data(self, filename=None):
         """
-        تصدير جميع البيانات من قاعدة البيانات إلى ملف JSON
+        تصدير جميع البيانات من قاعدة البيانات إلى ملف NDJSON (مضغوط حسب compression)
+        
+        الصفوف تقرأ من قاعدة البيانات وتكتب في الملف دفعة بدفعة (BATCH_ROWS)،
+        فالذاكرة المستخدمة لا تزيد مع حجم البيانات.
         
         Args:
             filename: اسم الملف (اختياري). إذا لم يتم تحديده، سيتم استخدام التاريخ الحالي
@@ -30,207 +159,309 @@ class DataSync:
         if filename is None:
             # استخدام التاريخ والوقت الحالي كاسم للملف
             timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"backup_{timestamp}.json"
+            filename = f"backup_{timestamp}{self.extension}"
         
         filepath = os.path.join(self.exports_folder, filename)
         
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # قائمة بجميع الجداول التي نريد تصديرها
-        tables = [
-            'sellers_accounts',
-            'seller_transactions',
-            'clients_accounts',
-            'inventory_items',
-            'meals',
-            'agriculture_transfers',
-            'expenses',
-            'client_invoices'
-        ]
-        
-        export_data = {
+        header = {
+            'record': 'header',
             'export_date': datetime.now().isoformat(),
             'database_name': self.db_name,
-            'tables': {}
+            'money_unit': MONEY_UNIT,
+            'export_type': 'full'
         }
         
-        for table in tables:
-            try:
-                # جلب أسماء الأعمدة
-                cursor.execute(f"PRAGMA table_info({table})")
-                columns_info = cursor.fetchall()
-                columns = [col[1] for col in columns_info]
-                
-                # جلب جميع البيانات
-                cursor.execute(f"SELECT * FROM {table}")
-                rows = cursor.fetchall()
-                
-                # تحويل البيانات إلى قائمة من القواميس
-                table_data = []
-                for row in rows:
-                    row_dict = {}
-                    for i, col in enumerate(columns):
-                        row_dict[col] = row[i]
-                    table_data.append(row_dict)
-                
-                export_data['tables'][table] = {
-                    'columns': columns,
-                    'data': table_data,
-                    'row_count': len(table_data)
-                }
-                
-                print(f"✓ تم تصدير {len(table_data)} سجل من جدول {table}")
-                
-            except sqlite3.OperationalError as e:
-                print(f"⚠ تحذير: لم يتم العثور على جدول {table} - {e}")
-                continue
+        try:
+            # كل الجداول ورقم آخر تغيير من نفس اللحظة (معاملة قراءة واحدة)
+            cursor.execute('BEGIN')
+            header['watermark'] = self._changelog_seq(cursor)
+            
+            # الكتابة في ملف مؤقت حتى لا يبقى ملف ناقص إذا توقف التصدير
+            with self._open_export(filepath + '.tmp', filename) as f:
+                self._write_record(f, header)
+                for table in EXPORT_TABLES:
+                    try:
+                        row_count = self._write_table(f, conn, table)
+                        print(f"✓ تم تصدير {row_count} سجل من جدول {table}")
+                    except sqlite3.OperationalError as e:
+                        print(f"⚠ تحذير: لم يتم العثور على جدول {table} - {e}")
+                        continue
+        finally:
+            conn.rollback()
+            conn.close()
+        os.replace(filepath + '.tmp', filepath)
+        
+        # النسخ التالية تصدر التغييرات بعد هذه النسخة فقط
+        if header['watermark'] is not None:
+            self._save_state({
+                'database_name': self.db_name,
+                'base': filename,
+                'base_date': header['export_date'],
+                'chain': [filename],
+                'watermark': header['watermark'],
+            })
+        
+        print(f"\n✓ تم تصدير البيانات بنجاح إلى: {filepath}")
+        print(f"حجم الملف: {os.path.getsize(filepath) / 1024:.2f} KB")
         
-        conn.close()
+        return filepath
+    
+    def export_delta(self, filename=None):
+        """
+        تصدير الصفوف التي أضيفت أو تعدلت أو حذفت منذ آخر نسخة فقط
         
-        # حفظ البيانات في ملف JSON
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
+        التغييرات من سجل التغييرات (changelog) بعد رقم آخر نسخة (watermark).
+        الملف يحفظ النسخة الكاملة التي يبنى عليها (base) والنسخة السابقة له
+        (previous)، ولكل جدول الصفوف الحالية للمعرفات التي تغيرت وقائمة
+        المعرفات المحذوفة.
         
-        print(f"\n✓ تم تصدير البيانات بنجاح إلى: {filepath}")
+        Returns:
+            str: مسار الملف، أو None إذا لم يمكن (لا توجد نسخة كاملة سابقة،
+            أو ملفها حذف، أو التغييرات لم تعد في السجل) ويلزم تصدير كامل
+        """
+        state = self._load_state()
+        if (state is None or state.get('database_name') != self.db_name
+                or not all(os.path.exists(os.path.join(self.exports_folder, name)) for name in state['chain'])):
+            return None
+        
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            filename = f"delta_backup_{timestamp}{self.extension}"
+            # نسختان في نفس الثانية: لا يكتب فوق ملف في السلسلة
+            counter = 2
+            while os.path.exists(os.path.join(self.exports_folder, filename)):
+                filename = f"delta_backup_{timestamp}_{counter}{self.extension}"
+                counter += 1
+        filepath = os.path.join(self.exports_folder, filename)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN')
+            since = state['watermark']
+            watermark = self._changelog_seq(cursor)
+            oldest = cursor.execute('SELECT MIN(seq) FROM changelog').fetchone()[0]
+            # قاعدة بيانات أخرى (رقم أقل) أو تغييرات حذفت من السجل
+            if watermark is None or watermark < since or (oldest is not None and oldest > since + 1):
+                return None
+            
+            changed = {}
+            for table, row_id in cursor.execute('''
+                SELECT DISTINCT table_name, row_id FROM changelog WHERE seq > ? AND seq <= ?
+            ''', (since, watermark)):
+                changed.setdefault(table, []).append(row_id)
+            
+            header = {
+                'record': 'header',
+                'export_date': datetime.now().isoformat(),
+                'database_name': self.db_name,
+                'money_unit': MONEY_UNIT,
+                'export_type': 'delta',
+                'base': state['base'],
+                'base_date': state['base_date'],
+                'previous': state['chain'][-1],
+                'since': since,
+                'watermark': watermark
+            }
+            
+            with self._open_export(filepath + '.tmp', filename) as f:
+                self._write_record(f, header)
+                for table in EXPORT_TABLES:
+                    ids = changed.get(table)
+                    if not ids:
+                        continue
+                    # المعرفات التي تغيرت ولم تعد موجودة = المحذوفة
+                    deleted = [row[0] for row in conn.execute(
+                        f"SELECT value FROM json_each(?) WHERE value NOT IN (SELECT id FROM {table})",
+                        (json.dumps(ids),))]
+                    row_count = self._write_table(f, conn, table, ids, deleted)
+                    print(f"✓ {table}: {row_count} سجل متغير، {len(deleted)} محذوف")
+        finally:
+            conn.rollback()
+            conn.close()
+        os.replace(filepath + '.tmp', filepath)
+        
+        state['chain'].append(filename)
+        state['watermark'] = watermark
+        self._save_state(state)
+        
+        print(f"\n✓ تم تصدير التغييرات منذ {state['base']} إلى: {filepath}")
         print(f"حجم الملف: {os.path.getsize(filepath) / 1024:.2f} KB")
         
         return filepath
     
+    def _open_export(self, path, filename):
+        """فتح ملف تصدير للكتابة بالضغط الذي يدل عليه اسمه النهائي filename"""
+        return open_backup(path, 'w', backup_compression(filename), self.compression_level)
+    
+    def _write_record(self, f, record):
+        f.write(json.dumps(record, ensure_ascii=False))
+        f.write('\n')
+    
+    def _write_table(self, f, conn, table, ids=None, deleted=None):
+        """
+        كتابة جدول في ملف النسخة: سجل table ثم الصفوف ثم سجل end
+        
+        Args:
+            ids: معرفات الصفوف المطلوبة فقط (ملف التغييرات)
+            deleted: المعرفات المحذوفة (تحفظ في سجل end لملف التغييرات)
+        
+        Returns:
+            int: عدد الصفوف المكتوبة
+        """
+        cursor = conn.cursor()
+        # table_info لا تشمل الأعمدة المحسوبة، فلا تصدر
+        cursor.execute(f"PRAGMA table_info({table})")
+        columns = [col[1] for col in cursor.fetchall()]
+        
+        if ids is None:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table}")
+        else:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+                           (json.dumps(ids),))
+        
+        self._write_record(f, {'record': 'table', 'table': table, 'columns': columns})
+        row_count = 0
+        while True:
+            rows = cursor.fetchmany(BATCH_ROWS)
+            if not rows:
+                break
+            # الصف قائمة قيم بترتيب columns
+            f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+            row_count += len(rows)
+        
+        end = {'record': 'end', 'table': table, 'row_count': row_count}
+        if deleted is not None:
+            end['deleted'] = deleted
+        self._write_record(f, end)
+        return row_count
+    
+    def _changelog_seq(self, cursor):
+        """رقم آخر تغيير في changelog (None لقاعدة بيانات بدون سجل التغييرات)"""
+        try:
+            return cursor.execute('SELECT MAX(seq) FROM changelog').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return None
+    
+    def _load_state(self):
+        path = os.path.join(self.exports_folder, EXPORT_STATE_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _save_state(self, state):
+        path = os.path.join(self.exports_folder, EXPORT_STATE_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+    
     def import_data(self, filepath, merge_mode='update'):
         """
-        استيراد البيانات من ملف JSON إلى قاعدة البيانات
+        استيراد البيانات من ملف نسخة احتياطية (.ndjson أو .json القديم) إلى قاعدة البيانات
+        
+        الملف يقرأ دفعة بدفعة (read_backup)، وكل دفعة تكتب بجملة واحدة مجهزة
+        (executemany) من INSERT ... ON CONFLICT(id)، وكل جدول في معاملة واحدة.
+        السجلات تحتفظ بمعرفاتها من الملف.
         
         Args:
-            filepath: مسار ملف JSON
+            filepath: مسار ملف النسخة
             merge_mode: طريقة الدمج
-                - 'replace': حذف البيانات القديمة واستبدالها بالجديدة
+                - 'replace': السجل الموجود بنفس المعرف يستبدل بالكامل بسجل الملف
                 - 'update': تحديث السجلات الموجودة وإضافة الجديدة
                 - 'skip': تخطي السجلات الموجودة وإضافة الجديدة فقط
+                (ملف التغييرات يطبق دائماً بطريقة replace ثم يحذف المحذوف)
+        
+        القاعدة تحفظ آخر نسخة استوردتها من كل مصدر (جدول import_state)، وملف
+        التغييرات يرفض إذا لم يكن التالي في سلسلة تلك النسخة (_check_delta).
         
         Returns:
-            dict: إحصائيات الاستيراد
+            dict: إحصائيات الاستيراد، و tables: لكل جدول عدد السجلات والزمن
+            بالثواني والسرعة (سجل في الثانية)، و warnings: تنبيهات لم توقف
+            الاستيراد
+        
+        Raises:
+            ValueError: ملف تغييرات مبني على نسخة غير آخر نسخة مستوردة، أو
+            ينقصه ملف قبله في السلسلة، أو استورد من قبل
         """
+        if merge_mode not in ('replace', 'update', 'skip'):
+            raise ValueError(f"طريقة دمج غير معروفة: {merge_mode}")
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"الملف غير موجود: {filepath}")
+        if filepath.endswith(SNAPSHOT_EXTENSION):
+            raise ValueError("النسخة الكاملة (snapshot) تستعاد بـ restore_snapshot وليس بالاستيراد")
         
-        # قراءة البيانات من الملف
-        with open(filepath, 'r', encoding='utf-8') as f:
-            import_data = json.load(f)
+        records = read_backup(filepath)
+        _, _, header = next(records)
         
         print(f"📥 بدء استيراد البيانات من: {filepath}")
-        print(f"تاريخ التصدير: {import_data.get('export_date', 'غير محدد')}")
+        print(f"تاريخ التصدير: {header.get('export_date', 'غير محدد')}")
         
         conn = self.get_connection()
-        cursor = conn.cursor()
+        
+        # ملفات النسخ القديمة فيها أعمدة بالجنيه حسب وحدتها (انظر money.pound_columns)
+        money_unit = header.get('money_unit')
         
         stats = {
             'tables_processed': 0,
             'rows_inserted': 0,
             'rows_updated': 0,
             'rows_skipped': 0,
-            'errors': []
+            'errors': [],
+            'warnings': [],
+            'tables': {},
+            'seconds': 0.0
         }
         
-        for table_name, table_info in import_data['tables'].items():
-            print(f"\n⚙ معالجة جدول: {table_name}")
+        import_start = perf_counter()
+        try:
+            # ملف التغييرات فيه الصفوف الحالية كاملة بمعرفاتها
+            delta = header.get('export_type') == 'delta'
+            if delta:
+                print(f"ملف تغييرات مبني على النسخة: {header['base']}")
+                self._check_delta(conn, header, stats)
+                merge_mode = 'replace'
             
-            columns = table_info['columns']
-            data = table_info['data']
-            
-            # إزالة عمود id من الأعمدة للإدراج (سيتم إنشاؤه تلقائياً)
-            insert_columns = [col for col in columns if col not in ['id', 'created_at', 'updated_at']]
-            
-            for row_dict in data:
-                try:
-                    if merge_mode == 'replace':
-                        # حذف السجل القديم إذا كان موجوداً
-                        if 'id' in row_dict and row_dict['id']:
-                            cursor.execute(f"DELETE FROM {table_name} WHERE id = ?", (row_dict['id'],))
-                        
-                        # إدراج السجل الجديد
-                        placeholders = ', '.join(['?' for _ in insert_columns])
-                        columns_str = ', '.join(insert_columns)
-                        values = [row_dict.get(col) for col in insert_columns]
-                        
-                        cursor.execute(
-                            f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})",
-                            values
-                        )
-                        stats['rows_inserted'] += 1
-                    
-                    elif merge_mode == 'update':
-                        # محاولة تحديث السجل أولاً
-                        if 'id' in row_dict and row_dict['id']:
-                            # التحقق من وجود السجل
-                            cursor.execute(f"SELECT id FROM {table_name} WHERE id = ?", (row_dict['id'],))
-                            exists = cursor.fetchone()
-                            
-                            if exists:
-                                # تحديث السجل الموجود
-                                set_clause = ', '.join([f"{col} = ?" for col in insert_columns])
-                                values = [row_dict.get(col) for col in insert_columns]
-                                values.append(row_dict['id'])
-                                
-                                cursor.execute(
-                                    f"UPDATE {table_name} SET {set_clause} WHERE id = ?",
-                                    values
-                                )
-                                stats['rows_updated'] += 1
-                            else:
-                                # إدراج سجل جديد
-                                placeholders = ', '.join(['?' for _ in insert_columns])
-                                columns_str = ', '.join(insert_columns)
-                                values = [row_dict.get(col) for col in insert_columns]
-                                
-                                cursor.execute(
-                                    f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})",
-                                    values
-                                )
-                                stats['rows_inserted'] += 1
-                        else:
-                            # إدراج سجل جديد (بدون id)
-                            placeholders = ', '.join(['?' for _ in insert_columns])
-                            columns_str = ', '.join(insert_columns)
-                            values = [row_dict.get(col) for col in insert_columns]
-                            
-                            cursor.execute(
-                                f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})",
-                                values
-                            )
-                            stats['rows_inserted'] += 1
-                    
-                    elif merge_mode == 'skip':
-                        # إدراج فقط إذا لم يكن السجل موجوداً
-                        if 'id' in row_dict and row_dict['id']:
-                            cursor.execute(f"SELECT id FROM {table_name} WHERE id = ?", (row_dict['id'],))
-                            exists = cursor.fetchone()
-                            
-                            if exists:
-                                stats['rows_skipped'] += 1
-                                continue
-                        
-                        # إدراج سجل جديد
-                        placeholders = ', '.join(['?' for _ in insert_columns])
-                        columns_str = ', '.join(insert_columns)
-                        values = [row_dict.get(col) for col in insert_columns]
-                        
-                        cursor.execute(
-                            f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})",
-                            values
-                        )
-                        stats['rows_inserted'] += 1
+            for kind, table_name, value in records:
+                if kind == 'table':
+                    print(f"\n⚙ معالجة جدول: {table_name}")
+                    insert_columns, sql = self._upsert_sql(table_name, value, merge_mode)
+                    money_columns = pound_columns(money_unit, table_name)
+                    table_rows = 0
+                    table_start = perf_counter()
+                    conn.execute('BEGIN IMMEDIATE')
                 
-                except Exception as e:
-                    error_msg = f"خطأ في جدول {table_name}: {str(e)}"
-                    stats['errors'].append(error_msg)
-                    print(f"⚠ {error_msg}")
+                elif kind == 'rows':
+                    self._import_batch(conn, table_name, insert_columns, sql, value, money_columns,
+                                       merge_mode, stats)
+                    table_rows += len(value)
+                
+                elif kind == 'end':
+                    deleted = value.get('deleted', []) if delta else []
+                    if deleted:
+                        conn.execute(f"DELETE FROM {table_name} WHERE id IN (SELECT value FROM json_each(?))",
+                                     (json.dumps(deleted),))
+                        print(f"🗑 حذف {len(deleted)} سجل")
+                    conn.commit()
+                    
+                    seconds = perf_counter() - table_start
+                    rate = round(table_rows / seconds) if seconds > 0 else 0
+                    stats['tables'][table_name] = {'rows': table_rows, 'seconds': round(seconds, 3),
+                                                   'rows_per_second': rate}
+                    stats['tables_processed'] += 1
+                    print(f"✓ تمت معالجة جدول {table_name}: {table_rows} سجل في {seconds:.2f} ث ({rate} سجل/ث)")
             
-            stats['tables_processed'] += 1
-            print(f"✓ تمت معالجة جدول {table_name}")
-        
-        conn.commit()
-        conn.close()
+            self._save_import_state(conn, header, filepath)
+        finally:
+            # جدول لم يكتمل (ملف تالف) لا يحفظ نصفه
+            conn.rollback()
+            conn.close()
+        stats['seconds'] = round(perf_counter() - import_start, 3)
         
         # طباعة الإحصائيات
         print("\n" + "="*50)
@@ -240,14 +471,218 @@ class DataSync:
         print(f"  • السجلات المُحدثة: {stats['rows_updated']}")
         print(f"  • السجلات المتخطاة: {stats['rows_skipped']}")
         print(f"  • الأخطاء: {len(stats['errors'])}")
+        print(f"  • الزمن: {stats['seconds']:.2f} ث")
         print("="*50)
         
         return stats
     
-    def create_daily_backup(self):
-        """إنشاء نسخة احتياطية يومية"""
+    def _check_delta(self, conn, header, stats):
+        """التأكد أن ملف التغييرات هو التالي بعد آخر نسخة مستوردة من نفس المصدر"""
+        state = conn.execute('''
+            SELECT base, base_date, watermark, last_file FROM import_state WHERE source = ?
+        ''', (header.get('database_name'),)).fetchone()
+        if state is None:
+            # قاعدة منسوخة من المصدر مباشرة (نسخة كاملة snapshot مثلاً) لا سجل لها
+            warning = f"لا يوجد سجل باستيراد النسخة {header['base']} في هذه القاعدة، تأكد أنها مبنية عليها"
+            print(f"⚠ تحذير: {warning}")
+            stats['warnings'].append(warning)
+            return
+        
+        base, base_date, watermark, last_file = state
+        # ملفات التغييرات القديمة ليس في رأسها base_date
+        if header.get('base_date', base_date) != base_date or header['base'] != base:
+            raise ValueError(f"ملف التغييرات مبني على النسخة {header['base']}، "
+                             f"وآخر نسخة كاملة مستوردة هي {base}")
+        if header.get('since') != watermark:
+            raise ValueError(f"ملف التغييرات ليس التالي بعد آخر ملف مستورد ({last_file})، "
+                             f"الملف السابق له: {header.get('previous')}")
+    
+    def _save_import_state(self, conn, header, filepath):
+        """حفظ آخر نسخة مستوردة من المصدر (ملف كامل يبدأ سلسلة جديدة)"""
+        filename = os.path.basename(filepath)
+        if header.get('export_type') == 'delta':
+            conn.execute('''
+                UPDATE import_state SET watermark = ?, last_file = ?, imported_at = ? WHERE source = ?
+            ''', (header['watermark'], filename, datetime.now().isoformat(), header.get('database_name')))
+        else:
+            conn.execute('''
+                INSERT OR REPLACE INTO import_state (source, base, base_date, watermark, last_file, imported_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (header.get('database_name'), filename, header.get('export_date', ''), header.get('watermark'),
+                  filename, datetime.now().isoformat()))
+        conn.commit()
+    
+    def _upsert_sql(self, table_name, columns, merge_mode):
+        """(أعمدة الإدراج، جملة INSERT ... ON CONFLICT(id)) لجدول حسب طريقة الدمج"""
+        if merge_mode == 'replace':
+            # السجل يصبح كما في الملف بالضبط (ومنه تاريخ الإنشاء)
+            insert_columns = list(columns)
+        else:
+            # تاريخ الإنشاء والتعديل يبقى كما في القاعدة (أو الافتراضي للسجل الجديد)
+            insert_columns = [col for col in columns if col not in ['created_at', 'updated_at']]
+        
+        updates = ', '.join(f"{col} = excluded.{col}" for col in insert_columns if col != 'id')
+        conflict = f"DO UPDATE SET {updates}" if merge_mode != 'skip' and updates else "DO NOTHING"
+        sql = (f"INSERT INTO {table_name} ({', '.join(insert_columns)}) "
+               f"VALUES ({', '.join('?' for _ in insert_columns)}) ON CONFLICT(id) {conflict}")
+        return insert_columns, sql
+    
+    def _import_batch(self, conn, table_name, insert_columns, sql, rows, money_columns, merge_mode, stats):
+        """كتابة دفعة صفوف بجملة واحدة، وعند خطأ صفاً صفاً لتسجيل الصفوف الخاطئة فقط"""
+        params = []
+        for row_dict in rows:
+            try:
+                for col in money_columns:
+                    if row_dict.get(col) is not None:
+                        row_dict[col] = to_piasters(row_dict[col])
+            except Exception as e:
+                error_msg = f"خطأ في جدول {table_name}: {str(e)}"
+                stats['errors'].append(error_msg)
+                print(f"⚠ {error_msg}")
+                continue
+            params.append([row_dict.get(col) for col in insert_columns])
+        
+        # السجلات الموجودة قبل الكتابة هي المحدثة (أو المتخطاة في skip)
+        existing_key = 'rows_skipped' if merge_mode == 'skip' else 'rows_updated'
+        id_index = insert_columns.index('id') if 'id' in insert_columns else None
+        ids = [row[id_index] for row in params if row[id_index] is not None] if id_index is not None else []
+        existing = conn.execute(f"SELECT COUNT(*) FROM {table_name} WHERE id IN (SELECT value FROM json_each(?))",
+                                (json.dumps(ids),)).fetchone()[0]
+        
+        conn.execute('SAVEPOINT import_batch')
+        try:
+            conn.executemany(sql, params)
+            stats[existing_key] += existing
+            stats['rows_inserted'] += len(params) - existing
+        except sqlite3.Error:
+            conn.execute('ROLLBACK TO import_batch')
+            for row in params:
+                try:
+                    exists = id_index is not None and conn.execute(
+                        f"SELECT 1 FROM {table_name} WHERE id = ?", (row[id_index],)).fetchone()
+                    conn.execute(sql, row)
+                    stats[existing_key if exists else 'rows_inserted'] += 1
+                except sqlite3.Error as e:
+                    error_msg = f"خطأ في جدول {table_name}: {str(e)}"
+                    stats['errors'].append(error_msg)
+                    print(f"⚠ {error_msg}")
+        conn.execute('RELEASE import_batch')
+    
+    def snapshot(self, filename=None, progress=None):
+        """
+        نسخة كاملة من ملف قاعدة البيانات صفحة بصفحة (sqlite3 backup)
+        
+        أسرع من التصدير لأن الصفحات تنسخ كما هي بدون تحويل القيم، وتشمل كل
+        الجداول والفهارس (ومنها ما ليس في EXPORT_TABLES مثل daily_reports).
+        النسخ على دفعات SNAPSHOT_PAGES صفحة والبرنامج يعمل، وإذا كتب اتصال
+        آخر أثناء النسخ يعيد SQLite النسخ من البداية، فالنسخة متسقة دائماً.
+        ملفات الأرشيف السنوية (archive.py) ملفات منفصلة ولا تنسخ هنا.
+        
+        Args:
+            filename: اسم الملف (اختياري، الافتراضي بالتاريخ والوقت)
+            progress: دالة (الصفحات المنسوخة، كل الصفحات) تستدعى بعد كل دفعة
+        
+        Returns:
+            str: مسار الملف
+        """
+        if filename is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            filename = f"snapshot_{timestamp}{SNAPSHOT_EXTENSION}"
+        filepath = os.path.join(self.exports_folder, filename)
+        
+        # النسخ في ملف مؤقت جديد حتى لا يبقى ملف ناقص إذا توقف
+        if os.path.exists(filepath + '.tmp'):
+            os.remove(filepath + '.tmp')
+        
+        def report(status, remaining, total):
+            if progress is not None:
+                progress(total - remaining, total)
+        
+        start = perf_counter()
+        source = self.get_connection()
+        target = sqlite3.connect(filepath + '.tmp')
+        try:
+            source.backup(target, pages=SNAPSHOT_PAGES, progress=report)
+        finally:
+            target.close()
+            source.close()
+        os.replace(filepath + '.tmp', filepath)
+        
+        print(f"✓ تم حفظ نسخة كاملة في: {filepath}")
+        print(f"حجم الملف: {os.path.getsize(filepath) / 1024:.2f} KB ({perf_counter() - start:.2f} ث)")
+        
+        return filepath
+    
+    def restore_snapshot(self, filepath):
+        """
+        استعادة قاعدة البيانات من نسخة كاملة (snapshot) باستبدال الملف
+        
+        يجب إغلاق كل اتصالات البرنامج بالقاعدة قبلها (close_worker ثم
+        Database.close)، والبرنامج يفتح من جديد بعدها (ترحيلات المخطط تطبق
+        على النسخ القديمة عند الفتح). الملف الحالي يبقى باسم
+        {db_name}.before_restore.
+        
+        Returns:
+            str: مسار الملف السابق (None إذا لم تكن هناك قاعدة بيانات)
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"الملف غير موجود: {filepath}")
+        
+        # التأكد أن النسخة قاعدة بيانات سليمة قبل لمس الملف الحالي
+        check = sqlite3.connect(filepath)
+        try:
+            result = check.execute('PRAGMA quick_check').fetchone()[0]
+        except sqlite3.DatabaseError as e:
+            raise ValueError(f"ملف النسخة ليس قاعدة بيانات صالحة: {e}")
+        finally:
+            check.close()
+        if result != 'ok':
+            raise ValueError(f"ملف النسخة تالف: {result}")
+        
+        # النسخة بجانب الملف الحالي (نفس القرص) فيكون الاستبدال فورياً
+        restore_path = self.db_name + '.restore'
+        shutil.copyfile(filepath, restore_path)
+        
+        previous = None
+        if os.path.exists(self.db_name):
+            # دمج WAL في الملف الحالي حتى يكون الملف السابق كاملاً وحده
+            conn = sqlite3.connect(self.db_name)
+            try:
+                busy = conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()[0]
+            finally:
+                conn.close()
+            if busy:
+                os.remove(restore_path)
+                raise RuntimeError("قاعدة البيانات مفتوحة من اتصال آخر، أغلق البرنامج أولاً")
+            previous = self.db_name + '.before_restore'
+            os.replace(self.db_name, previous)
+        os.replace(restore_path, self.db_name)
+        
+        # ملفات WAL القديمة لا تخص الملف الجديد
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(self.db_name + suffix):
+                os.remove(self.db_name + suffix)
+        
+        print(f"✓ تمت استعادة قاعدة البيانات من: {filepath}")
+        return previous
+    
+    def create_daily_backup(self, full=False):
+        """
+        إنشاء نسخة احتياطية يومية
+        
+        تصدر التغييرات منذ آخر نسخة فقط (export_delta)، ونسخة كاملة إذا طلب
+        full أو لم تكن هناك سلسلة صالحة أو مر FULL_BACKUP_DAYS على آخر نسخة كاملة.
+        """
+        state = self._load_state()
+        if not full and state is not None:
+            base_age = datetime.now() - datetime.fromisoformat(state['base_date'])
+            if base_age.days < FULL_BACKUP_DAYS:
+                filepath = self.export_delta()
+                if filepath is not None:
+                    return filepath
+        
         today = datetime.now().strftime("%Y-%m-%d")
-        filename = f"daily_backup_{today}.json"
+        filename = f"daily_backup_{today}{self.extension}"
         
         # التحقق من وجود نسخة احتياطية لهذا اليوم
         filepath = os.path.join(self.exports_folder, filename)
@@ -255,7 +690,7 @@ class DataSync:
             print(f"⚠ توجد نسخة احتياطية لهذا اليوم بالفعل: {filepath}")
             # إنشاء نسخة بالوقت الحالي
             timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            filename = f"backup_{timestamp}.json"
+            filename = f"backup_{timestamp}{self.extension}"
         
         return self.export_all_data(filename)
     
@@ -267,7 +702,7 @@ class DataSync:
         
         backups = []
         for filename in os.listdir(self.exports_folder):
-            if filename.endswith('.json'):
+            if filename.endswith(BACKUP_EXTENSIONS + (SNAPSHOT_EXTENSION,)) and filename != EXPORT_STATE_FILE:
                 filepath = os.path.join(self.exports_folder, filename)
                 size = os.path.getsize(filepath) / 1024  # KB
                 modified = datetime.fromtimestamp(os.path.getmtime(filepath))
@@ -308,8 +743,13 @@ class DataSync:
         cutoff_date = datetime.now().timestamp() - (keep_days * 24 * 60 * 60)
         deleted_count = 0
         
+        # ملفات السلسلة الحالية لازمة لاستعادة آخر نسخة (النسخة الكاملة وتغييراتها)
+        state = self._load_state()
+        keep = set(state['chain']) if state is not None else set()
+        keep.add(EXPORT_STATE_FILE)
+        
         for filename in os.listdir(self.exports_folder):
-            if filename.endswith('.json'):
+            if filename.endswith(BACKUP_EXTENSIONS + (SNAPSHOT_EXTENSION,)) and filename not in keep:
                 filepath = os.path.join(self.exports_folder, filename)
                 if os.path.getmtime(filepath) < cutoff_date:
                     os.remove(filepath)
@@ -350,7 +790,8 @@ if __name__ == "__main__":
         print("2. استيراد البيانات")
         print("3. عرض النسخ الاحتياطية")
         print("4. حذف النسخ القديمة")
-        print("5. خروج")
+        print("5. نسخة كاملة سريعة (snapshot)")
+        print("6. خروج")
         print("=" * 60)
         
         choice = input("\nاختيارك: ").strip()
@@ -402,6 +843,10 @@ if __name__ == "__main__":
                 print("⚠ يرجى إدخال رقم صحيح")
             
         elif choice == '5':
+            print("\n📤 نسخة كاملة...")
+            sync.snapshot(progress=lambda copied, total: print(f"  {copied}/{total} صفحة"))
+            
+        elif choice == '6':
             print("\n👋 إلى اللقاء!")
             break
         
@@ -1,869 +1,853 @@
 import sqlite3
 import os
+import json
+import base64
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from archive import (ARCHIVE_COLUMNS, CARRY_ITEM, CARRY_ALLOWANCE_ITEM, archive_path, archive_alias,
+                     create_archive_schema, day_year)
+from migrations import apply_migrations, DAY_NUMBER_SQL, CHANGELOG_TABLES
+from money import to_piasters
+from query_stats import QueryStats, instrument_methods
+from records import (SellerTransaction, Transfer, SellerAccount, Expense, ClientInvoice, SearchMatch, MaintenanceRun,
+                     ChangeEntry, record_factory)
+from reference_cache import ReferenceCache
+from text_search import normalize_arabic, build_match_query, SEARCH_KINDS, SEARCH_KIND_SLOTS
+
+# إعدادات الاتصال التي تطبق مرة واحدة عند فتح كل اتصال
+CONNECTION_PRAGMAS = (
+    # قبل WAL (أول كتابة في الملف): يسري على الملفات الجديدة فقط، والقديمة
+    # تحول مرة واحدة من شاشة التشخيص (maintenance.enable_auto_vacuum)
+    ('auto_vacuum', 'INCREMENTAL'),
+    ('journal_mode', 'WAL'),        # القراءة لا تنتظر الكتابة
+    ('synchronous', 'NORMAL'),      # آمن مع WAL وأسرع من FULL
+    ('cache_size', -16000),         # حوالي 16 ميجا للصفحات
+    ('mmap_size', 268435456),       # 256 ميجا قراءة مباشرة من الذاكرة
+    ('foreign_keys', 'ON'),
+    ('temp_store', 'MEMORY'),
+)
+
+# عدد الاستعلامات المجهزة التي يحتفظ بها كل اتصال
+STATEMENT_CACHE_SIZE = 256
+
+# عدد الصفوف الافتراضي في كل صفحة من دوال *_page
+PAGE_SIZE = 100
+
+# عدد آخر صفوف سجل التغييرات التي تبقى بعد prune_changelog
+CHANGELOG_KEEP = 200000
+
+# المبالغ والأسعار محفوظة بالقرش (انظر money.py): القراءة تقسم في SQL والكتابة تمرر to_piasters
+TRANSACTION_COLUMNS = 'id, amount / 100.0, status, count, weight, price / 100.0, item_name, date, day_name, equipment, note'
+EXPENSE_COLUMNS = 'id, description, amount / 100.0, expense_date, note'
+TRANSFER_COLUMNS = 'id, shipment_name, seller_name, item_name, unit_price / 100.0, weight, count, equipment, transfer_type'
+INVOICE_COLUMNS = ('id, owner_name, nolon / 100.0, commission, mashal / 100.0, rent / 100.0, cash / 100.0, '
+                   'invoice_date, net_amount / 100.0, final_total / 100.0')
+
+# أثر المعاملة على رصيد البائع: البضاعة تزيده، والمدفوع والسماح ينقصانه
+BALANCE_AMOUNT_SQL = "CASE WHEN status IN ('مدفوع', 'سماح') THEN -amount ELSE amount END"
+
+
+def connect(db_name, stats=None):
+    """فتح اتصال جديد بقاعدة البيانات مع تطبيق إعدادات الأداء (stats: QueryStats لقياس كل جملة)"""
+    factory = stats.connection_factory() if stats is not None else sqlite3.Connection
+    # check_same_thread=False حتى يمكن إغلاق الاتصال من خيط الواجهة عند الخروج
+    # كل اتصال يستخدمه خيط واحد فقط (انظر Database.get_connection)
+    conn = sqlite3.connect(db_name, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False, factory=factory)
+    for pragma, value in CONNECTION_PRAGMAS:
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    # تستخدمها triggers فهرس البحث، لذلك يجب تسجيلها في كل اتصال يكتب على الجداول
+    conn.create_function('arabic_normalize', 1, normalize_arabic, deterministic=True)
+    return conn
+
+
+_shared_databases = {}
+_shared_lock = threading.Lock()
+
+
+def get_database(db_name="company_accounts.db"):
+    """
+    قاعدة البيانات المشتركة للبرنامج كله
+    
+    تنشأ عند أول طلب فقط ثم يعاد نفس الكائن لكل الصفحات، لذلك فتح
+    أي صفحة لا يفتح اتصالات جديدة ولا يراجع المخطط.
+    """
+    key = os.path.abspath(db_name)
+    with _shared_lock:
+        db = _shared_databases.get(key)
+        if db is None:
+            db = _shared_databases[key] = Database(db_name)
+        return db
+
+
+def day_number(value):
+    """رقم اليوم (مثل date.toordinal) لتاريخ نصي YYYY-MM-DD أو YYYY/MM/DD أو كائن date"""
+    if hasattr(value, 'toordinal'):
+        return value.toordinal()
+    return datetime.strptime(str(value).strip().replace('/', '-'), '%Y-%m-%d').toordinal()
+
+
+def day_to_date(day):
+    """نص التاريخ YYYY-MM-DD لرقم يوم"""
+    return datetime.fromordinal(day).strftime('%Y-%m-%d')
+
+
+def _name_key(row):
+    """مفتاح البحث بالاسم في الجداول المرجعية (مطابقة تامة مثل WHERE name = ?)"""
+    return row[1]
+
+
+def _meal_key(row):
+    """أسماء الوجبات تطابق بدون اعتبار حالة الأحرف أو المسافات الزائدة"""
+    return (row[1] or '').strip().lower()
+
+
+def _encode_token(key, row_id):
+    """رمز متابعة الصفحة التالية (آخر مفتاح ترتيب ومعرف في الصفحة الحالية)"""
+    raw = json.dumps([key, row_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def _decode_token(token):
+    """(المفتاح، المعرف) من رمز المتابعة، أو None للصفحة الأولى"""
+    if not token:
+        return None
+    try:
+        key, row_id = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"رمز صفحة غير صالح: {token!r}") from e
+    return key, row_id
+
 
 class Database:
-    def __init__(self, db_name="company_accounts.db"):
+    # ملفات قواعد البيانات التي تمت تهيئة مخططها في هذه العملية
+    _initialized_paths = set()
+    _init_lock = threading.Lock()
+
+    # دوال لا تقاس (إدارة الاتصال والمعاملات، وليست استعلامات)
+    _UNMEASURED = ('get_connection', 'transaction', 'close', 'init_database', 'cache_stats')
+
+    def __init__(self, db_name="company_accounts.db", stats=None):
         self.db_name = db_name
-        self.init_database()
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.cache = ReferenceCache()
+        # قياس الزمن اختياري (انظر query_stats.py)، None = بدون قياس
+        self.stats = stats if stats is not None else QueryStats.from_environment()
+        if self.stats is not None:
+            instrument_methods(self, self.stats, skip=self._UNMEASURED)
     
     def get_connection(self):
-        """إنشاء اتصال بقاعدة البيانات"""
-        return sqlite3.connect(self.db_name)
+        """الاتصال الدائم بقاعدة البيانات الخاص بالخيط الحالي"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = connect(self.db_name, self.stats)
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+            # التهيئة تتم مرة واحدة عند أول اتصال بالملف في العملية كلها
+            if os.path.abspath(self.db_name) not in Database._initialized_paths:
+                self.init_database()
+        return conn
     
-    def init_database(self):
-        """تهيئة قاعدة البيانات وإنشاء الجداول الأساسية"""
+    @contextmanager
+    def transaction(self):
+        """
+        تنفيذ عدة عمليات كتابة كوحدة واحدة على نفس الاتصال
+        
+        كل دوال الكتابة داخل الكتلة لا تحفظ بنفسها، ويتم الحفظ مرة واحدة
+        في النهاية. إذا حدث خطأ في أي خطوة يتم التراجع عن الكتلة كلها.
+        
+        الاستخدام:
+            with db.transaction():
+                db.add_agriculture_transfer(...)
+                db.add_seller_transaction(...)
+        
+        يمكن تداخل الكتل؛ الكتلة الداخلية تصبح SAVEPOINT يتراجع وحده عند الخطأ.
+        """
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # جدول العملاء
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT,
-                address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول الموردين
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS suppliers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                phone TEXT,
-                address TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول المنتجات (الخضروات والفواكه)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT,
-                unit TEXT,
-                price REAL DEFAULT 0,
-                stock_quantity REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول المبيعات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                customer_id INTEGER,
-                sale_date DATE NOT NULL,
-                total_amount REAL DEFAULT 0,
-                paid_amount REAL DEFAULT 0,
-                remaining_amount REAL DEFAULT 0,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (customer_id) REFERENCES customers(id)
-            )
-        ''')
-        
-        # جدول تفاصيل المبيعات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sale_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sale_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                unit_price REAL NOT NULL,
-                total_price REAL NOT NULL,
-                FOREIGN KEY (sale_id) REFERENCES sales(id),
-                FOREIGN KEY (product_id) REFERENCES products(id)
-            )
-        ''')
-        
-        # جدول المشتريات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS purchases (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                supplier_id INTEGER,
-                purchase_date DATE NOT NULL,
-                total_amount REAL DEFAULT 0,
-                paid_amount REAL DEFAULT 0,
-                remaining_amount REAL DEFAULT 0,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
-            )
-        ''')
-        
-        # جدول تفاصيل المشتريات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS purchase_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                purchase_id INTEGER NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity REAL NOT NULL,
-                unit_price REAL NOT NULL,
-                total_price REAL NOT NULL,
-                FOREIGN KEY (purchase_id) REFERENCES purchases(id),
-                FOREIGN KEY (product_id) REFERENCES products(id)
-            )
-        ''')
-        
-        # جدول المدفوعات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS payments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type TEXT NOT NULL, -- 'sale' or 'purchase'
-                reference_id INTEGER NOT NULL, -- sale_id or purchase_id
-                amount REAL NOT NULL,
-                payment_date DATE NOT NULL,
-                payment_method TEXT,
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول حسابات البائعين
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sellers_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                seller_name TEXT NOT NULL,
-                phone TEXT, -- رقم الهاتف (جديد)
-                remaining_amount REAL DEFAULT 0,
-                total_credit REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        depth = getattr(self._local, 'depth', 0)
+        savepoint = f'sp_{depth}'
         
-        # محاولة إضافة عمود phone إذا لم يكن موجوداً
-        try:
-            cursor.execute('ALTER TABLE sellers_accounts ADD COLUMN phone TEXT')
-        except sqlite3.OperationalError:
-            pass
-        
-        # جدول معاملات البائعين (الحساب الجاري)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS seller_transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                seller_id INTEGER NOT NULL,
-                amount REAL DEFAULT 0,
-                status TEXT, -- مدفوع / متبقي
-                count REAL DEFAULT 0,
-                weight REAL DEFAULT 0,
-                price REAL DEFAULT 0,
-                item_name TEXT,
-                date TEXT,
-                day_name TEXT,
-                equipment TEXT,
-                note TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (seller_id) REFERENCES sellers_accounts(id) ON DELETE CASCADE
-            )
-        ''')
-        
-        # جدول الوجبات / الأصناف
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS meals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                price_per_kg REAL DEFAULT 0,
-                equipment_weight REAL DEFAULT 0, -- وزن العدة المقابل (مثلاً 15 كيلو)
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # جدول ترحيل الزراعة
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS agriculture_transfers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                shipment_name TEXT,
-                seller_name TEXT,
-                item_name TEXT,
-                unit_price REAL DEFAULT 0,
-                weight REAL DEFAULT 0,
-                count REAL DEFAULT 0,
-                equipment TEXT,
-                transfer_type TEXT, -- 'in' or 'out'
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # جدول المنصرفات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS expenses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                description TEXT NOT NULL,
-                amount REAL NOT NULL,
-                expense_date DATE NOT NULL,
-                note TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        if depth == 0:
+            # IMMEDIATE يحجز الكتابة من البداية بدلاً من الفشل في منتصف الكتلة
+            conn.execute('BEGIN IMMEDIATE')
+            self._local.touched = set()
+        else:
+            conn.execute(f'SAVEPOINT {savepoint}')
+        self._local.depth = depth + 1
         
-        # محاولة إضافة عمود transfer_type إذا لم يكن موجوداً
         try:
-            cursor.execute('ALTER TABLE agriculture_transfers ADD COLUMN transfer_type TEXT')
-        except sqlite3.OperationalError:
-            pass
+            yield self
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.rollback()
+                self._end_transaction()
+            else:
+                conn.execute(f'ROLLBACK TO {savepoint}')
+                conn.execute(f'RELEASE {savepoint}')
+            raise
         
-        # محاولة إضافة عمود count إذا لم يكن موجوداً (للنسخ القديمة من قاعدة البيانات)
-        try:
-            cursor.execute('ALTER TABLE agriculture_transfers ADD COLUMN count REAL DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass # العمود موجود بالفعل
-
-        # جدول العدة
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS inventory_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                quantity INTEGER DEFAULT 0,
-                price REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        self._local.depth = depth
+        if depth == 0:
+            try:
+                conn.commit()
+            finally:
+                self._end_transaction()
+        else:
+            conn.execute(f'RELEASE {savepoint}')
+    
+    def _end_transaction(self):
+        """تفريغ الجداول المرجعية التي تمت الكتابة عليها بعد انتهاء المعاملة"""
+        touched, self._local.touched = self._local.touched, set()
+        if touched:
+            self.cache.invalidate(*touched)
+        # data_version لا يتغير بكتابات نفس الاتصال (انظر fingerprint)
+        self._local.fingerprints = None
+    
+    @contextmanager
+    def _write(self, *tables):
+        """
+        تنفيذ عملية كتابة: حفظ عند النجاح وتراجع عند الخطأ (أو الانضمام لمعاملة مفتوحة)
         
-        # إضافة عمود السعر إذا لم يكن موجوداً (للتوافق مع قواعد البيانات القديمة)
-        try:
-            cursor.execute('ALTER TABLE inventory_items ADD COLUMN price REAL DEFAULT 0')
-        except sqlite3.OperationalError:
-            pass # العمود موجود بالفعل
-
-        # جدول فواتير العملاء
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS client_invoices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                owner_name TEXT,
-                nolon REAL DEFAULT 0,
-                commission TEXT DEFAULT '10%',
-                mashal REAL DEFAULT 0,
-                rent REAL DEFAULT 0,
-                cash REAL DEFAULT 0,
-                invoice_date TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # جدول التقارير اليومية
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS daily_reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                report_date DATE NOT NULL UNIQUE,
-                total_collection REAL DEFAULT 0,
-                remaining_profit REAL DEFAULT 0,
-                total_expenses REAL DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        tables: الجداول المرجعية التي تعدلها العملية، تفرغ من الذاكرة المؤقتة
+        عند انتهاء المعاملة.
+        """
+        with self.transaction():
+            self._local.touched.update(tables)
+            yield self.get_connection().cursor()
+    
+    def _reference(self, table, sql, key_func, record_class=None):
+        """(الصفوف، فهرس بالاسم) لجدول مرجعي من الذاكرة المؤقتة أو من قاعدة البيانات"""
+        def load():
+            if record_class is None:
+                return self.get_connection().execute(sql).fetchall()
+            return self._query(record_class, sql).fetchall()
+        
+        # داخل معاملة كتبت على الجدول: نقرأ التعديلات غير المحفوظة مباشرة
+        bypass = table in getattr(self._local, 'touched', ())
+        return self.cache.get(table, load, key_func, bypass=bypass)
+    
+    def cache_stats(self):
+        """عدادات الذاكرة المؤقتة للجداول المرجعية: {الجدول: {'hits': n, 'misses': n}}"""
+        return self.cache.stats()
+    
+    def _query(self, record_class, sql, params=()):
+        """تنفيذ استعلام قراءة تبنى صفوفه مباشرة كسجلات من records.py"""
+        cursor = self.get_connection().cursor()
+        cursor.row_factory = record_factory(record_class)
+        return cursor.execute(sql, params)
 
-        conn.commit()
-        conn.close()
+    def close(self):
+        """إغلاق جميع الاتصالات المفتوحة (يستدعى عند إغلاق البرنامج)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"خطأ أثناء إغلاق الاتصال: {e}")
+        self._local = threading.local()
+    
+    def init_database(self):
+        """تهيئة قاعدة البيانات وتطبيق ترحيلات المخطط المعلقة (مرة واحدة لكل ملف)"""
+        key = os.path.abspath(self.db_name)
+        with Database._init_lock:
+            if key in Database._initialized_paths:
+                return
+            applied = apply_migrations(self.get_connection())
+            Database._initialized_paths.add(key)
+        if applied:
+            print(f"تم تطبيق ترحيلات المخطط: {', '.join(str(v) for v in applied)}")
         print("تم تهيئة قاعدة البيانات بنجاح")
 
     # --- طرق التعامل مع العدة ---
     def get_all_inventory(self):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, quantity, price FROM inventory_items ORDER BY name')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        rows, _ = self._reference('inventory_items', 'SELECT id, name, quantity, price / 100.0 FROM inventory_items ORDER BY name', _name_key)
+        return list(rows)
 
     def add_inventory_item(self, name, quantity, price=0):
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO inventory_items (name, quantity, price) VALUES (?, ?, ?)', (name, quantity, price))
-            conn.commit()
+            with self._write('inventory_items') as cursor:
+                cursor.execute('INSERT INTO inventory_items (name, quantity, price) VALUES (?, ?, ?)', (name, quantity, to_piasters(price)))
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
 
     def update_inventory_item(self, item_id, name, price):
         """تحديث اسم وسعر العدة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE inventory_items SET name = ?, price = ? WHERE id = ?', (name, price, item_id))
-        conn.commit()
-        conn.close()
+        with self._write('inventory_items') as cursor:
+            cursor.execute('UPDATE inventory_items SET name = ?, price = ? WHERE id = ?', (name, to_piasters(price), item_id))
 
     def update_inventory_quantity(self, item_id, change_amount):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('UPDATE inventory_items SET quantity = quantity + ? WHERE id = ?', (change_amount, item_id))
-        conn.commit()
-        conn.close()
+        with self._write('inventory_items') as cursor:
+            cursor.execute('UPDATE inventory_items SET quantity = quantity + ? WHERE id = ?', (change_amount, item_id))
 
     def delete_inventory_item(self, item_id):
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM inventory_items WHERE id = ?', (item_id,))
-        conn.commit()
-        conn.close()
+        with self._write('inventory_items') as cursor:
+            cursor.execute('DELETE FROM inventory_items WHERE id = ?', (item_id,))
 
     def get_all_sellers_accounts(self):
         """جلب جميع حسابات البائعين"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, seller_name, remaining_amount, total_credit, phone FROM sellers_accounts ORDER BY seller_name')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        rows, _ = self._sellers()
+        return list(rows)
+
+    def _sellers(self):
+        """حسابات البائعين من الذاكرة المؤقتة مع فهرس بالاسم"""
+        return self._reference('sellers_accounts', 'SELECT id, seller_name, remaining_amount / 100.0, total_credit / 100.0, phone FROM sellers_accounts ORDER BY seller_name', _name_key, SellerAccount)
+
+    def get_seller_account(self, seller_id):
+        """جلب حساب بائع بالمعرف"""
+        return self._query(SellerAccount, 'SELECT id, seller_name, remaining_amount / 100.0, total_credit / 100.0 FROM sellers_accounts WHERE id = ?', (seller_id,)).fetchone()
 
     def get_sellers_with_balances(self):
-        """جلب حسابات البائعين مع الأرصدة المحسوبة من المعاملات"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # استعلام لجلب البيانات وحساب المجاميع
+        """جلب حسابات البائعين مع الأرصدة من ملخص seller_balances"""
+        # الملخص تحدثه الـ triggers على seller_transactions (انظر migrations.py)
         # نفترض أن remaining_amount في جدول sellers_accounts هو الرصيد الافتتاحي
+        # المتبقي = الرصيد الافتتاحي + البضاعة - المدفوعات (شاملة السماح)
+        # total_credit في السجل الناتج = إجمالي السماح
         query = '''
             SELECT 
                 s.id, 
                 s.seller_name, 
-                s.remaining_amount, -- الرصيد الافتتاحي
+                (COALESCE(s.remaining_amount, 0.0) + COALESCE(b.total_goods, 0.0) - COALESCE(b.total_paid, 0.0)) / 100.0,
+                COALESCE(b.total_allowance, 0.0) / 100.0,
                 s.phone,
-                (SELECT SUM(amount) FROM seller_transactions WHERE seller_id = s.id AND status != 'مدفوع') as total_goods,
-                (SELECT SUM(amount) FROM seller_transactions WHERE seller_id = s.id AND status = 'مدفوع') as total_paid,
-                (SELECT SUM(amount) FROM seller_transactions WHERE seller_id = s.id AND item_name LIKE '%سماح%') as total_allowance
+                b.last_payment_date,
+                b.last_transaction_date
             FROM sellers_accounts s
+            LEFT JOIN seller_balances b ON b.seller_id = s.id
             ORDER BY s.seller_name
         '''
-        cursor.execute(query)
-        results = cursor.fetchall()
-        conn.close()
-        
-        processed_results = []
-        for row in results:
-            s_id = row[0]
-            name = row[1]
-            initial_balance = row[2] or 0.0
-            phone = row[3]
-            total_goods = row[4] or 0.0
-            total_paid = row[5] or 0.0
-            total_allowance = row[6] or 0.0
-            
-            # حساب المتبقي النهائي
-            # المتبقي = الرصيد الافتتاحي + البضاعة - المدفوعات (شاملة السماح)
-            final_remaining = initial_balance + total_goods - total_paid
-            
-            # التنسيق: id, name, calculated_remaining, calculated_allowance, phone
-            processed_results.append((s_id, name, final_remaining, total_allowance, phone))
-            
-        return processed_results
+        return self._query(SellerAccount, query).fetchall()
 
     # --- حسابات العملاء ---
     def add_client_debt(self, client_name, amount):
         """إضافة دين على البرنامج لصالح العميل (ترحيل عميل)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # التأكد من وجود جدول العملاء
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_name TEXT NOT NULL UNIQUE,
-                balance REAL DEFAULT 0,
-                phone TEXT
-            )
-        ''')
-        
-        # التحقق مما إذا كان العميل موجوداً
-        cursor.execute('SELECT id, balance FROM clients_accounts WHERE client_name = ?', (client_name,))
-        result = cursor.fetchone()
-        
-        if result:
-            # تحديث الرصيد (إضافة المبلغ للرصيد الحالي)
-            new_balance = result[1] + amount
-            cursor.execute('UPDATE clients_accounts SET balance = ? WHERE id = ?', (new_balance, result[0]))
-        else:
-            # إنشاء عميل جديد
-            cursor.execute('INSERT INTO clients_accounts (client_name, balance) VALUES (?, ?)', (client_name, amount))
+        with self._write('clients_accounts') as cursor:
+            # التحقق مما إذا كان العميل موجوداً
+            cursor.execute('SELECT id, balance FROM clients_accounts WHERE client_name = ?', (client_name,))
+            result = cursor.fetchone()
             
-        conn.commit()
-        conn.close()
+            if result:
+                # تحديث الرصيد (إضافة المبلغ للرصيد الحالي)
+                new_balance = result[1] + to_piasters(amount)
+                cursor.execute('UPDATE clients_accounts SET balance = ? WHERE id = ?', (new_balance, result[0]))
+            else:
+                # إنشاء عميل جديد
+                cursor.execute('INSERT INTO clients_accounts (client_name, balance) VALUES (?, ?)', (client_name, to_piasters(amount)))
+
+    def _clients(self):
+        """حسابات العملاء من الذاكرة المؤقتة مع فهرس بالاسم"""
+        return self._reference('clients_accounts', 'SELECT id, client_name, balance / 100.0, phone FROM clients_accounts ORDER BY client_name', _name_key)
 
     def get_all_clients_accounts(self):
         """جلب جميع حسابات العملاء"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_name TEXT NOT NULL UNIQUE,
-                balance REAL DEFAULT 0,
-                phone TEXT
-            )
-        ''')
-        cursor.execute('SELECT id, client_name, balance, phone FROM clients_accounts ORDER BY client_name')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        rows, _ = self._clients()
+        return list(rows)
 
     def add_client_account(self, client_name, phone=""):
         """إضافة حساب عميل جديد"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Ensure table exists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_name TEXT NOT NULL UNIQUE,
-                balance REAL DEFAULT 0,
-                phone TEXT
-            )
-        ''')
-        
         try:
-            cursor.execute('INSERT INTO clients_accounts (client_name, balance, phone) VALUES (?, 0, ?)', (client_name, phone))
-            conn.commit()
+            with self._write('clients_accounts') as cursor:
+                cursor.execute('INSERT INTO clients_accounts (client_name, balance, phone) VALUES (?, 0, ?)', (client_name, phone))
             return True
         except sqlite3.IntegrityError:
             return False
-        finally:
-            conn.close()
 
     def delete_client_account(self, client_id):
         """حذف حساب عميل"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM clients_accounts WHERE id = ?', (client_id,))
-        conn.commit()
-        conn.close()
+        with self._write('clients_accounts') as cursor:
+            cursor.execute('DELETE FROM clients_accounts WHERE id = ?', (client_id,))
 
     def get_unique_shipment_names(self):
         """جلب أسماء النقلات الفريدة من جدول ترحيل الزراعة"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT DISTINCT shipment_name FROM agriculture_transfers WHERE shipment_name IS NOT NULL AND shipment_name != "" ORDER BY shipment_name')
-        results = cursor.fetchall()
-        conn.close()
+        results = conn.execute('SELECT DISTINCT shipment_name FROM agriculture_transfers WHERE shipment_name IS NOT NULL AND shipment_name != "" ORDER BY shipment_name').fetchall()
         return [row[0] for row in results]
 
     def get_seller_by_name(self, name):
         """البحث عن بائع بالاسم"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, seller_name, remaining_amount, total_credit FROM sellers_accounts WHERE seller_name = ?', (name,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        _, by_name = self._sellers()
+        return by_name.get(name)
 
     def get_client_by_name(self, name):
         """البحث عن عميل بالاسم"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        # Ensure table exists just in case
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS clients_accounts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_name TEXT NOT NULL UNIQUE,
-                balance REAL DEFAULT 0,
-                phone TEXT
-            )
-        ''')
-        cursor.execute('SELECT id, client_name, balance, phone FROM clients_accounts WHERE client_name = ?', (name,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        _, by_name = self._clients()
+        return by_name.get(name)
 
     
     def add_seller_account(self, seller_name, remaining_amount, total_credit, phone=""):
         """إضافة حساب بائع جديد"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO sellers_accounts (seller_name, remaining_amount, total_credit, phone)
-            VALUES (?, ?, ?, ?)
-        ''', (seller_name, remaining_amount, total_credit, phone))
-        conn.commit()
-        conn.close()
+        with self._write('sellers_accounts') as cursor:
+            cursor.execute('''
+                INSERT INTO sellers_accounts (seller_name, remaining_amount, total_credit, phone)
+                VALUES (?, ?, ?, ?)
+            ''', (seller_name, to_piasters(remaining_amount), to_piasters(total_credit), phone))
     
     def update_seller_account(self, account_id, seller_name, remaining_amount, total_credit):
         """تحديث حساب بائع"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE sellers_accounts 
-            SET seller_name = ?, remaining_amount = ?, total_credit = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (seller_name, remaining_amount, total_credit, account_id))
-        conn.commit()
-        conn.close()
+        with self._write('sellers_accounts') as cursor:
+            cursor.execute('''
+                UPDATE sellers_accounts 
+                SET seller_name = ?, remaining_amount = ?, total_credit = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (seller_name, to_piasters(remaining_amount), to_piasters(total_credit), account_id))
     
     def delete_seller_account(self, account_id):
         """حذف حساب بائع"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM sellers_accounts WHERE id = ?', (account_id,))
-        conn.commit()
-        conn.close()
+        with self._write('sellers_accounts') as cursor:
+            cursor.execute('DELETE FROM sellers_accounts WHERE id = ?', (account_id,))
 
     # --- طرق التعامل مع معاملات البائعين ---
 
     def get_seller_transactions(self, seller_id):
         """جلب جميع معاملات بائع معين"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, amount, status, count, weight, price, item_name, date, day_name, equipment, note 
+        return self._query(SellerTransaction, f'''
+            SELECT {TRANSACTION_COLUMNS} 
+            FROM seller_transactions 
+            WHERE seller_id = ? 
+            ORDER BY day DESC, id DESC
+        ''', (seller_id,)).fetchall()
+
+    def get_seller_statement(self, seller_id):
+        """جلب معاملات بائع من الأقدم للأحدث (ترتيب كشف الحساب)"""
+        return self._query(SellerTransaction, f'''
+            SELECT {TRANSACTION_COLUMNS} 
             FROM seller_transactions 
             WHERE seller_id = ? 
-            ORDER BY date DESC, id DESC
-        ''', (seller_id,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+            ORDER BY day, id DESC
+        ''', (seller_id,)).fetchall()
+
+    def get_paid_transactions(self):
+        """جلب كل التحصيلات (معاملات مدفوع) لكل البائعين مع اسم البائع، الأحدث أولاً"""
+        return self._query(SellerTransaction, '''
+            SELECT t.id, t.amount / 100.0, t.status, t.count, t.weight, t.price / 100.0, t.item_name, t.date, t.day_name, t.equipment, t.note, s.seller_name 
+            FROM seller_transactions t
+            JOIN sellers_accounts s ON s.id = t.seller_id
+            WHERE t.status = 'مدفوع'
+            ORDER BY t.day DESC, t.id DESC
+        ''').fetchall()
+
+    def get_seller_transactions_between(self, seller_id, start_date, end_date):
+        """جلب معاملات بائع من start_date إلى end_date (شاملة الطرفين)، الأحدث أولاً"""
+        start_day, end_day = day_number(start_date), day_number(end_date)
+        archived = self._archive_range('seller_transactions', start_day, end_day)
+        # رقم اليوم المحفوظ أول عمود: الدمج مع الأرشيف يرتب به وليس بتحليل نص التاريخ
+        conn = self.get_connection()
+        rows = conn.execute(f'''
+            SELECT day, {TRANSACTION_COLUMNS} 
+            FROM seller_transactions 
+            WHERE seller_id = ? AND day >= ? AND day <= ? AND (? OR carry_forward = 0)
+            ORDER BY day DESC, id DESC
+        ''', (seller_id, start_day, end_day, archived is None)).fetchall()
+        if archived is not None:
+            for alias in self._archives(*archived):
+                rows += conn.execute(f'''
+                    SELECT day, {TRANSACTION_COLUMNS} FROM {alias}.seller_transactions
+                    WHERE seller_id = ? AND day >= ? AND day <= ?
+                ''', (seller_id, *archived)).fetchall()
+            rows.sort(key=lambda row: (row[0], row[1]), reverse=True)
+        return [SellerTransaction(*row[1:]) for row in rows]
+
+    def get_seller_balance_before(self, seller_id, start_date):
+        """صافي حركة البائع قبل start_date: البضاعة - المدفوع - السماح"""
+        conn = self.get_connection()
+        start_day = day_number(start_date)
+        archived = self._archive_range('seller_transactions', None, start_day - 1)
+        total = conn.execute(f'''
+            SELECT SUM({BALANCE_AMOUNT_SQL})
+            FROM seller_transactions 
+            WHERE seller_id = ? AND day < ? AND (? OR carry_forward = 0)
+        ''', (seller_id, start_day, archived is None)).fetchone()[0] or 0
+        if archived is not None:
+            for alias in self._archives(*archived):
+                total += conn.execute(f'''
+                    SELECT SUM({BALANCE_AMOUNT_SQL})
+                    FROM {alias}.seller_transactions WHERE seller_id = ? AND day >= ? AND day <= ?
+                ''', (seller_id, *archived)).fetchone()[0] or 0
+        return total / 100
+
+    def get_overdue_seller_ids(self, as_of_date, days=7):
+        """
+        معرفات البائعين الذين مر على آخر دفعة لهم days يوم أو أكثر
+        (ومن لم يدفع أبداً: مر على آخر معاملة له days يوم أو أكثر)
+        """
+        conn = self.get_connection()
+        # كل MAX يقرأ صفاً واحداً من نهاية فهرس (seller_id, day)
+        rows = conn.execute('''
+            SELECT id FROM (
+                SELECT s.id,
+                       (SELECT MAX(day) FROM seller_transactions WHERE seller_id = s.id AND status = 'مدفوع') AS last_payment_day,
+                       (SELECT MAX(day) FROM seller_transactions WHERE seller_id = s.id) AS last_transaction_day
+                FROM sellers_accounts s
+                ORDER BY s.seller_name
+            )
+            WHERE COALESCE(last_payment_day, last_transaction_day) <= ?
+        ''', (day_number(as_of_date) - days,)).fetchall()
+        return [row[0] for row in rows]
 
     def add_seller_transaction(self, seller_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note):
         """إضافة معاملة جديدة لبائع"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO seller_transactions 
-            (seller_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (seller_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                INSERT INTO seller_transactions 
+                (seller_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (seller_id, to_piasters(amount), status, count, weight, to_piasters(price), item_name, date, day_name, equipment, note))
 
     def update_seller_transaction(self, trans_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note):
         """تحديث معاملة لبائع"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE seller_transactions 
-            SET amount=?, status=?, count=?, weight=?, price=?, item_name=?, date=?, day_name=?, equipment=?, note=?
-            WHERE id=?
-        ''', (amount, status, count, weight, price, item_name, date, day_name, equipment, note, trans_id))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                UPDATE seller_transactions 
+                SET amount=?, status=?, count=?, weight=?, price=?, item_name=?, date=?, day_name=?, equipment=?, note=?
+                WHERE id=?
+            ''', (to_piasters(amount), status, count, weight, to_piasters(price), item_name, date, day_name, equipment, note, trans_id))
 
     def delete_seller_transaction(self, trans_id):
         """حذف معاملة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM seller_transactions WHERE id = ?', (trans_id,))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('DELETE FROM seller_transactions WHERE id = ?', (trans_id,))
 
     def get_last_payment_date(self, seller_id):
         """جلب تاريخ آخر عملية دفع لبائع"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT date FROM seller_transactions 
-            WHERE seller_id = ? AND status = 'مدفوع' 
-            ORDER BY date DESC LIMIT 1
-        ''', (seller_id,))
-        result = cursor.fetchone()
-        conn.close()
+        result = conn.execute('SELECT last_payment_date FROM seller_balances WHERE seller_id = ?', (seller_id,)).fetchone()
         return result[0] if result else None
 
     def get_last_transaction_date(self, seller_id):
         """جلب تاريخ آخر معاملة لبائع (أي نوع)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT date FROM seller_transactions 
-            WHERE seller_id = ? 
-            ORDER BY date DESC LIMIT 1
-        ''', (seller_id,))
-        result = cursor.fetchone()
-        conn.close()
+        result = conn.execute('SELECT last_transaction_date FROM seller_balances WHERE seller_id = ?', (seller_id,)).fetchone()
         return result[0] if result else None
 
     # --- طرق التعامل مع الوجبات / الأصناف ---
 
+    def _meals(self):
+        """الوجبات من الذاكرة المؤقتة مع فهرس بالاسم"""
+        return self._reference('meals', 'SELECT id, name, price_per_kg / 100.0, equipment_weight FROM meals ORDER BY name', _meal_key)
+
     def get_all_meals(self):
         """جلب جميع الوجبات"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name, price_per_kg, equipment_weight FROM meals ORDER BY name')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        rows, _ = self._meals()
+        return list(rows)
+
+    def find_meal_by_name(self, name):
+        """البحث عن وجبة بالاسم بدون اعتبار حالة الأحرف أو المسافات الزائدة"""
+        _, by_name = self._meals()
+        return by_name.get(name.strip().lower())
 
     def add_meal(self, name, price, equipment_weight=0):
         """إضافة وجبة جديدة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO meals (name, price_per_kg, equipment_weight) VALUES (?, ?, ?)', (name, price, equipment_weight))
-            conn.commit()
+            with self._write('meals') as cursor:
+                cursor.execute('INSERT INTO meals (name, price_per_kg, equipment_weight) VALUES (?, ?, ?)', (name, to_piasters(price), equipment_weight))
             return True
         except sqlite3.IntegrityError:
             return False # الاسم مكرر
-        finally:
-            conn.close()
 
     def update_meal(self, meal_id, name, price, equipment_weight=0):
         """تحديث بيانات وجبة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE meals 
-            SET name = ?, price_per_kg = ?, equipment_weight = ?
-            WHERE id = ?
-        ''', (name, price, equipment_weight, meal_id))
-        conn.commit()
-        conn.close()
+        with self._write('meals') as cursor:
+            cursor.execute('''
+                UPDATE meals 
+                SET name = ?, price_per_kg = ?, equipment_weight = ?
+                WHERE id = ?
+            ''', (name, to_piasters(price), equipment_weight, meal_id))
 
     def delete_meal(self, meal_id):
         """حذف وجبة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM meals WHERE id = ?', (meal_id,))
-        conn.commit()
-        conn.close()
+        with self._write('meals') as cursor:
+            cursor.execute('DELETE FROM meals WHERE id = ?', (meal_id,))
 
     # --- طرق التعامل مع ترحيل الزراعة ---
 
     def get_agriculture_transfers(self):
         """جلب جميع بيانات ترحيل الزراعة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type FROM agriculture_transfers ORDER BY created_at DESC')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        return self._query(Transfer, f'SELECT {TRANSFER_COLUMNS} FROM agriculture_transfers ORDER BY created_at DESC').fetchall()
+
+    def find_agriculture_transfers(self, transfer_type=None, client_name=None, search=None,
+                                   item_name=None, transfer_id=None, invoiced=None):
+        """
+        جلب نقلات ترحيل الزراعة التي تطابق الشروط المحددة فقط (الأحدث أولاً)
+        
+        transfer_type: 'in' (نقلات العملاء) أو 'out' (نقلات البائعين)
+        client_name: اسم العميل (النقلة) بالضبط
+        search: كلمات من اسم العميل أو اسم البائع (بداية الكلمة، بعد توحيد الحروف)
+        item_name: اسم الصنف بالضبط
+        transfer_id: نقلة واحدة بالمعرف
+        invoiced: True للنقلات المرتبطة بفاتورة، False لغير المفوترة
+        """
+        conditions = []
+        params = []
+        if transfer_id is not None:
+            conditions.append('id = ?')
+            params.append(transfer_id)
+        if transfer_type is not None:
+            conditions.append('transfer_type = ?')
+            params.append(transfer_type)
+        if client_name is not None:
+            conditions.append('shipment_name = ?')
+            params.append(client_name)
+        if item_name is not None:
+            conditions.append('item_name = ?')
+            params.append(item_name)
+        match = build_match_query(search) if search else None
+        if match:
+            # بحث في اسم العميل والبائع من فهرس search_index
+            conditions.append(f'''id IN (
+                SELECT rowid / {SEARCH_KIND_SLOTS} FROM search_index
+                WHERE search_index MATCH ? AND rowid % {SEARCH_KIND_SLOTS} = {SEARCH_KINDS['transfer']}
+            )''')
+            params.append(f'names : ({match})')
+        if invoiced is True:
+            conditions.append('invoice_id IS NOT NULL AND invoice_id != 0')
+        elif invoiced is False:
+            conditions.append('(invoice_id IS NULL OR invoice_id = 0)')
+        
+        where = ' AND '.join(conditions) or '1'
+        return self._query(Transfer, f'''
+            SELECT {TRANSFER_COLUMNS} 
+            FROM agriculture_transfers 
+            WHERE {where}
+            ORDER BY created_at DESC
+        ''', params).fetchall()
+
+    def get_agriculture_transfer(self, transfer_id, transfer_type=None):
+        """جلب نقلة واحدة بالمعرف (أو None)"""
+        rows = self.find_agriculture_transfers(transfer_type=transfer_type, transfer_id=transfer_id)
+        return rows[0] if rows else None
 
     def add_agriculture_transfer(self, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type):
         """إضافة سجل ترحيل زراعة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO agriculture_transfers (shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                INSERT INTO agriculture_transfers (shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (shipment_name, seller_name, item_name, to_piasters(unit_price), weight, count, equipment, transfer_type))
 
     def update_agriculture_transfer(self, trans_id, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type):
         """تحديث سجل ترحيل زراعة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE agriculture_transfers 
-            SET shipment_name=?, seller_name=?, item_name=?, unit_price=?, weight=?, count=?, equipment=?, transfer_type=?
-            WHERE id=?
-        ''', (shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type, trans_id))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                UPDATE agriculture_transfers 
+                SET shipment_name=?, seller_name=?, item_name=?, unit_price=?, weight=?, count=?, equipment=?, transfer_type=?
+                WHERE id=?
+            ''', (shipment_name, seller_name, item_name, to_piasters(unit_price), weight, count, equipment, transfer_type, trans_id))
 
     def delete_agriculture_transfer(self, trans_id):
         """حذف سجل ترحيل زراعة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM agriculture_transfers WHERE id = ?', (trans_id,))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('DELETE FROM agriculture_transfers WHERE id = ?', (trans_id,))
 
     def get_sales_summary(self):
-        """جلب ملخص المبيعات (الصنف، إجمالي الوزن، إجمالي السعر)"""
+        """جلب ملخص المبيعات (الصنف، إجمالي الوزن، إجمالي السعر) شاملاً الأرشيف"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         # نفترض أن إجمالي السعر هو (سعر الوحدة * الوزن)
-        cursor.execute('''
-            SELECT item_name, SUM(weight), SUM(unit_price * weight) 
+        rows = conn.execute('''
+            SELECT item_name, SUM(weight), SUM(unit_price * weight) / 100.0 
             FROM agriculture_transfers 
             GROUP BY item_name
-        ''')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        ''').fetchall()
+        
+        state = self._archive_state('agriculture_transfers')
+        if state is None:
+            return rows
+        totals = {item: [weight or 0.0, price or 0.0] for item, weight, price in rows}
+        for alias in self._archives(state[0], state[1] - 1):
+            for item, weight, price in conn.execute(f'''
+                SELECT item_name, SUM(weight), SUM(unit_price * weight) / 100.0
+                FROM {alias}.agriculture_transfers GROUP BY item_name
+            '''):
+                entry = totals.setdefault(item, [0.0, 0.0])
+                entry[0] += weight or 0.0
+                entry[1] += price or 0.0
+        return sorted(((item, weight, price) for item, (weight, price) in totals.items()),
+                      key=lambda row: (row[0] is not None, row[0] or ''))
 
     # --- طرق التعامل مع المنصرفات ---
 
+    def get_expenses_between(self, start_date, end_date):
+        """جلب المنصرفات من start_date إلى end_date (شاملة الطرفين)، الأحدث أولاً"""
+        return self._query(Expense, f'''
+            SELECT {EXPENSE_COLUMNS} 
+            FROM expenses 
+            WHERE expense_day >= ? AND expense_day <= ?
+            ORDER BY expense_day DESC, id DESC
+        ''', (day_number(start_date), day_number(end_date))).fetchall()
+
     def get_all_expenses(self):
         """جلب جميع المنصرفات"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, description, amount, expense_date, note FROM expenses ORDER BY expense_date DESC, id DESC')
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        return self._query(Expense, f'SELECT {EXPENSE_COLUMNS} FROM expenses ORDER BY expense_day DESC, id DESC').fetchall()
 
     def add_expense(self, description, amount, expense_date, note=""):
         """إضافة منصرف جديد"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO expenses (description, amount, expense_date, note)
-            VALUES (?, ?, ?, ?)
-        ''', (description, amount, expense_date, note))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                INSERT INTO expenses (description, amount, expense_date, note)
+                VALUES (?, ?, ?, ?)
+            ''', (description, to_piasters(amount), expense_date, note))
 
     def update_expense(self, expense_id, description, amount, expense_date, note=""):
         """تحديث منصرف"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE expenses 
-            SET description = ?, amount = ?, expense_date = ?, note = ?
-            WHERE id = ?
-        ''', (description, amount, expense_date, note, expense_id))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                UPDATE expenses 
+                SET description = ?, amount = ?, expense_date = ?, note = ?
+                WHERE id = ?
+            ''', (description, to_piasters(amount), expense_date, note, expense_id))
 
     def delete_expense(self, expense_id):
         """حذف منصرف"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('DELETE FROM expenses WHERE id = ?', (expense_id,))
 
     # --- طرق التعامل مع فواتير العملاء ---
 
     def save_client_invoice(self, owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount=0, final_total=0):
         """حفظ فاتورة عميل جديدة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Check if table has net_amount and final_total columns, if not, add them
-        cursor.execute("PRAGMA table_info(client_invoices)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'net_amount' not in columns:
-            cursor.execute('ALTER TABLE client_invoices ADD COLUMN net_amount REAL DEFAULT 0')
-        if 'final_total' not in columns:
-            cursor.execute('ALTER TABLE client_invoices ADD COLUMN final_total REAL DEFAULT 0')
-        
-        cursor.execute('''
-            INSERT INTO client_invoices (owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total))
-        invoice_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                INSERT INTO client_invoices (owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (owner_name, to_piasters(nolon), commission, to_piasters(mashal), to_piasters(rent), to_piasters(cash),
+                  invoice_date, to_piasters(net_amount), to_piasters(final_total)))
+            invoice_id = cursor.lastrowid
         return invoice_id
 
     def update_client_invoice(self, invoice_id, owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount=0, final_total=0):
         """تحديث فاتورة عميل"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE client_invoices 
-            SET owner_name=?, nolon=?, commission=?, mashal=?, rent=?, cash=?, invoice_date=?, net_amount=?, final_total=?, updated_at=CURRENT_TIMESTAMP
-            WHERE id=?
-        ''', (owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total, invoice_id))
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            cursor.execute('''
+                UPDATE client_invoices 
+                SET owner_name=?, nolon=?, commission=?, mashal=?, rent=?, cash=?, invoice_date=?, net_amount=?, final_total=?, updated_at=CURRENT_TIMESTAMP
+                WHERE id=?
+            ''', (owner_name, to_piasters(nolon), commission, to_piasters(mashal), to_piasters(rent), to_piasters(cash),
+                  invoice_date, to_piasters(net_amount), to_piasters(final_total), invoice_id))
+
+    def get_client_invoices_between(self, start_date, end_date):
+        """جلب فواتير كل العملاء من start_date إلى end_date (شاملة الطرفين)، الأحدث أولاً"""
+        return self._query(ClientInvoice, f'''
+            SELECT {INVOICE_COLUMNS} 
+            FROM client_invoices 
+            WHERE invoice_day >= ? AND invoice_day <= ?
+            ORDER BY invoice_day DESC, id DESC
+        ''', (day_number(start_date), day_number(end_date))).fetchall()
 
     def get_latest_client_invoice(self):
         """جلب آخر فاتورة عميل"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, owner_name, nolon, commission, mashal, rent, cash, invoice_date FROM client_invoices ORDER BY id DESC LIMIT 1')
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        return self._query(ClientInvoice, f'SELECT {INVOICE_COLUMNS} FROM client_invoices ORDER BY id DESC LIMIT 1').fetchone()
     
     def get_latest_invoice_by_client(self, owner_name):
-        """جلب آخر فاتورة لعميل/نقلة معينة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total 
+        """جلب آخر فاتورة لعميل/نقلة معينة (أول فاتورة في get_client_invoices)"""
+        return self._query(ClientInvoice, f'''
+            SELECT {INVOICE_COLUMNS} 
             FROM client_invoices 
             WHERE owner_name = ? 
-            ORDER BY id DESC LIMIT 1
-        ''', (owner_name,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+            ORDER BY invoice_day DESC, id DESC LIMIT 1
+        ''', (owner_name,)).fetchone()
 
     # --- طرق التعامل مع التقارير اليومية ---
 
     def save_daily_report(self, report_date, total_collection, remaining_profit, total_expenses):
         """حفظ أو تحديث تقرير يومي"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # التحقق من وجود تقرير لنفس اليوم
-        cursor.execute('SELECT id FROM daily_reports WHERE report_date = ?', (report_date,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # تحديث التقرير الموجود
-            cursor.execute('''
-                UPDATE daily_reports 
-                SET total_collection=?, remaining_profit=?, total_expenses=?, updated_at=CURRENT_TIMESTAMP
-                WHERE report_date=?
-            ''', (total_collection, remaining_profit, total_expenses, report_date))
-        else:
-            # إضافة تقرير جديد
-            cursor.execute('''
-                INSERT INTO daily_reports (report_date, total_collection, remaining_profit, total_expenses)
-                VALUES (?, ?, ?, ?)\n            ''', (report_date, total_collection, remaining_profit, total_expenses))
-        
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            # التحقق من وجود تقرير لنفس اليوم
+            cursor.execute('SELECT id FROM daily_reports WHERE report_date = ?', (report_date,))
+            existing = cursor.fetchone()
+            
+            if existing:
+                # تحديث التقرير الموجود
+                cursor.execute('''
+                    UPDATE daily_reports 
+                    SET total_collection=?, remaining_profit=?, total_expenses=?, updated_at=CURRENT_TIMESTAMP
+                    WHERE report_date=?
+                ''', (to_piasters(total_collection), to_piasters(remaining_profit), to_piasters(total_expenses), report_date))
+            else:
+                # إضافة تقرير جديد
+                cursor.execute('''
+                    INSERT INTO daily_reports (report_date, total_collection, remaining_profit, total_expenses)
+                    VALUES (?, ?, ?, ?)
+                ''', (report_date, to_piasters(total_collection), to_piasters(remaining_profit), to_piasters(total_expenses)))
 
     def get_daily_report(self, report_date):
         """جلب تقرير يوم محدد"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT report_date, total_collection, remaining_profit, total_expenses 
+        return conn.execute('''
+            SELECT report_date, total_collection / 100.0, remaining_profit / 100.0, total_expenses / 100.0 
             FROM daily_reports 
             WHERE report_date = ?
-        ''', (report_date,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
+        ''', (report_date,)).fetchone()
 
 
     def get_monthly_reports(self, year, month):
         """جلب تقارير شهر محدد"""
+        next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+        month_start = datetime(year, month, 1)
+        month_end = datetime.fromordinal(datetime(next_year, next_month, 1).toordinal() - 1)
+        return self.get_daily_reports_range(month_start, month_end)
+
+    def get_daily_reports_range(self, start_date, end_date):
+        """جلب التقارير المحفوظة من start_date إلى end_date (شاملة الطرفين)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # تنسيق التاريخ للبحث (YYYY-MM-%)
-        date_pattern = f"{year}-{month:02d}-%"
-        
-        cursor.execute('''
-            SELECT report_date, total_collection, remaining_profit, total_expenses 
+        return conn.execute('''
+            SELECT report_date, total_collection / 100.0, remaining_profit / 100.0, total_expenses / 100.0 
             FROM daily_reports 
-            WHERE report_date LIKE ?
-            ORDER BY report_date
-        ''', (date_pattern,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+            WHERE report_day >= ? AND report_day <= ?
+            ORDER BY report_day
+        ''', (day_number(start_date), day_number(end_date))).fetchall()
 
-    def calculate_daily_totals(self, target_date):
-        """حساب المجاميع اليومية من المعاملات"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # حساب إجمالي التحصيل (المدفوع من البائعين - باستثناء السماح)
-        # نستثني السماح لأنه ليس نقداً
-        cursor.execute('''
-            SELECT SUM(amount) FROM seller_transactions 
-            WHERE status = 'مدفوع' AND date = ? AND item_name NOT LIKE '%سماح%'
-        ''', (target_date,))
-        total_collection = cursor.fetchone()[0] or 0.0
+    def calculate_range_totals(self, start_date, end_date):
+        """
+        حساب المجاميع اليومية من المعاملات لكل يوم من start_date إلى end_date (شاملة الطرفين)
         
-        # حساب إجمالي المصاريف
-        cursor.execute('''
-            SELECT SUM(amount) FROM expenses 
-            WHERE expense_date = ?
-        ''', (target_date,))
-        total_expenses = cursor.fetchone()[0] or 0.0
+        استعلامان (التحصيل والمصاريف) لكل الفترة، كل منهما مجمع باليوم بترتيب
+        فهرسه، بدلاً من استعلامين لكل يوم. الأيام بدون تحصيل أو مصاريف لا تظهر.
+        ترجع [(التاريخ، إجمالي التحصيل، صافي الربح، إجمالي المصاريف)] مرتبة بالتاريخ،
+        بنفس شكل get_monthly_reports.
+        """
+        conn = self.get_connection()
+        start_day, end_day = day_number(start_date), day_number(end_date)
+        archived = self._archive_range('seller_transactions', start_day, end_day)
+        # التحصيل = المدفوع من البائعين باستثناء السماح (ليس نقداً)
+        # التجميع منفصل لكل جدول: GROUP BY على UNION ALL يرتب في جدول مؤقت
+        totals = {}
+        for day, collection in conn.execute('''
+            SELECT day, SUM(amount) FROM seller_transactions
+            WHERE status = 'مدفوع' AND day >= ? AND day <= ? AND item_name NOT LIKE '%سماح%'
+                  AND (? OR carry_forward = 0)
+            GROUP BY day
+        ''', (start_day, end_day, archived is None)):
+            totals[day] = [collection, 0.0]
+        for day, expenses in conn.execute('''
+            SELECT expense_day, SUM(amount) FROM expenses
+            WHERE expense_day >= ? AND expense_day <= ?
+            GROUP BY expense_day
+        ''', (start_day, end_day)):
+            totals.setdefault(day, [0.0, 0.0])[1] = expenses
         
-        # حساب صافي ربح اليوم = إجمالي التحصيل - المصاريف
-        remaining_profit = total_collection - total_expenses
+        if archived is not None:
+            # تحصيل الأيام المؤرشفة يضاف لنفس اليوم (المصاريف لا تؤرشف)
+            for alias in self._archives(*archived):
+                for day, collection in conn.execute(f'''
+                    SELECT day, SUM(amount) FROM {alias}.seller_transactions
+                    WHERE status = 'مدفوع' AND day >= ? AND day <= ? AND item_name NOT LIKE '%سماح%'
+                    GROUP BY day
+                ''', archived):
+                    totals.setdefault(day, [0.0, 0.0])[0] += collection
         
-        conn.close()
+        # المجاميع بالقرش دقيقة، والتحويل للجنيه بعد الطرح
+        # صافي ربح اليوم = إجمالي التحصيل - المصاريف
+        return [(day_to_date(day), collection / 100, (collection - expenses) / 100, expenses / 100)
+                for day, (collection, expenses) in sorted(totals.items())]
+
+    def calculate_daily_totals(self, target_date):
+        """حساب المجاميع اليومية من المعاملات"""
+        rows = self.calculate_range_totals(target_date, target_date)
+        _, total_collection, remaining_profit, total_expenses = rows[0] if rows else (target_date, 0.0, 0.0, 0.0)
         
         return {
             'total_collection': total_collection,
@@ -875,93 +859,428 @@ class Database:
 
     def get_uninvoiced_transfers(self, client_name):
         """جلب النقلات التي لم يتم عمل فاتورة لها لعميل معين"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Ensure invoice_id column exists
-        try:
-            cursor.execute('ALTER TABLE agriculture_transfers ADD COLUMN invoice_id INTEGER')
-        except sqlite3.OperationalError:
-            pass
-            
-        cursor.execute('''
-            SELECT id, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type 
+        return self._query(Transfer, f'''
+            SELECT {TRANSFER_COLUMNS} 
             FROM agriculture_transfers 
             WHERE shipment_name = ? AND transfer_type = 'in' AND (invoice_id IS NULL OR invoice_id = 0)
             ORDER BY created_at
-        ''', (client_name,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        ''', (client_name,)).fetchall()
 
     def link_transfers_to_invoice(self, invoice_id, transfer_ids):
         """ربط النقلات بفاتورة معينة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Ensure invoice_id column exists
-        try:
-            cursor.execute('ALTER TABLE agriculture_transfers ADD COLUMN invoice_id INTEGER')
-        except sqlite3.OperationalError:
-            pass
-            
-        placeholders = ','.join(['?'] * len(transfer_ids))
-        query = f'UPDATE agriculture_transfers SET invoice_id = ? WHERE id IN ({placeholders})'
-        cursor.execute(query, [invoice_id] + transfer_ids)
-        
-        conn.commit()
-        conn.close()
+        with self._write() as cursor:
+            placeholders = ','.join(['?'] * len(transfer_ids))
+            query = f'UPDATE agriculture_transfers SET invoice_id = ? WHERE id IN ({placeholders})'
+            cursor.execute(query, [invoice_id] + transfer_ids)
 
     def get_client_invoices(self, client_name):
         """جلب جميع فواتير عميل معين"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, owner_name, nolon, commission, mashal, rent, cash, invoice_date, net_amount, final_total 
+        return self._query(ClientInvoice, f'''
+            SELECT {INVOICE_COLUMNS} 
             FROM client_invoices 
             WHERE owner_name = ? 
-            ORDER BY invoice_date DESC, id DESC
-        ''', (client_name,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+            ORDER BY invoice_day DESC, id DESC
+        ''', (client_name,)).fetchall()
 
     def get_transfers_by_invoice_id(self, invoice_id):
-        """جلب النقلات المرتبطة بفاتورة معينة"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, shipment_name, seller_name, item_name, unit_price, weight, count, equipment, transfer_type 
+        """جلب النقلات المرتبطة بفاتورة معينة (ومنها المنقولة للأرشيف)"""
+        rows = self._query(Transfer, f'''
+            SELECT {TRANSFER_COLUMNS} 
             FROM agriculture_transfers 
             WHERE invoice_id = ?
             ORDER BY created_at
-        ''', (invoice_id,))
-        results = cursor.fetchall()
-        conn.close()
-        return results
+        ''', (invoice_id,)).fetchall()
+        
+        state = self._archive_state('agriculture_transfers')
+        if state is not None:
+            archived = []
+            for alias in self._archives(state[0], state[1] - 1):
+                archived += self._query(Transfer, f'''
+                    SELECT {TRANSFER_COLUMNS}
+                    FROM {alias}.agriculture_transfers WHERE invoice_id = ? ORDER BY created_at
+                ''', (invoice_id,)).fetchall()
+            # النقلات المؤرشفة أقدم من كل النقلات الحالية
+            rows = archived + rows
+        return rows
 
 
     def update_transfer_price(self, client_name, seller_name, item_name, weight, count, new_price):
         """تحديث سعر النقلة في جدول ترحيل الزراعة (للبائع والعميل)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
         try:
-            # تحديث السعر في السجلات التي تطابق المواصفات (سواء كانت in أو out)
-            cursor.execute('''
-                UPDATE agriculture_transfers 
-                SET unit_price = ? 
-                WHERE shipment_name = ? 
-                AND seller_name = ? 
-                AND item_name = ? 
-                AND weight = ? 
-                AND count = ?
-            ''', (new_price, client_name, seller_name, item_name, weight, count))
-            
-            rows_affected = cursor.rowcount
-            conn.commit()
+            with self._write() as cursor:
+                # تحديث السعر في السجلات التي تطابق المواصفات (سواء كانت in أو out)
+                cursor.execute('''
+                    UPDATE agriculture_transfers 
+                    SET unit_price = ? 
+                    WHERE shipment_name = ? 
+                    AND seller_name = ? 
+                    AND item_name = ? 
+                    AND weight = ? 
+                    AND count = ?
+                ''', (to_piasters(new_price), client_name, seller_name, item_name, weight, count))
+                
+                rows_affected = cursor.rowcount
             return rows_affected
         except Exception as e:
             print(f"Error updating transfer price: {e}")
             return 0
-        finally:
-            conn.close()
+
+    # --- صفحات الدفاتر (keyset pagination) ---
+    #
+    # كل دالة *_page ترجع (الصفوف، رمز الصفحة التالية). الرمز None يعني آخر صفحة.
+    # الترتيب دائماً من الأحدث للأقدم بمفتاح (رقم اليوم أو التاريخ، id)، والصفحة
+    # التالية تبدأ من آخر مفتاح بالبحث في الفهرس مباشرة بدلاً من OFFSET، لذلك كل
+    # صفحة تكلف نفس الوقت مهما كان عمقها. الصفوف بدون تاريخ تأتي في النهاية.
+    # رقم اليوم وليس نص التاريخ: YYYY/MM/DD و YYYY-MM-DD لا يرتبان معاً كنص.
+
+    def _keyset_page(self, record_class, columns, table, key_column, where, params, limit, token):
+        """جلب صفحة واحدة من جدول مرتب بـ (key_column DESC, id DESC)"""
+        after = _decode_token(token)
+        cursor = self.get_connection().cursor()
+        # مفتاح الترتيب يجلب كآخر عمود ليبنى منه الرمز، والباقي يبنى كسجل
+        cursor.row_factory = lambda cur, row: (record_class(*row[:-1]), row[-1])
+        base = f'SELECT {columns}, {key_column} FROM {table} WHERE {where}'
+        order = f'ORDER BY {key_column} DESC, id DESC LIMIT ?'
+        
+        # صف زائد لمعرفة هل توجد صفحة تالية
+        wanted = limit + 1
+        rows = []
+        if after is None or after[0] is not None:
+            if after is None:
+                sql = f'{base} AND {key_column} IS NOT NULL {order}'
+                args = [*params, wanted]
+            else:
+                sql = f'{base} AND ({key_column}, id) < (?, ?) {order}'
+                args = [*params, after[0], after[1], wanted]
+            rows = cursor.execute(sql, args).fetchall()
+            after = None
+        
+        if len(rows) < wanted:
+            # الصفوف بدون تاريخ بعد كل الصفوف المؤرخة
+            sql = f'{base} AND {key_column} IS NULL AND id < ? ORDER BY id DESC LIMIT ?'
+            last_id = after[1] if after else 2 ** 63 - 1
+            rows += cursor.execute(sql, [*params, last_id, wanted - len(rows)]).fetchall()
+        
+        next_token = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last, key = rows[-1]
+            next_token = _encode_token(key, last.id)
+        return [record for record, _ in rows], next_token
+
+    def get_agriculture_transfers_page(self, limit=PAGE_SIZE, token=None):
+        """صفحة من نقلات ترحيل الزراعة (الأحدث أولاً)"""
+        return self._keyset_page(
+            Transfer, TRANSFER_COLUMNS,
+            'agriculture_transfers', 'created_at', '1', (), limit, token)
+
+    def count_agriculture_transfers(self):
+        """عدد كل نقلات ترحيل الزراعة"""
+        conn = self.get_connection()
+        return conn.execute('SELECT COUNT(*) FROM agriculture_transfers').fetchone()[0]
+
+    def get_seller_transactions_page(self, seller_id, limit=PAGE_SIZE, token=None):
+        """صفحة من معاملات بائع معين (الأحدث أولاً)"""
+        return self._keyset_page(
+            SellerTransaction, TRANSACTION_COLUMNS,
+            'seller_transactions', 'day', 'seller_id = ?', (seller_id,), limit, token)
+
+    def count_seller_transactions(self, seller_id):
+        """عدد معاملات بائع معين"""
+        conn = self.get_connection()
+        return conn.execute('SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ?', (seller_id,)).fetchone()[0]
+
+    def get_expenses_page(self, limit=PAGE_SIZE, token=None):
+        """صفحة من المنصرفات (الأحدث أولاً)"""
+        return self._keyset_page(
+            Expense, EXPENSE_COLUMNS,
+            'expenses', 'expense_day', '1', (), limit, token)
+
+    def count_expenses(self):
+        """عدد كل المنصرفات"""
+        conn = self.get_connection()
+        return conn.execute('SELECT COUNT(*) FROM expenses').fetchone()[0]
+
+    def get_client_invoices_page(self, client_name, limit=PAGE_SIZE, token=None):
+        """صفحة من فواتير عميل معين (الأحدث أولاً)"""
+        return self._keyset_page(
+            ClientInvoice, INVOICE_COLUMNS,
+            'client_invoices', 'invoice_day', 'owner_name = ?', (client_name,), limit, token)
+
+    def count_client_invoices(self, client_name):
+        """عدد فواتير عميل معين"""
+        conn = self.get_connection()
+        return conn.execute('SELECT COUNT(*) FROM client_invoices WHERE owner_name = ?', (client_name,)).fetchone()[0]
+
+    # --- سجل التغييرات (changelog، انظر migration_13_changelog) ---
+
+    def get_changelog_seq(self):
+        """رقم آخر تغيير مسجل (0 إذا لم يسجل شيء بعد)"""
+        conn = self.get_connection()
+        return conn.execute('SELECT MAX(seq) FROM changelog').fetchone()[0] or 0
+
+    def changes_since(self, seq, limit=None):
+        """
+        التغييرات بعد seq بالترتيب (صف لكل عملية، وقد يتكرر نفس الصف)
+        
+        من يتابع التغييرات يحفظ seq آخر صف قرأه (أو get_changelog_seq) ويمرره
+        في المرة التالية. إذا حذفت prune_changelog تغييرات لم تقرأ بعد ترجع
+        ValueError، وعلى المتابع قراءة كل شيء من جديد.
+        """
+        conn = self.get_connection()
+        oldest = conn.execute('SELECT MIN(seq) FROM changelog').fetchone()[0]
+        if oldest is not None and seq < oldest - 1:
+            raise ValueError(f"التغييرات بعد {seq} لم تعد في سجل التغييرات (أقدم تغيير {oldest})")
+        return self._query(ChangeEntry, '''
+            SELECT seq, table_name, row_id, op FROM changelog
+            WHERE seq > ?
+            ORDER BY seq
+            LIMIT ?
+        ''', (seq, -1 if limit is None else limit)).fetchall()
+
+    def prune_changelog(self, keep=CHANGELOG_KEEP):
+        """حذف أقدم صفوف سجل التغييرات مع إبقاء آخر keep صف (على الأقل صف واحد)"""
+        with self._write() as cursor:
+            cursor.execute('''
+                DELETE FROM changelog WHERE seq <= (SELECT MAX(seq) FROM changelog) - ?
+            ''', (max(keep, 1),))
+            return cursor.rowcount
+
+    def fingerprint(self, tables=(), seller_id=None):
+        """
+        بصمة البيانات: tuple تتغير عند أي تعديل في tables أو في حساب البائع
+        seller_id (حسابه أو معاملاته)، ولا تتغير بدون تعديل
+        
+        الشاشة تحفظ البصمة عند التحميل وتقارنها قبل إعادة التحميل. كل رقم هو
+        آخر seq في changelog للجدول أو البائع (صف واحد من الفهرس)، والنتيجة
+        تحفظ لكل اتصال حتى يتغير PRAGMA data_version (كتابة من اتصال آخر) أو
+        يكتب نفس الاتصال، فتكرار السؤال بدون تعديل لا يقرأ أي جدول.
+        """
+        for table in tables:
+            if table not in CHANGELOG_TABLES:
+                raise ValueError(f"الجدول {table} لا يسجل تغييراته في changelog")
+        conn = self.get_connection()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        cached = getattr(self._local, 'fingerprints', None)
+        if cached is None or cached[0] != data_version:
+            cached = self._local.fingerprints = (data_version, {})
+        
+        key = (tuple(tables), seller_id)
+        result = cached[1].get(key)
+        if result is None:
+            versions = [conn.execute('SELECT MAX(seq) FROM changelog WHERE table_name = ?', (table,)).fetchone()[0] or 0
+                        for table in tables]
+            if seller_id is not None:
+                versions.append(conn.execute('SELECT MAX(seq) FROM changelog WHERE seller_id = ?',
+                                             (seller_id,)).fetchone()[0] or 0)
+            result = cached[1][key] = tuple(versions)
+        return result
+
+    # --- سجل الصيانة (انظر maintenance.py) ---
+
+    def add_maintenance_log(self, run_at, reason, task, duration_ms, result,
+                            pages_before, pages_after, free_pages_before, free_pages_after):
+        """تسجيل تشغيل مهمة صيانة"""
+        with self._write() as cursor:
+            cursor.execute('''
+                INSERT INTO maintenance_log
+                (run_at, reason, task, duration_ms, result, pages_before, pages_after, free_pages_before, free_pages_after)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (run_at, reason, task, duration_ms, result, pages_before, pages_after, free_pages_before, free_pages_after))
+
+    def get_last_maintenance_time(self, task):
+        """وقت آخر تشغيل لمهمة صيانة (نص ISO) أو None"""
+        conn = self.get_connection()
+        return conn.execute('SELECT MAX(run_at) FROM maintenance_log WHERE task = ?', (task,)).fetchone()[0]
+
+    def get_maintenance_log(self, limit=200):
+        """آخر تشغيلات مهام الصيانة، الأحدث أولاً"""
+        return self._query(MaintenanceRun, '''
+            SELECT id, run_at, reason, task, duration_ms, result,
+                   pages_before, pages_after, free_pages_before, free_pages_after
+            FROM maintenance_log
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+
+    # --- أرشيف المواسم المغلقة (انظر archive.py) ---
+
+    def _archive_state(self, table):
+        """(أول يوم مؤرشف، يوم القطع) لجدول، أو None إذا لم يؤرشف منه شيء"""
+        conn = self.get_connection()
+        return conn.execute('SELECT first_day, cutoff_day FROM archive_state WHERE table_name = ?', (table,)).fetchone()
+
+    def _archive_range(self, table, start_day, end_day):
+        """
+        (أول يوم، آخر يوم) يجب قراءته من ملفات الأرشيف لفترة start_day..end_day،
+        أو None إذا كانت الفترة كلها في قاعدة البيانات الحالية
+        
+        start_day=None يعني من البداية (أرصدة حتى end_day): إذا كان كل الأرشيف
+        قبل end_day تكفي معاملات الترحيل بدلاً من فتح الأرشيف.
+        عند القراءة من الأرشيف تستبعد معاملات الترحيل (carry_forward = 1).
+        """
+        state = self._archive_state(table)
+        if state is None:
+            return None
+        first_day, cutoff = state
+        if start_day is None:
+            if end_day >= cutoff - 1:
+                return None
+            start_day = first_day
+        elif start_day >= cutoff:
+            return None
+        return max(start_day, first_day), min(end_day, cutoff - 1)
+
+    def _archives(self, first_day, last_day):
+        """
+        فتح ملفات أرشيف السنوات من first_day إلى last_day الموجودة فعلاً، واحداً
+        بعد الآخر، وإرجاع اسم كل ملف داخل الاتصال (لا يعمل داخل معاملة مفتوحة)
+        """
+        if first_day > last_day:
+            return
+        conn = self.get_connection()
+        for year in range(day_year(first_day), day_year(last_day) + 1):
+            path = archive_path(self.db_name, year)
+            if not os.path.exists(path):
+                continue
+            alias = archive_alias(year)
+            conn.execute(f'ATTACH DATABASE ? AS {alias}', (path,))
+            try:
+                yield alias
+            finally:
+                conn.execute(f'DETACH DATABASE {alias}')
+
+    def archive_before(self, cutoff_date):
+        """
+        نقل المعاملات والنقلات الأقدم من cutoff_date إلى ملفات الأرشيف السنوية
+        
+        - معاملات البائعين الذين رصيدهم صفر في cutoff_date فقط، وتحل محلها
+          معاملة ترحيل لكل (حالة، سماح أو لا) بنفس المجموع وتاريخ آخر معاملة
+        - النقلات التي دخلت فاتورة
+        
+        النسخ للأرشيف يحفظ أولاً (INSERT OR IGNORE فإعادة التشغيل آمنة)، ثم
+        الحذف من قاعدة البيانات الحالية في معاملة واحدة. يفضل تشغيلها من خيط
+        الكتابة (db_worker) حتى لا تتغير الصفوف بين الخطوتين.
+        
+        Returns:
+            dict: عدد البائعين والمعاملات والنقلات المنقولة والسنوات
+        """
+        conn = self.get_connection()
+        cutoff = day_number(cutoff_date)
+        
+        # البائعون المسددون: الرصيد الافتتاحي + البضاعة - المدفوع - السماح قبل القطع = صفر
+        settled = [row[0] for row in conn.execute(f'''
+            SELECT s.id FROM sellers_accounts s
+            WHERE EXISTS (SELECT 1 FROM seller_transactions
+                          WHERE seller_id = s.id AND day < ? AND carry_forward = 0)
+              AND COALESCE(s.remaining_amount, 0) + COALESCE(
+                      (SELECT SUM({BALANCE_AMOUNT_SQL})
+                       FROM seller_transactions WHERE seller_id = s.id AND day < ?), 0) = 0
+            ORDER BY s.seller_name
+        ''', (cutoff, cutoff)).fetchall()]
+        transactions = conn.execute('''
+            SELECT id, day FROM seller_transactions
+            WHERE seller_id IN (SELECT value FROM json_each(?)) AND day < ? AND carry_forward = 0
+        ''', (json.dumps(settled), cutoff)).fetchall()
+        transfers = conn.execute(f'''
+            SELECT id, {DAY_NUMBER_SQL.format(column='created_at')} AS day FROM agriculture_transfers
+            WHERE invoice_id > 0 AND day < ?
+        ''', (cutoff,)).fetchall()
+        
+        # 1. النسخ لملف كل سنة
+        years = set()
+        for table, rows in (('seller_transactions', transactions), ('agriculture_transfers', transfers)):
+            by_year = {}
+            for row_id, day in rows:
+                by_year.setdefault(day_year(day), []).append(row_id)
+            columns = ', '.join(ARCHIVE_COLUMNS[table])
+            for year, ids in by_year.items():
+                alias = archive_alias(year)
+                conn.execute(f'ATTACH DATABASE ? AS {alias}', (archive_path(self.db_name, year),))
+                try:
+                    create_archive_schema(conn, alias)
+                    with self.transaction():
+                        conn.execute(f'''
+                            INSERT OR IGNORE INTO {alias}.{table} ({columns}, day)
+                            SELECT {columns}, {DAY_NUMBER_SQL.format(column='date' if table == 'seller_transactions' else 'created_at')}
+                            FROM {table} WHERE id IN (SELECT value FROM json_each(?))
+                        ''', (json.dumps(ids),))
+                finally:
+                    conn.execute(f'DETACH DATABASE {alias}')
+                years.add(year)
+        
+        # 2. الحذف ومعاملات الترحيل (الترحيل القديم للبائع يدخل في الجديد)
+        transaction_ids = json.dumps([row_id for row_id, _ in transactions])
+        with self._write() as cursor:
+            carries = cursor.execute('''
+                SELECT seller_id, status, item_name LIKE '%سماح%', SUM(amount), MAX(day)
+                FROM seller_transactions
+                WHERE id IN (SELECT value FROM json_each(?))
+                   OR (seller_id IN (SELECT value FROM json_each(?)) AND day < ? AND carry_forward = 1)
+                GROUP BY seller_id, status, item_name LIKE '%سماح%'
+            ''', (transaction_ids, json.dumps(settled), cutoff)).fetchall()
+            cursor.execute('''
+                DELETE FROM seller_transactions
+                WHERE id IN (SELECT value FROM json_each(?))
+                   OR (seller_id IN (SELECT value FROM json_each(?)) AND day < ? AND carry_forward = 1)
+            ''', (transaction_ids, json.dumps(settled), cutoff))
+            # المبالغ هنا بالقرش مباشرة (بدون to_piasters)
+            cursor.executemany('''
+                INSERT INTO seller_transactions
+                (seller_id, amount, status, count, weight, price, item_name, date, day_name, equipment, note, carry_forward)
+                VALUES (?, ?, ?, 0, 0, 0, ?, ?, '', '', ?, 1)
+            ''', [(seller_id, amount, status, CARRY_ALLOWANCE_ITEM if allowance else CARRY_ITEM,
+                   day_to_date(last_day), f'ترحيل أرشيف قبل {day_to_date(cutoff)}')
+                  for seller_id, status, allowance, amount, last_day in carries if amount])
+            cursor.execute('DELETE FROM agriculture_transfers WHERE id IN (SELECT value FROM json_each(?))',
+                           (json.dumps([row_id for row_id, _ in transfers]),))
+            
+            for table, rows in (('seller_transactions', transactions), ('agriculture_transfers', transfers)):
+                if rows:
+                    cursor.execute('''
+                        INSERT INTO archive_state (table_name, first_day, cutoff_day) VALUES (?, ?, ?)
+                        ON CONFLICT(table_name) DO UPDATE SET
+                            first_day = MIN(first_day, excluded.first_day),
+                            cutoff_day = MAX(cutoff_day, excluded.cutoff_day)
+                    ''', (table, min(day for _, day in rows), cutoff))
+        
+        return {
+            'sellers': len(settled),
+            'transactions': len(transactions),
+            'transfers': len(transfers),
+            'years': sorted(years),
+        }
+
+    # --- البحث ---
+
+    def search(self, text, kinds=None, columns=None, limit=50):
+        """
+        البحث في الأسماء والأصناف والملاحظات مرتباً حسب الأقرب
+        
+        text: كلمات البحث؛ كل كلمة تطابق بداية كلمة، و"احمد" تجد "أحمد"
+        kinds: أنواع النتائج المطلوبة من SEARCH_KINDS مثل ('seller', 'client')
+        columns: حصر البحث في أعمدة الفهرس ('names', 'items', 'notes')
+        
+        ترجع قائمة SearchMatch(kind, ref_id, rank)، و ref_id هو id الصف في جدوله.
+        """
+        match = build_match_query(text)
+        if not match:
+            return []
+        if columns:
+            match = f"{{{' '.join(columns)}}} : ({match})"
+        
+        sql = 'SELECT rowid, rank FROM search_index WHERE search_index MATCH ?'
+        params = [match]
+        if kinds:
+            codes = [SEARCH_KINDS[kind] for kind in kinds]
+            sql += f" AND rowid % {SEARCH_KIND_SLOTS} IN ({','.join('?' * len(codes))})"
+            params += codes
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit)
+        
+        names = {code: kind for kind, code in SEARCH_KINDS.items()}
+        conn = self.get_connection()
+        return [
+            SearchMatch(names[rowid % SEARCH_KIND_SLOTS], rowid // SEARCH_KIND_SLOTS, rank)
+            for rowid, rank in conn.execute(sql, params).fetchall()
+        ]
@@ -0,0 +1,136 @@
+"""
+تنفيذ عمليات قاعدة البيانات في الخلفية
+
+الواجهة (Tk) تعمل في خيط واحد، وأي انتظار لقاعدة البيانات داخل دالة زر
+(حفظ كبير، قراءة قائمة طويلة، استيراد ملف) يجمد النافذة كلها حتى ينتهي.
+
+DatabaseWorker ينقل هذا الانتظار لخيوط أخرى:
+- خيط كتابة واحد بقائمة انتظار: الكتابات تنفذ واحدة بعد الأخرى بالترتيب،
+  فلا تتنافس على قفل الكتابة في SQLite
+- خيوط قراءة لكل منها اتصال مستقل للقراءة فقط (Database.get_connection
+  يعطي كل خيط اتصاله)، ومع WAL القراءة لا تنتظر الكتابة
+
+كل عملية ترجع Future، و deliver يستدعي دالة النتيجة في خيط الواجهة عن
+طريق after، لأن Tk لا يقبل استدعاءات من خيوط أخرى.
+
+الاستخدام:
+    worker = get_worker(self.db)
+    deliver(self.window, worker.read(self.db.get_all_expenses), self.show_expenses)
+"""
+
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# عدد خيوط القراءة (واتصالاتها)
+READER_THREADS = 2
+
+# الفترة بين كل فحص لانتهاء العملية من خيط الواجهة (بالمللي ثانية)
+POLL_MS = 25
+
+
+class DatabaseWorker:
+    def __init__(self, db, readers=READER_THREADS):
+        self.db = db
+        self._jobs = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._run_writer, name='db-writer', daemon=True)
+        self._writer.start()
+        self._readers = ThreadPoolExecutor(
+            max_workers=readers, thread_name_prefix='db-reader', initializer=self._init_reader)
+
+    def _init_reader(self):
+        # اتصال خيط القراءة لا يكتب أبداً: كل الكتابة من خيط الكتابة
+        self.db.get_connection().execute('PRAGMA query_only = ON')
+
+    def _run_writer(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def write(self, func, *args, **kwargs):
+        """
+        تنفيذ func(*args, **kwargs) في خيط الكتابة بعد الكتابات السابقة
+
+        عدة عمليات يجب أن تحفظ معاً توضع في دالة واحدة داخل db.transaction().
+        """
+        if self._closed:
+            raise RuntimeError("تم إيقاف خيط قاعدة البيانات")
+        future = Future()
+        self._jobs.put((future, func, args, kwargs))
+        return future
+
+    def read(self, func, *args, **kwargs):
+        """تنفيذ func(*args, **kwargs) في أحد خيوط القراءة"""
+        if self._closed:
+            raise RuntimeError("تم إيقاف خيط قاعدة البيانات")
+        return self._readers.submit(func, *args, **kwargs)
+
+    def close(self):
+        """إيقاف الخيوط بعد انتهاء كل العمليات المنتظرة (يستدعى قبل Database.close)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._jobs.put(None)
+        self._readers.shutdown(wait=True)
+        self._writer.join()
+
+
+def deliver(widget, future, on_done, on_error=None):
+    """
+    استدعاء on_done(النتيجة) في خيط الواجهة بعد انتهاء future،
+    أو on_error(الخطأ) إذا فشلت (بدونها يظهر الخطأ كأي خطأ في دالة Tk)
+
+    إذا أغلقت النافذة widget قبل الانتهاء تهمل النتيجة.
+    """
+    def check():
+        if not widget.winfo_exists():
+            return
+        if not future.done():
+            widget.after(POLL_MS, check)
+            return
+        error = future.exception()
+        if error is None:
+            on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            raise error
+
+    try:
+        widget.after(POLL_MS, check)
+    except tk.TclError:
+        # النافذة أغلقت بالفعل
+        pass
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(db):
+    """خيوط الخلفية المشتركة لقاعدة بيانات (تنشأ عند أول طلب)"""
+    with _workers_lock:
+        worker = _workers.get(db)
+        if worker is None:
+            worker = _workers[db] = DatabaseWorker(db)
+        return worker
+
+
+def close_worker(db):
+    """إيقاف خيوط الخلفية لقاعدة بيانات إذا كانت قد أنشئت"""
+    with _workers_lock:
+        worker = _workers.pop(db, None)
+    if worker is not None:
+        worker.close()
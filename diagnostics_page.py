@@ -0,0 +1,188 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+import os
+from database import get_database
+
+# Refresh interval for the live counters (ms)
+REFRESH_MS = 1000
+
+
+class DiagnosticsPage:
+    """Live database timings (query_stats.py) and reference cache counters"""
+
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
+
+        self.colors = {
+            'bg': '#FFB347',
+            'header_bg': '#6C3483',
+            'card_bg': 'white',
+            'button_bg': '#800000',
+            'button_fg': 'white'
+        }
+
+        self.window = tk.Toplevel(parent_window)
+        self.window.title("تشخيص قاعدة البيانات")
+        self.window.geometry("1200x650")
+        self.window.configure(bg=self.colors['bg'])
+
+        self.kind_var = tk.StringVar(value='method')
+
+        self.setup_ui()
+        self.tick()
+
+    def setup_ui(self):
+        # Header
+        header_frame = tk.Frame(self.window, bg=self.colors['header_bg'], height=70)
+        header_frame.pack(fill=tk.X)
+        header_frame.pack_propagate(False)
+
+        tk.Label(header_frame, text="تشخيص قاعدة البيانات",
+                font=('Playpen Sans Arabic', 20, 'bold'),
+                bg=self.colors['header_bg'], fg='white').pack(pady=15)
+
+        # Controls
+        controls = tk.Frame(self.window, bg=self.colors['bg'])
+        controls.pack(fill=tk.X, padx=20, pady=(10, 0))
+
+        for text, value in (("الدوال", 'method'), ("جمل SQL", 'sql')):
+            tk.Radiobutton(controls, text=text, variable=self.kind_var, value=value,
+                          command=self.refresh, font=('Arial', 12, 'bold'),
+                          bg=self.colors['bg'], activebackground=self.colors['bg']).pack(side=tk.RIGHT, padx=5)
+
+        tk.Button(controls, text="تصفير العدادات", command=self.reset,
+                 bg=self.colors['button_bg'], fg='white', font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="سجل الاستعلامات البطيئة", command=self.open_slow_log,
+                 bg=self.colors['button_bg'], fg='white', font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="سجل الصيانة", command=self.show_maintenance_log,
+                 bg=self.colors['button_bg'], fg='white', font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
+        tk.Button(controls, text="تفعيل ضغط الملف", command=self.enable_auto_vacuum,
+                 bg=self.colors['button_bg'], fg='white', font=('Arial', 10, 'bold')).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = tk.Label(self.window, font=('Arial', 11), bg=self.colors['bg'], anchor='e')
+        self.status_label.pack(fill=tk.X, padx=20, pady=5)
+
+        # Counters table
+        table_frame = tk.Frame(self.window, bg=self.colors['card_bg'], relief=tk.RAISED, bd=2)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(0, 20))
+
+        columns = ('total', 'max', 'p95', 'p50', 'rows', 'calls', 'name')
+        headings = ("الإجمالي (ms)", "الأقصى (ms)", "p95 (ms)", "p50 (ms)", "الصفوف", "المرات", "الاسم")
+        self.tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        for column, heading in zip(columns, headings):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=90, anchor='center')
+        self.tree.column('name', width=600, anchor='e')
+
+        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+
+    def tick(self):
+        if not self.window.winfo_exists():
+            return
+        self.refresh()
+        self.window.after(REFRESH_MS, self.tick)
+
+    def refresh(self):
+        cache = self.db.cache_stats()
+        hits = sum(c['hits'] for c in cache.values())
+        misses = sum(c['misses'] for c in cache.values())
+        cache_text = f"الذاكرة المؤقتة: {hits} إصابة / {misses} قراءة من القاعدة"
+
+        self.tree.delete(*self.tree.get_children())
+        if self.db.stats is None:
+            self.status_label.config(
+                text=f"القياس غير مفعل (شغّل البرنامج مع DB_STATS=1)  |  {cache_text}")
+        else:
+            self.status_label.config(
+                text=f"حد الاستعلام البطيء: {self.db.stats.slow_ms:g} ms  |  {cache_text}")
+            kind = self.kind_var.get()
+            for item in self.db.stats.snapshot():
+                if item['kind'] != kind:
+                    continue
+                self.tree.insert('', tk.END, values=(
+                    f"{item['total_ms']:.1f}",
+                    f"{item['max_ms']:.2f}",
+                    f"{item['p95_ms']:.2f}",
+                    f"{item['p50_ms']:.2f}",
+                    item['rows'],
+                    item['calls'],
+                    item['name'],
+                ))
+
+    def reset(self):
+        if self.db.stats is not None:
+            self.db.stats.reset()
+        self.refresh()
+
+    def open_slow_log(self):
+        if self.db.stats is None or not os.path.exists(self.db.stats.log_path):
+            messagebox.showinfo("معلومات", "لا توجد استعلامات بطيئة مسجلة", parent=self.window)
+            return
+        try:
+            os.startfile(os.path.abspath(self.db.stats.log_path))
+        except AttributeError:
+            # os.startfile exists on Windows only
+            messagebox.showinfo("معلومات", os.path.abspath(self.db.stats.log_path), parent=self.window)
+
+    def enable_auto_vacuum(self):
+        """One-time full VACUUM that lets idle/shutdown maintenance shrink an older file"""
+        from maintenance import enable_auto_vacuum
+        from db_worker import get_worker, deliver
+
+        confirm = messagebox.askyesno(
+            "تفعيل ضغط الملف",
+            "سيتم إعادة بناء ملف قاعدة البيانات مرة واحدة، وقد يستغرق ذلك عدة دقائق في الملفات الكبيرة.\n"
+            "بعدها تعيد الصيانة المساحة الفارغة تلقائياً. هل تريد المتابعة؟",
+            parent=self.window
+        )
+        if not confirm:
+            return
+
+        def on_done(results):
+            task, duration_ms, result = results[0]
+            messagebox.showinfo("نجاح", f"{result}\nالزمن: {duration_ms / 1000:.1f} ث", parent=self.window)
+
+        def on_failed(e):
+            messagebox.showerror("خطأ", f"تعذر ضغط الملف:\n{str(e)}", parent=self.window)
+
+        # VACUUM rewrites the whole file, so it runs on the writer thread like the idle tasks
+        future = get_worker(self.db).write(enable_auto_vacuum, self.db)
+        deliver(self.window, future, on_done, on_failed)
+
+    def show_maintenance_log(self):
+        """Recent maintenance runs (maintenance.py) with file size before/after"""
+        window = tk.Toplevel(self.window)
+        window.title("سجل الصيانة")
+        window.geometry("1100x500")
+        window.configure(bg=self.colors['bg'])
+
+        frame = tk.Frame(window, bg=self.colors['card_bg'], relief=tk.RAISED, bd=2)
+        frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
+
+        columns = ('free', 'pages', 'result', 'duration', 'task', 'reason', 'run_at')
+        headings = ("الصفحات الفارغة", "صفحات الملف", "النتيجة", "الزمن (ms)", "المهمة", "السبب", "الوقت")
+        tree = ttk.Treeview(frame, columns=columns, show='headings')
+        for column, heading in zip(columns, headings):
+            tree.heading(column, text=heading)
+            tree.column(column, width=110, anchor='center')
+        tree.column('result', width=330, anchor='e')
+        tree.column('run_at', width=150)
+
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        tree.pack(fill=tk.BOTH, expand=True)
+
+        for run in self.db.get_maintenance_log():
+            tree.insert('', tk.END, values=(
+                f"{run.free_pages_before} → {run.free_pages_after}",
+                f"{run.pages_before} → {run.pages_after}",
+                run.result,
+                f"{run.duration_ms:.1f}",
+                run.task,
+                run.reason,
+                run.run_at.replace('T', ' '),
+            ))
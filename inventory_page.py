@@ -1,11 +1,11 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-from database import Database
+from database import get_database
 from utils import ColorManager
 
 class InventoryPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         
         # Match AccountsPage colors
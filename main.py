@@ -11,6 +11,10 @@ class StartMenu:
         self.root.geometry("1200x800")
         self.root.resizable(True, True)
         
+        # قاعدة البيانات المشتركة لكل الصفحات (تغلق عند الخروج)
+        from database import get_database
+        self.db = get_database()
+        
         # تهيئة مدير الألوان واختيار ثيم عشوائي
         self.color_manager = ColorManager()
         self.theme = self.color_manager.get_random_theme()
@@ -46,6 +50,10 @@ class StartMenu:
         # حفظ تقرير اليوم السابق تلقائياً عند فتح البرنامج
         self.auto_save_previous_day_report()
         
+        # صيانة ملف قاعدة البيانات وقت الخمول وعند الإغلاق
+        from maintenance import MaintenanceScheduler
+        self.maintenance = MaintenanceScheduler(self.root, self.db)
+        
         # ربط تغيير حجم النافذة بتحديث الصورة
         self.root.bind('<Configure>', self.on_window_resize)
         
@@ -212,6 +220,20 @@ class StartMenu:
         exit_btn.pack(padx=2, pady=2)
         self.exit_button = exit_btn
         self.exit_wrapper = exit_wrapper
+        
+        # زر التشخيص (أزمنة قاعدة البيانات) تحت زر الخروج
+        diagnostics_wrapper = tk.Frame(self.root, bg=self.colors['red'])
+        diagnostics_wrapper.place(relx=0.95, rely=0.12, anchor=tk.NE)
+        
+        diagnostics_btn = tk.Button(
+            diagnostics_wrapper,
+            text="تشخيص",
+            command=self.open_diagnostics,
+            **exit_button_style
+        )
+        diagnostics_btn.pack(padx=2, pady=2)
+        self.diagnostics_button = diagnostics_btn
+        self.diagnostics_wrapper = diagnostics_wrapper
     
     def confirm_exit(self):
         """نافذة تأكيد الخروج من البرنامج"""
@@ -226,10 +248,9 @@ class StartMenu:
     def auto_save_previous_day_report(self):
         """حفظ تقرير اليوم السابق تلقائياً عند فتح البرنامج"""
         from datetime import datetime, timedelta
-        from database import Database
         
         try:
-            db = Database()
+            db = self.db
             
             # الحصول على تاريخ اليوم السابق
             yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
@@ -253,10 +274,9 @@ class StartMenu:
     def save_today_report(self):
         """حفظ تقرير اليوم الحالي"""
         from datetime import datetime
-        from database import Database
         
         try:
-            db = Database()
+            db = self.db
             today = datetime.now().strftime("%Y-%m-%d")
             
             # حساب وحفظ تقرير اليوم
@@ -271,11 +291,28 @@ class StartMenu:
         except Exception as e:
             print(f"خطأ في حفظ التقرير: {e}")
     
-    def on_closing(self):
-        """معالجة حدث إغلاق النافذة"""
+    def close_database(self, maintenance=True):
+        """
+        حفظ تقرير اليوم وإغلاق قاعدة البيانات قبل الخروج
+        
+        Args:
+            maintenance: تشغيل صيانة الإغلاق (لا داعي لها إذا كان الملف
+                سيستبدل بعدها كما في استعادة نسخة كاملة)
+        """
         # حفظ تقرير اليوم قبل الإغلاق
         self.save_today_report()
         
+        # إنهاء عمليات الخلفية المنتظرة ثم الصيانة ثم إغلاق اتصالات قاعدة البيانات بشكل نظيف
+        from db_worker import close_worker
+        close_worker(self.db)
+        if maintenance:
+            self.maintenance.shutdown()
+        self.db.close()
+    
+    def on_closing(self):
+        """معالجة حدث إغلاق النافذة"""
+        self.close_database()
+        
         # إغلاق البرنامج
         self.root.quit()
         self.root.destroy()
@@ -283,32 +320,32 @@ class StartMenu:
     def open_sellers_program(self):
         """فتح برنامج البائعين"""
         from sellers_page import SellersPage
-        SellersPage(self.root)
+        SellersPage(self.root, db=self.db)
 
     def open_clients_program(self):
         """فتح برنامج العملاء"""
         from clients_page import ClientsPage
-        ClientsPage(self.root)
+        ClientsPage(self.root, db=self.db)
 
     def open_inventory_program(self):
         """فتح برنامج العدة"""
         from inventory_page import InventoryPage
-        InventoryPage(self.root)
+        InventoryPage(self.root, db=self.db)
 
     def open_collection_program(self):
         """فتح برنامج التحصيل والمنصرف"""
         from collection_page import CollectionPage
-        CollectionPage(self.root)
+        CollectionPage(self.root, db=self.db)
 
     def open_accounts_module(self):
         """فتح قسم الحسابات"""
         from accounts_page import AccountsPage
-        AccountsPage(self.root)
+        AccountsPage(self.root, db=self.db)
 
     def open_agriculture_transfer(self):
         """فتح ترحيل الزراعة"""
         from agriculture_page import AgricultureTransferPage
-        AgricultureTransferPage(self.root)
+        AgricultureTransferPage(self.root, db=self.db)
 
     def open_add_meal(self):
         """فتح نافذة إدارة الوجبات والأصناف"""
@@ -394,8 +431,7 @@ class StartMenu:
         btn_frame = tk.Frame(input_card, bg=self.colors['white'])
         btn_frame.pack(fill=tk.X, pady=(15, 0))
         
-        from database import Database
-        db = Database()
+        db = self.db
         
         # Table Card
         table_card = tk.Frame(content_frame, bg=self.colors['white'], padx=2, pady=2)
@@ -642,8 +678,7 @@ class StartMenu:
                 return
             
             try:
-                from database import Database
-                db = Database()
+                db = self.db
                 
                 # التحقق من وجود الاسم في البائعين
                 existing_seller = db.get_seller_by_name(name)
@@ -713,8 +748,7 @@ class StartMenu:
                  bg=self.colors['pink'], fg=self.colors['red']).pack(pady=15)
         
         # جلب قائمة البائعين
-        from database import Database
-        db = Database()
+        db = self.db
         sellers = db.get_all_sellers_accounts() # returns list of tuples
         seller_names = [s[1] for s in sellers]
         
@@ -847,8 +881,7 @@ class StartMenu:
                 from datetime import datetime
                 today = datetime.now().strftime("%Y-%m-%d")
                 
-                from database import Database
-                db = Database()
+                db = self.db
                 db.add_expense(desc, amount, today, note)
                 
                 messagebox.showinfo("نجاح", "تم تسجيل المصروف بنجاح", parent=exp_window)
@@ -874,7 +907,12 @@ class StartMenu:
     def open_reports(self):
         """فتح صفحة التقارير اليومية والشهرية"""
         from reports_page import DailyReportsPage
-        DailyReportsPage(self.root)
+        DailyReportsPage(self.root, db=self.db)
+    
+    def open_diagnostics(self):
+        """فتح شاشة تشخيص قاعدة البيانات"""
+        from diagnostics_page import DiagnosticsPage
+        DiagnosticsPage(self.root, db=self.db)
 
     def open_data_sync(self):
         """فتح نافذة مزامنة البيانات"""
@@ -883,14 +921,14 @@ class StartMenu:
         
         sync_window = tk.Toplevel(self.root)
         sync_window.title("مزامنة البيانات")
-        sync_window.geometry("700x600")
+        sync_window.geometry("700x700")
         sync_window.configure(bg=self.colors['pink'])
         
         # توسيط النافذة
         sync_window.update_idletasks()
         x = (sync_window.winfo_screenwidth() // 2) - 350
-        y = (sync_window.winfo_screenheight() // 2) - 300
-        sync_window.geometry(f"700x600+{x}+{y}")
+        y = (sync_window.winfo_screenheight() // 2) - 350
+        sync_window.geometry(f"700x700+{x}+{y}")
         
         # Header
         header_frame = tk.Frame(sync_window, bg=self.colors['red'], height=70)
@@ -956,9 +994,11 @@ class StartMenu:
                 sync = DataSync()
                 filepath = sync.create_daily_backup()
                 
+                # النسخة اليومية تحفظ التغييرات منذ آخر نسخة فقط (ونسخة كاملة كل أسبوع)
+                kind = "التغييرات منذ آخر نسخة" if os.path.basename(filepath).startswith('delta_') else "نسخة كاملة"
                 messagebox.showinfo(
                     "نجاح", 
-                    f"تم تصدير البيانات بنجاح!\n\nالملف: {os.path.basename(filepath)}\nالمسار: {filepath}",
+                    f"تم تصدير البيانات بنجاح! ({kind})\n\nالملف: {os.path.basename(filepath)}\nالمسار: {filepath}",
                     parent=sync_window
                 )
             except Exception as e:
@@ -1031,7 +1071,7 @@ class StartMenu:
             # فتح نافذة اختيار الملف
             filepath = filedialog.askopenfilename(
                 title="اختر ملف النسخة الاحتياطية",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+                filetypes=[("Backup files", "*.ndjson *.gz *.xz *.json"), ("All files", "*.*")],
                 initialdir="data_exports",
                 parent=sync_window
             )
@@ -1049,11 +1089,19 @@ class StartMenu:
             if not confirm:
                 return
             
-            try:
-                from data_sync import DataSync
-                sync = DataSync()
-                stats = sync.import_data(filepath, merge_var.get())
-                
+            from data_sync import DataSync
+            from db_worker import get_worker, deliver
+            
+            merge_mode = merge_var.get()
+            
+            def run_import():
+                stats = DataSync().import_data(filepath, merge_mode)
+                # الاستيراد يكتب من اتصال منفصل، لذلك تفرغ الجداول المرجعية المحفوظة
+                self.db.cache.invalidate()
+                return stats
+            
+            def on_imported(stats):
+                warnings = "".join(f"\n⚠ {warning}" for warning in stats['warnings'])
                 messagebox.showinfo(
                     "نجاح", 
                     f"تم استيراد البيانات بنجاح!\n\n"
@@ -1061,11 +1109,17 @@ class StartMenu:
                     f"السجلات المُدرجة: {stats['rows_inserted']}\n"
                     f"السجلات المُحدثة: {stats['rows_updated']}\n"
                     f"السجلات المتخطاة: {stats['rows_skipped']}\n"
-                    f"الأخطاء: {len(stats['errors'])}",
+                    f"الأخطاء: {len(stats['errors'])}\n"
+                    f"الزمن: {stats['seconds']:.1f} ثانية{warnings}",
                     parent=sync_window
                 )
-            except Exception as e:
+            
+            def on_failed(e):
                 messagebox.showerror("خطأ", f"حدث خطأ أثناء الاستيراد:\n{str(e)}", parent=sync_window)
+            
+            # الاستيراد في خيط الكتابة بعد أي حفظ منتظر، والنافذة تبقى تستجيب
+            future = get_worker(self.db).write(run_import)
+            deliver(sync_window, future, on_imported, on_failed)
         
         tk.Button(
             import_card, 
@@ -1167,13 +1221,180 @@ class StartMenu:
             cursor='hand2',
             height=1
         ).pack(pady=5)
+        
+        # نسخة كاملة من ملف قاعدة البيانات (DataSync.snapshot) واستعادتها
+        snapshot_frame = tk.Frame(backups_card, bg=self.colors['white'])
+        snapshot_frame.pack(anchor='e', pady=(5, 0))
+        
+        snapshot_status = tk.Label(
+            snapshot_frame, 
+            text="", 
+            font=('Arial', 10), 
+            bg=self.colors['white']
+        )
+        
+        def take_snapshot():
+            from data_sync import DataSync
+            from db_worker import get_worker, deliver
+            
+            # دالة التقدم تعمل في خيط القراءة، والنافذة تعرض آخر قيمة كل فترة
+            progress = {'copied': 0, 'total': 0}
+            
+            def on_progress(copied, total):
+                progress['copied'], progress['total'] = copied, total
+            
+            def show_progress():
+                if future.done() or not snapshot_status.winfo_exists():
+                    return
+                if progress['total']:
+                    snapshot_status.config(text=f"{progress['copied'] * 100 // progress['total']}%")
+                sync_window.after(100, show_progress)
+            
+            def on_done(filepath):
+                snapshot_status.config(text="")
+                messagebox.showinfo(
+                    "نجاح",
+                    f"تم حفظ نسخة كاملة من قاعدة البيانات!\n\nالملف: {os.path.basename(filepath)}\nالمسار: {filepath}",
+                    parent=sync_window
+                )
+            
+            def on_failed(e):
+                snapshot_status.config(text="")
+                messagebox.showerror("خطأ", f"حدث خطأ أثناء النسخ:\n{str(e)}", parent=sync_window)
+            
+            # النسخ من اتصال مستقل في خيط قراءة، والبرنامج يبقى يعمل ويحفظ أثناءه
+            future = get_worker(self.db).read(DataSync(self.db.db_name).snapshot, progress=on_progress)
+            show_progress()
+            deliver(sync_window, future, on_done, on_failed)
+        
+        def restore_snapshot():
+            filepath = filedialog.askopenfilename(
+                title="اختر النسخة الكاملة",
+                filetypes=[("Snapshot files", "*.db"), ("All files", "*.*")],
+                initialdir="data_exports",
+                parent=sync_window
+            )
+            if not filepath:
+                return
+            
+            confirm = messagebox.askyesno(
+                "تأكيد الاستعادة",
+                "سيتم استبدال قاعدة البيانات الحالية بالنسخة المختارة ثم إغلاق البرنامج.\n"
+                "الملف الحالي يحفظ بجانبها باسم before_restore. هل تريد المتابعة؟",
+                parent=sync_window
+            )
+            if not confirm:
+                return
+            
+            from data_sync import DataSync
+            
+            # استبدال الملف يحتاج إغلاق كل اتصالات البرنامج به؛ تقرير اليوم
+            # يحفظ أولاً فيبقى في الملف السابق (before_restore)
+            self.close_database(maintenance=False)
+            try:
+                DataSync(self.db.db_name).restore_snapshot(filepath)
+            except Exception as e:
+                messagebox.showerror("خطأ", f"حدث خطأ أثناء الاستعادة:\n{str(e)}", parent=sync_window)
+                return
+            
+            messagebox.showinfo("نجاح", "تمت استعادة قاعدة البيانات.\nسيتم إغلاق البرنامج، أعد فتحه.", parent=sync_window)
+            self.root.quit()
+            self.root.destroy()
+        
+        tk.Button(
+            snapshot_frame, 
+            text="نسخة كاملة سريعة", 
+            command=take_snapshot, 
+            bg='#95A5A6', 
+            fg='white', 
+            font=('Playpen Sans Arabic', 10, 'bold'), 
+            relief=tk.FLAT,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        tk.Button(
+            snapshot_frame, 
+            text="استعادة نسخة كاملة", 
+            command=restore_snapshot, 
+            bg='#95A5A6', 
+            fg='white', 
+            font=('Playpen Sans Arabic', 10, 'bold'), 
+            relief=tk.FLAT,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        snapshot_status.pack(side=tk.RIGHT, padx=5)
+        
+        # أرشفة المواسم المغلقة (archive.py)
+        archive_frame = tk.Frame(backups_card, bg=self.colors['white'])
+        archive_frame.pack(anchor='e', pady=(5, 0))
+        
+        tk.Label(
+            archive_frame, 
+            text="أرشفة المعاملات المسددة قبل:", 
+            font=('Arial', 10, 'bold'), 
+            bg=self.colors['white']
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        from datetime import date
+        cutoff_var = tk.StringVar(value=date(date.today().year, 1, 1).strftime('%Y-%m-%d'))
+        tk.Entry(archive_frame, textvariable=cutoff_var, font=('Arial', 10), width=12, justify='center').pack(side=tk.RIGHT, padx=5)
+        
+        def archive_data():
+            from database import day_number
+            cutoff = cutoff_var.get().strip()
+            try:
+                day_number(cutoff)
+            except ValueError:
+                messagebox.showerror("خطأ", "التاريخ يجب أن يكون بالصيغة YYYY-MM-DD", parent=sync_window)
+                return
+            
+            confirm = messagebox.askyesno(
+                "تأكيد الأرشفة",
+                f"سيتم نقل معاملات البائعين المسددين والنقلات المفوترة قبل {cutoff} إلى ملفات الأرشيف.\n"
+                f"الأرصدة لا تتغير. هل تريد المتابعة؟",
+                parent=sync_window
+            )
+            if not confirm:
+                return
+            
+            from db_worker import get_worker, deliver
+            
+            def on_archived(stats):
+                messagebox.showinfo(
+                    "نجاح",
+                    f"تمت الأرشفة بنجاح!\n\n"
+                    f"البائعون: {stats['sellers']}\n"
+                    f"المعاملات المؤرشفة: {stats['transactions']}\n"
+                    f"النقلات المؤرشفة: {stats['transfers']}\n"
+                    f"السنوات: {', '.join(str(year) for year in stats['years']) or '-'}",
+                    parent=sync_window
+                )
+            
+            def on_failed(e):
+                messagebox.showerror("خطأ", f"حدث خطأ أثناء الأرشفة:\n{str(e)}", parent=sync_window)
+            
+            # الأرشفة في خيط الكتابة حتى لا تتغير المعاملات بين النسخ والحذف
+            future = get_worker(self.db).write(self.db.archive_before, cutoff)
+            deliver(sync_window, future, on_archived, on_failed)
+        
+        tk.Button(
+            archive_frame, 
+            text="أرشفة", 
+            command=archive_data, 
+            bg='#95A5A6', 
+            fg='white', 
+            font=('Playpen Sans Arabic', 10, 'bold'), 
+            relief=tk.FLAT,
+            cursor='hand2'
+        ).pack(side=tk.RIGHT, padx=5)
 
 
 
 def main():
-    # تهيئة قاعدة البيانات
-    from database import Database
-    db = Database()
+    # تهيئة قاعدة البيانات (مرة واحدة للبرنامج كله)
+    from database import get_database
+    get_database()
     
     # إنشاء النافذة الرئيسية
     root = tk.Tk()
@@ -0,0 +1,206 @@
+"""
+صيانة ملف قاعدة البيانات
+
+مع الوقت تتغير توزيعات البيانات ولا يعرفها مخطط الاستعلامات، والصفوف
+المحذوفة (حذف المعاملات والنقلات والأرشفة) تترك صفحات فارغة داخل الملف،
+وملف WAL يكبر بين نقاط الحفظ. المهام هنا تعالج ذلك في وقت لا يلاحظه أحد:
+
+- عند الخمول (IDLE_SECONDS بدون ضغط زر أو مفتاح): مهام خفيفة من خيط
+  الكتابة (db_worker) فلا تتجمد الواجهة ولا تتنافس مع الحفظ
+- عند إغلاق البرنامج: نفس المهام كاملة، وحذف أقدم سجل التغييرات
+  (changelog)، والمهام الثقيلة (ANALYZE وفحص السلامة) إذا مرت فترتها
+  (TASK_INTERVALS)
+
+كل مهمة تسجل في الجدول maintenance_log: الزمن والنتيجة وعدد صفحات الملف
+والصفحات الفارغة قبلها وبعدها (شاشة التشخيص تعرض السجل).
+
+incremental_vacuum يحتاج auto_vacuum = INCREMENTAL. الملفات الجديدة تنشأ به
+(انظر CONNECTION_PRAGMAS)، أما الملف القديم فتحويله يحتاج VACUUM كامل قد
+يستغرق دقائق، لذلك لا يتم عند الخمول ولا عند الإغلاق بل بطلب صريح من شاشة
+التشخيص (enable_auto_vacuum).
+"""
+
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from time import perf_counter
+
+from db_worker import get_worker
+
+# مدة عدم الاستخدام قبل صيانة الخمول (بالثواني)
+IDLE_SECONDS = 5 * 60
+
+# الفترة بين كل فحص للخمول (بالمللي ثانية)
+CHECK_MS = 30 * 1000
+
+# أقصى عدد صفحات يعيدها incremental_vacuum في صيانة الخمول (عند الإغلاق: الكل)
+IDLE_VACUUM_PAGES = 2000
+
+# أقصى عدد أخطاء يسجلها فحص السلامة
+INTEGRITY_ERRORS = 20
+
+# المهام الثقيلة تعمل مرة واحدة كل فترة
+TASK_INTERVALS = {
+    'analyze': timedelta(days=7),
+    'integrity_check': timedelta(days=7),
+}
+
+# checkpoint في الآخر حتى تدخل فيه كتابات المهام السابقة
+IDLE_TASKS = ('optimize', 'incremental_vacuum', 'checkpoint')
+SHUTDOWN_TASKS = ('prune_changelog', 'optimize', 'analyze', 'incremental_vacuum', 'integrity_check', 'checkpoint')
+# تحويل ملف قديم (VACUUM كامل) بطلب من المستخدم فقط
+AUTO_VACUUM_TASKS = ('enable_auto_vacuum', 'checkpoint')
+
+
+def _optimize(db, conn, reason):
+    conn.execute('PRAGMA optimize').fetchall()
+    return 'ok'
+
+
+def _analyze(db, conn, reason):
+    conn.execute('ANALYZE')
+    return 'ok'
+
+
+def _auto_vacuum_enabled(conn):
+    return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+
+def _enable_auto_vacuum(db, conn, reason):
+    if _auto_vacuum_enabled(conn):
+        return 'auto_vacuum مفعل بالفعل'
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return 'auto_vacuum = INCREMENTAL (VACUUM كامل)'
+
+
+def _incremental_vacuum(db, conn, reason):
+    if not _auto_vacuum_enabled(conn):
+        return 'auto_vacuum غير مفعل (يفعل من شاشة التشخيص)'
+    pages = IDLE_VACUUM_PAGES if reason == 'idle' else 0
+    # execute ينفذ خطوة واحدة فقط (صفحة واحدة) لأن الأمر لا يرجع صفوفاً،
+    # أما executescript فينفذه حتى النهاية
+    conn.executescript(f'PRAGMA incremental_vacuum({pages})')
+    return 'ok'
+
+
+def _checkpoint(db, conn, reason):
+    # PASSIVE لا ينتظر القراء، و TRUNCATE عند الإغلاق يفرغ ملف WAL
+    mode = 'PASSIVE' if reason == 'idle' else 'TRUNCATE'
+    busy, log_pages, checkpointed = conn.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+    return f'{mode}: busy={busy} wal={log_pages} checkpointed={checkpointed}'
+
+
+def _integrity_check(db, conn, reason):
+    errors = [row[0] for row in conn.execute(f'PRAGMA integrity_check({INTEGRITY_ERRORS})')]
+    if errors == ['ok']:
+        return 'ok'
+    print(f"تحذير: فحص سلامة قاعدة البيانات وجد أخطاء: {errors}")
+    return '; '.join(errors)
+
+
+def _prune_changelog(db, conn, reason):
+    return f'حذف {db.prune_changelog()} صف'
+
+
+TASKS = {
+    'optimize': _optimize,
+    'analyze': _analyze,
+    'incremental_vacuum': _incremental_vacuum,
+    'enable_auto_vacuum': _enable_auto_vacuum,
+    'checkpoint': _checkpoint,
+    'integrity_check': _integrity_check,
+    'prune_changelog': _prune_changelog,
+}
+
+
+def _pages(conn):
+    """(عدد صفحات الملف، الصفحات الفارغة)"""
+    return (conn.execute('PRAGMA page_count').fetchone()[0],
+            conn.execute('PRAGMA freelist_count').fetchone()[0])
+
+
+def _is_due(db, task, now):
+    interval = TASK_INTERVALS.get(task)
+    if interval is None:
+        return True
+    last = db.get_last_maintenance_time(task)
+    return last is None or now - datetime.fromisoformat(last) >= interval
+
+
+def enable_auto_vacuum(db):
+    """تحويل ملف قديم إلى auto_vacuum = INCREMENTAL (VACUUM كامل، يشغل من خيط الكتابة)"""
+    return run_maintenance(db, 'manual', AUTO_VACUUM_TASKS)
+
+
+def run_maintenance(db, reason, tasks=None):
+    """
+    تشغيل مهام الصيانة على اتصال الخيط الحالي وتسجيلها في maintenance_log
+
+    لا تستدعى داخل db.transaction() (VACUUM لا يعمل داخل معاملة).
+
+    Args:
+        reason: 'idle' أو 'shutdown' أو 'manual' (طلب من المستخدم)
+        tasks: أسماء المهام من TASKS (الافتراضي حسب reason)
+
+    Returns:
+        list: (المهمة، الزمن بالمللي ثانية، النتيجة) للمهام التي تم تشغيلها
+    """
+    if tasks is None:
+        tasks = IDLE_TASKS if reason == 'idle' else SHUTDOWN_TASKS
+    conn = db.get_connection()
+    results = []
+    for task in tasks:
+        now = datetime.now()
+        if not _is_due(db, task, now):
+            continue
+        pages_before, free_before = _pages(conn)
+        start = perf_counter()
+        try:
+            result = TASKS[task](db, conn, reason)
+        except sqlite3.Error as e:
+            result = f'خطأ: {e}'
+        duration_ms = (perf_counter() - start) * 1000
+        pages_after, free_after = _pages(conn)
+        db.add_maintenance_log(now.isoformat(timespec='seconds'), reason, task, duration_ms, result,
+                               pages_before, pages_after, free_before, free_after)
+        results.append((task, duration_ms, result))
+    return results
+
+
+class MaintenanceScheduler:
+    """صيانة الخمول من خيط الكتابة، وصيانة الإغلاق عند الخروج"""
+
+    def __init__(self, root, db, idle_seconds=IDLE_SECONDS):
+        self.root = root
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self.last_activity = time.monotonic()
+        # صيانة واحدة لكل فترة خمول
+        self.ran_since_activity = False
+        self.pending = None
+
+        # bind_all يشمل كل النوافذ المفتوحة من البرنامج
+        for sequence in ('<Any-KeyPress>', '<Any-ButtonPress>', '<MouseWheel>'):
+            root.bind_all(sequence, self.touch, add='+')
+        root.after(CHECK_MS, self.check)
+
+    def touch(self, event=None):
+        self.last_activity = time.monotonic()
+        self.ran_since_activity = False
+
+    def check(self):
+        if not self.root.winfo_exists():
+            return
+        idle = time.monotonic() - self.last_activity >= self.idle_seconds
+        if idle and not self.ran_since_activity and (self.pending is None or self.pending.done()):
+            self.ran_since_activity = True
+            self.pending = get_worker(self.db).write(run_maintenance, self.db, 'idle')
+        self.root.after(CHECK_MS, self.check)
+
+    def shutdown(self):
+        """صيانة الإغلاق (تستدعى بعد close_worker وقبل Database.close)"""
+        try:
+            run_maintenance(self.db, 'shutdown')
+        except sqlite3.Error as e:
+            print(f"خطأ في صيانة قاعدة البيانات: {e}")
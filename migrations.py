@@ -0,0 +1,850 @@
+"""
+ترحيلات مخطط قاعدة البيانات
+
+كل خطوة لها رقم إصدار، وتطبق مرة واحدة فقط عند بدء البرنامج.
+رقم آخر خطوة مطبقة يحفظ في PRAGMA user_version داخل ملف قاعدة البيانات،
+لذلك لا تحتاج دوال القراءة والكتابة إلى أي أوامر CREATE أو ALTER.
+
+لإضافة تعديل جديد على المخطط: أضف دالة جديدة في آخر القائمة MIGRATIONS
+برقم إصدار أكبر، ولا تعدل الخطوات القديمة أبداً.
+"""
+
+import sqlite3
+
+from archive import ARCHIVE_VERSION, archive_files
+from money import PIASTERS_PER_POUND
+from text_search import SEARCH_KINDS, SEARCH_KIND_SLOTS
+
+
+def _table_columns(cursor, table):
+    """أسماء أعمدة جدول معين (table_xinfo تشمل الأعمدة المحسوبة)"""
+    return [row[1] for row in cursor.execute(f'PRAGMA table_xinfo({table})').fetchall()]
+
+
+def _add_column(cursor, table, column, definition):
+    """إضافة عمود إذا لم يكن موجوداً (قواعد البيانات القديمة قد تحتويه بالفعل)"""
+    if column not in _table_columns(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def migration_1_base_schema(cursor):
+    """الجداول الأساسية كما كانت تنشأ في init_database"""
+    # جدول العملاء
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # جدول الموردين
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS suppliers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT,
+            address TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # جدول المنتجات (الخضروات والفواكه)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            category TEXT,
+            unit TEXT,
+            price REAL DEFAULT 0,
+            stock_quantity REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # جدول المبيعات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER,
+            sale_date DATE NOT NULL,
+            total_amount REAL DEFAULT 0,
+            paid_amount REAL DEFAULT 0,
+            remaining_amount REAL DEFAULT 0,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (customer_id) REFERENCES customers(id)
+        )
+    ''')
+    
+    # جدول تفاصيل المبيعات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sale_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sale_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL,
+            FOREIGN KEY (sale_id) REFERENCES sales(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    ''')
+    
+    # جدول المشتريات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS purchases (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            supplier_id INTEGER,
+            purchase_date DATE NOT NULL,
+            total_amount REAL DEFAULT 0,
+            paid_amount REAL DEFAULT 0,
+            remaining_amount REAL DEFAULT 0,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (supplier_id) REFERENCES suppliers(id)
+        )
+    ''')
+    
+    # جدول تفاصيل المشتريات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS purchase_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            purchase_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity REAL NOT NULL,
+            unit_price REAL NOT NULL,
+            total_price REAL NOT NULL,
+            FOREIGN KEY (purchase_id) REFERENCES purchases(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+    ''')
+    
+    # جدول المدفوعات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            type TEXT NOT NULL, -- 'sale' or 'purchase'
+            reference_id INTEGER NOT NULL, -- sale_id or purchase_id
+            amount REAL NOT NULL,
+            payment_date DATE NOT NULL,
+            payment_method TEXT,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # جدول حسابات البائعين
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sellers_accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seller_name TEXT NOT NULL,
+            phone TEXT, -- رقم الهاتف (جديد)
+            remaining_amount REAL DEFAULT 0,
+            total_credit REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # محاولة إضافة عمود phone إذا لم يكن موجوداً
+    _add_column(cursor, 'sellers_accounts', 'phone', 'TEXT')
+    
+    # جدول معاملات البائعين (الحساب الجاري)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS seller_transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            seller_id INTEGER NOT NULL,
+            amount REAL DEFAULT 0,
+            status TEXT, -- مدفوع / متبقي
+            count REAL DEFAULT 0,
+            weight REAL DEFAULT 0,
+            price REAL DEFAULT 0,
+            item_name TEXT,
+            date TEXT,
+            day_name TEXT,
+            equipment TEXT,
+            note TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (seller_id) REFERENCES sellers_accounts(id) ON DELETE CASCADE
+        )
+    ''')
+    
+    # جدول الوجبات / الأصناف
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            price_per_kg REAL DEFAULT 0,
+            equipment_weight REAL DEFAULT 0, -- وزن العدة المقابل (مثلاً 15 كيلو)
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # جدول ترحيل الزراعة
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS agriculture_transfers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            shipment_name TEXT,
+            seller_name TEXT,
+            item_name TEXT,
+            unit_price REAL DEFAULT 0,
+            weight REAL DEFAULT 0,
+            count REAL DEFAULT 0,
+            equipment TEXT,
+            transfer_type TEXT, -- 'in' or 'out'
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # جدول المنصرفات
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            description TEXT NOT NULL,
+            amount REAL NOT NULL,
+            expense_date DATE NOT NULL,
+            note TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # محاولة إضافة عمود transfer_type إذا لم يكن موجوداً
+    _add_column(cursor, 'agriculture_transfers', 'transfer_type', 'TEXT')
+    
+    # محاولة إضافة عمود count إذا لم يكن موجوداً (للنسخ القديمة من قاعدة البيانات)
+    _add_column(cursor, 'agriculture_transfers', 'count', 'REAL DEFAULT 0')
+
+    # جدول العدة
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            quantity INTEGER DEFAULT 0,
+            price REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # إضافة عمود السعر إذا لم يكن موجوداً (للتوافق مع قواعد البيانات القديمة)
+    _add_column(cursor, 'inventory_items', 'price', 'REAL DEFAULT 0')
+
+    # جدول فواتير العملاء
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS client_invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_name TEXT,
+            nolon REAL DEFAULT 0,
+            commission TEXT DEFAULT '10%',
+            mashal REAL DEFAULT 0,
+            rent REAL DEFAULT 0,
+            cash REAL DEFAULT 0,
+            invoice_date TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # جدول التقارير اليومية
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_date DATE NOT NULL UNIQUE,
+            total_collection REAL DEFAULT 0,
+            remaining_profit REAL DEFAULT 0,
+            total_expenses REAL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def migration_2_clients_accounts(cursor):
+    """جدول حسابات العملاء (كان ينشأ داخل دوال العملاء عند كل استدعاء)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS clients_accounts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_name TEXT NOT NULL UNIQUE,
+            balance REAL DEFAULT 0,
+            phone TEXT
+        )
+    ''')
+
+
+def migration_3_transfer_invoice_link(cursor):
+    """ربط النقلات بالفواتير المجمعة"""
+    _add_column(cursor, 'agriculture_transfers', 'invoice_id', 'INTEGER')
+
+
+def migration_4_invoice_totals(cursor):
+    """حفظ الصافي والإجمالي النهائي في فواتير العملاء"""
+    _add_column(cursor, 'client_invoices', 'net_amount', 'REAL DEFAULT 0')
+    _add_column(cursor, 'client_invoices', 'final_total', 'REAL DEFAULT 0')
+
+
+def migration_5_ledger_indexes(cursor):
+    """فهارس جداول الدفاتر مصممة حسب شكل الاستعلامات الفعلية في database.py"""
+    indexes = [
+        # أرصدة البائع وآخر دفعة: البائع ثم الحالة ثم التاريخ
+        'idx_seller_transactions_seller_status_date ON seller_transactions(seller_id, status, date)',
+        # كشف حساب البائع وآخر معاملة مرتبة بالتاريخ
+        'idx_seller_transactions_seller_date ON seller_transactions(seller_id, date)',
+        # تحصيل اليوم (مدفوع + تاريخ) ويغطي الصنف والمبلغ بدون قراءة الجدول
+        'idx_seller_transactions_status_date ON seller_transactions(status, date, item_name, amount)',
+        # نقلات العميل التي لم تدخل فاتورة
+        'idx_agriculture_transfers_shipment ON agriculture_transfers(shipment_name, transfer_type, invoice_id)',
+        'idx_agriculture_transfers_invoice ON agriculture_transfers(invoice_id)',
+        'idx_agriculture_transfers_created ON agriculture_transfers(created_at)',
+        # ملخص المبيعات حسب الصنف
+        'idx_agriculture_transfers_item ON agriculture_transfers(item_name, weight, unit_price)',
+        # منصرفات اليوم وقائمة المنصرفات مرتبة بالتاريخ
+        'idx_expenses_date ON expenses(expense_date)',
+        # فواتير العميل مرتبة بالتاريخ
+        'idx_client_invoices_owner_date ON client_invoices(owner_name, invoice_date)',
+        # البحث عن البائع بالاسم
+        'idx_sellers_accounts_name ON sellers_accounts(seller_name)',
+    ]
+    for index in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+
+
+# شروط تصنيف المعاملة (نفس منطق get_sellers_with_balances القديم)
+_GOODS = "{row}.status != 'مدفوع'"
+_PAID = "{row}.status = 'مدفوع'"
+_ALLOWANCE = "{row}.item_name LIKE '%سماح%'"
+
+
+def _amount_if(condition, row):
+    return f"CASE WHEN {condition.format(row=row)} THEN COALESCE({row}.amount, 0) ELSE 0 END"
+
+
+def _refresh_last_dates(seller):
+    """إعادة حساب تواريخ آخر دفعة وآخر معاملة لبائع (قراءة واحدة من الفهرس لكل تاريخ)"""
+    return f'''
+        UPDATE seller_balances SET
+            last_payment_date = (SELECT MAX(date) FROM seller_transactions
+                                 WHERE seller_id = {seller} AND status = 'مدفوع'),
+            last_transaction_date = (SELECT MAX(date) FROM seller_transactions
+                                     WHERE seller_id = {seller})
+        WHERE seller_id = {seller};
+    '''
+
+
+def _add_to_balance(row):
+    """إضافة أثر معاملة (NEW) على ملخص البائع"""
+    return f'''
+        INSERT INTO seller_balances
+            (seller_id, total_goods, total_paid, total_allowance, last_payment_date, last_transaction_date)
+        VALUES ({row}.seller_id, {_amount_if(_GOODS, row)}, {_amount_if(_PAID, row)}, {_amount_if(_ALLOWANCE, row)},
+                CASE WHEN {_PAID.format(row=row)} THEN {row}.date END, {row}.date)
+        ON CONFLICT(seller_id) DO UPDATE SET
+            total_goods = total_goods + excluded.total_goods,
+            total_paid = total_paid + excluded.total_paid,
+            total_allowance = total_allowance + excluded.total_allowance,
+            last_payment_date = CASE WHEN excluded.last_payment_date > COALESCE(last_payment_date, '')
+                                     THEN excluded.last_payment_date ELSE last_payment_date END,
+            last_transaction_date = CASE WHEN excluded.last_transaction_date > COALESCE(last_transaction_date, '')
+                                         THEN excluded.last_transaction_date ELSE last_transaction_date END;
+    '''
+
+
+def _subtract_from_balance(row):
+    """إزالة أثر معاملة (OLD) من ملخص البائع"""
+    return f'''
+        UPDATE seller_balances SET
+            total_goods = total_goods - {_amount_if(_GOODS, row)},
+            total_paid = total_paid - {_amount_if(_PAID, row)},
+            total_allowance = total_allowance - {_amount_if(_ALLOWANCE, row)}
+        WHERE seller_id = {row}.seller_id;
+    '''
+
+
+def _rebuild_seller_balances(cursor):
+    """تعبئة ملخص أرصدة البائعين من المعاملات الحالية من جديد"""
+    cursor.execute('DELETE FROM seller_balances')
+    cursor.execute(f'''
+        INSERT INTO seller_balances
+            (seller_id, total_goods, total_paid, total_allowance, last_payment_date, last_transaction_date)
+        SELECT t.seller_id,
+               SUM({_amount_if(_GOODS, 't')}),
+               SUM({_amount_if(_PAID, 't')}),
+               SUM({_amount_if(_ALLOWANCE, 't')}),
+               MAX(CASE WHEN {_PAID.format(row='t')} THEN t.date END),
+               MAX(t.date)
+        FROM seller_transactions t
+        WHERE t.seller_id IN (SELECT id FROM sellers_accounts)
+        GROUP BY t.seller_id
+    ''')
+
+
+def migration_6_seller_balances(cursor):
+    """
+    ملخص أرصدة البائعين تحدثه الـ triggers عند كل تعديل على seller_transactions
+    
+    شاشة الحسابات تقرأ صفاً واحداً لكل بائع بدلاً من جمع كل معاملاته.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS seller_balances (
+            seller_id INTEGER PRIMARY KEY REFERENCES sellers_accounts(id) ON DELETE CASCADE,
+            total_goods REAL NOT NULL DEFAULT 0,
+            total_paid REAL NOT NULL DEFAULT 0,
+            total_allowance REAL NOT NULL DEFAULT 0,
+            last_payment_date TEXT,
+            last_transaction_date TEXT
+        )
+    ''')
+    
+    _rebuild_seller_balances(cursor)
+    
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_seller_balances_insert
+        AFTER INSERT ON seller_transactions
+        BEGIN
+            {_add_to_balance('NEW')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_seller_balances_delete
+        AFTER DELETE ON seller_transactions
+        BEGIN
+            {_subtract_from_balance('OLD')}
+            {_refresh_last_dates('OLD.seller_id')}
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_seller_balances_update
+        AFTER UPDATE OF seller_id, amount, status, item_name, date ON seller_transactions
+        BEGIN
+            {_subtract_from_balance('OLD')}
+            {_add_to_balance('NEW')}
+            {_refresh_last_dates('OLD.seller_id')}
+            {_refresh_last_dates('NEW.seller_id')}
+        END
+    ''')
+
+
+def migration_7_transfer_type_index(cursor):
+    """فهرس النقلات حسب النوع مرتب بوقت الإنشاء (قائمة نقلات العملاء 'in')"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_agriculture_transfers_type_created ON agriculture_transfers(transfer_type, created_at)')
+
+
+# مصادر فهرس البحث: (الجدول، النوع، أعمدة تعدل الفهرس، {عمود الفهرس: الأعمدة المصدر})
+# القيم تكتب بعد arabic_normalize (دالة مسجلة في database.connect)
+_SEARCH_SOURCES = [
+    ('sellers_accounts', 'seller', ['seller_name'], {'names': ['seller_name']}),
+    ('clients_accounts', 'client', ['client_name'], {'names': ['client_name']}),
+    ('meals', 'meal', ['name'], {'items': ['name']}),
+    ('agriculture_transfers', 'transfer', ['shipment_name', 'seller_name', 'item_name'],
+     {'names': ['shipment_name', 'seller_name'], 'items': ['item_name']}),
+    ('seller_transactions', 'transaction', ['item_name', 'note'],
+     {'items': ['item_name'], 'notes': ['note']}),
+]
+_SEARCH_COLUMNS = ('names', 'items', 'notes')
+
+
+def _search_row(row, kind, fields):
+    """(rowid، names، items، notes) لصف في فهرس البحث"""
+    values = []
+    for column in _SEARCH_COLUMNS:
+        sources = fields.get(column, [])
+        parts = [f'arabic_normalize({row}.{source})' for source in sources]
+        values.append(" || ' ' || ".join(parts) or "''")
+    rowid = f'{row}.id * {SEARCH_KIND_SLOTS} + {SEARCH_KINDS[kind]}'
+    return ', '.join([rowid] + values)
+
+
+def migration_8_search_index(cursor):
+    """
+    فهرس بحث FTS5 للأسماء والأصناف والملاحظات بعد توحيد الحروف العربية
+    
+    الفهرس بدون محتوى (content='') ليبقى صغيراً: يحفظ الكلمات فقط، ونوع
+    الصف ومعرفه يحسبان من rowid. الحذف من هذا النوع يحتاج نفس القيم التي
+    أضيفت، لذلك أي تغيير في arabic_normalize يحتاج إعادة بناء الفهرس.
+    """
+    cursor.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_index
+        USING fts5({', '.join(_SEARCH_COLUMNS)}, content='', tokenize='unicode61')
+    ''')
+    columns = 'rowid, ' + ', '.join(_SEARCH_COLUMNS)
+    
+    for table, kind, watched, fields in _SEARCH_SOURCES:
+        cursor.execute(f'INSERT INTO search_index ({columns}) SELECT {_search_row(table, kind, fields)} FROM {table}')
+        
+        insert = f'INSERT INTO search_index ({columns}) VALUES ({_search_row("NEW", kind, fields)});'
+        delete = (f"INSERT INTO search_index (search_index, {columns}) "
+                  f"VALUES ('delete', {_search_row('OLD', kind, fields)});")
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_search_{table}_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                {insert}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_search_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN
+                {delete}
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_search_{table}_update
+            AFTER UPDATE OF {', '.join(watched)} ON {table}
+            BEGIN
+                {delete}
+                {insert}
+            END
+        ''')
+
+
+
+# رقم اليوم من نص التاريخ: نفس date.toordinal() في بايثون (1 = 0001-01-01)
+# يقبل YYYY-MM-DD و YYYY/MM/DD، وأي نص آخر يعطي NULL
+DAY_NUMBER_SQL = "CAST(julianday(replace(trim({column}), '/', '-')) - 1721424.5 AS INTEGER)"
+
+# (الجدول، عمود التاريخ النصي، عمود رقم اليوم)
+_DAY_COLUMNS = [
+    ('seller_transactions', 'date', 'day'),
+    ('expenses', 'expense_date', 'expense_day'),
+    ('daily_reports', 'report_date', 'report_day'),
+    ('client_invoices', 'invoice_date', 'invoice_day'),
+]
+
+
+def migration_9_day_numbers(cursor):
+    """
+    عمود رقم يوم صحيح بجانب كل عمود تاريخ نصي، لاستعلامات الفترات بالفهرس
+    
+    العمود محسوب (GENERATED VIRTUAL) فلا يحتاج تعبئة ولا تحديث عند الكتابة،
+    وقيمته تحفظ فعلياً في الفهارس فقط.
+    """
+    for table, date_column, day_column in _DAY_COLUMNS:
+        expression = DAY_NUMBER_SQL.format(column=date_column)
+        _add_column(cursor, table, day_column, f'INTEGER GENERATED ALWAYS AS ({expression}) VIRTUAL')
+    
+    indexes = [
+        # كشف حساب البائع لفترة والرصيد قبلها، وآخر دفعة/معاملة للمتأخرات
+        'idx_seller_transactions_seller_day ON seller_transactions(seller_id, day)',
+        # مجاميع التحصيل اليومية وقائمة التحصيلات (تحل محل الفهرس بالتاريخ النصي)
+        'idx_seller_transactions_status_day ON seller_transactions(status, day, item_name, amount)',
+        'idx_expenses_day ON expenses(expense_day)',
+        'idx_daily_reports_day ON daily_reports(report_day)',
+        'idx_client_invoices_day ON client_invoices(invoice_day)',
+    ]
+    for index in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+    cursor.execute('DROP INDEX IF EXISTS idx_seller_transactions_status_date')
+
+
+def _scale_to_piasters(cursor, columns_by_table, schema='main'):
+    """ضرب أعمدة بالجنيه في 100 وتقريبها لعدد صحيح من القروش"""
+    for table, columns in columns_by_table.items():
+        assignments = ', '.join(f'{column} = ROUND({column} * {PIASTERS_PER_POUND})' for column in columns)
+        cursor.execute(f'UPDATE {schema}.{table} SET {assignments}')
+
+
+def migration_10_money_piasters(cursor):
+    """
+    تحويل مبالغ الدفاتر من جنيه بكسور عشرية إلى عدد صحيح من القروش
+    
+    الأعمدة تبقى REAL (إعادة بناء الجداول تحتاج إعادة كل الـ triggers
+    والأعمدة المحسوبة)، لكن القيم كلها أعداد صحيحة فيكون جمعها دقيقاً.
+    الأسعار وبنود الفواتير حولها الترحيل 16.
+    """
+    # قائمة ثابتة وليست money.MONEY_COLUMNS: تعديل تلك القائمة لاحقاً لا يغير هذه الخطوة
+    _scale_to_piasters(cursor, {
+        'sellers_accounts': ('remaining_amount', 'total_credit'),
+        'seller_transactions': ('amount',),
+        'clients_accounts': ('balance',),
+        'expenses': ('amount',),
+        'daily_reports': ('total_collection', 'remaining_profit', 'total_expenses'),
+    })
+    
+    # الـ triggers حدثت الملخص بفروق غير دقيقة أثناء التحويل، فيعاد حسابه
+    _rebuild_seller_balances(cursor)
+
+
+def migration_11_archive_state(cursor):
+    """حالة أرشيف المواسم المغلقة وعلامة معاملات الترحيل (انظر archive.py)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archive_state (
+            table_name TEXT PRIMARY KEY,
+            first_day INTEGER NOT NULL,     -- أقدم يوم في ملفات الأرشيف
+            cutoff_day INTEGER NOT NULL     -- كل ما قبل هذا اليوم قد يكون في الأرشيف
+        )
+    ''')
+    # 1 = معاملة ترحيل تجمع معاملات نقلت للأرشيف
+    _add_column(cursor, 'seller_transactions', 'carry_forward', 'INTEGER NOT NULL DEFAULT 0')
+
+
+def migration_12_maintenance_log(cursor):
+    """سجل مهام الصيانة (انظر maintenance.py): الزمن والنتيجة وحجم الملف قبل وبعد"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_at TEXT NOT NULL,
+            reason TEXT NOT NULL,           -- idle أو shutdown
+            task TEXT NOT NULL,
+            duration_ms REAL NOT NULL,
+            result TEXT,
+            pages_before INTEGER,
+            pages_after INTEGER,
+            free_pages_before INTEGER,
+            free_pages_after INTEGER
+        )
+    ''')
+    # آخر تشغيل لكل مهمة (المهام الثقيلة تعمل مرة كل فترة)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_maintenance_log_task ON maintenance_log(task, run_at)')
+
+
+# جداول الدفاتر والجداول المرجعية التي تسجل تغييراتها في changelog
+CHANGELOG_TABLES = (
+    'sellers_accounts',
+    'seller_transactions',
+    'clients_accounts',
+    'inventory_items',
+    'meals',
+    'agriculture_transfers',
+    'expenses',
+    'client_invoices',
+    'daily_reports',
+)
+
+
+def migration_13_changelog(cursor):
+    """
+    سجل التغييرات: صف لكل إضافة أو تعديل أو حذف في CHANGELOG_TABLES
+    
+    seq يزيد دائماً (AUTOINCREMENT لا يعيد استخدام الأرقام بعد الحذف)، فمن
+    يحفظ آخر seq قرأه يحصل على ما تغير بعده فقط (Database.changes_since).
+    op: 'I' إضافة، 'U' تعديل، 'D' حذف.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS changelog (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL
+        )
+    ''')
+    for table in CHANGELOG_TABLES:
+        _create_changelog_triggers(cursor, table)
+
+
+# عمود البائع في الجداول التي لها بصمة لكل بائع (Database.fingerprint)
+_CHANGELOG_SELLER_COLUMNS = {
+    'sellers_accounts': 'id',
+    'seller_transactions': 'seller_id',
+}
+
+
+def _create_changelog_triggers(cursor, table, seller_column=None):
+    """triggers الإضافة والحذف والتعديل لجدول في changelog (مع معرف البائع إن وجد)"""
+    if seller_column is None:
+        columns, new, old = 'table_name, row_id, op', f"'{table}', NEW.id", f"'{table}', OLD.id"
+    else:
+        columns = 'table_name, row_id, seller_id, op'
+        new, old = f"'{table}', NEW.id, NEW.{seller_column}", f"'{table}', OLD.id, OLD.{seller_column}"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_{table}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO changelog ({columns}) VALUES ({new}, 'I');
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_{table}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO changelog ({columns}) VALUES ({old}, 'D');
+        END
+    ''')
+    # تغيير المعرف نفسه = حذف القديم وتعديل الجديد، ونقل معاملة لبائع آخر
+    # يسجل للبائع القديم أيضاً
+    moved = 'OLD.id IS NOT NEW.id'
+    if seller_column is not None and seller_column != 'id':
+        moved += f' OR OLD.{seller_column} IS NOT NEW.{seller_column}'
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_changelog_{table}_update
+        AFTER UPDATE ON {table}
+        BEGIN
+            INSERT INTO changelog ({columns})
+            SELECT {old}, 'D' WHERE {moved};
+            INSERT INTO changelog ({columns}) VALUES ({new}, 'U');
+        END
+    ''')
+
+
+def migration_14_fingerprints(cursor):
+    """
+    فهارس بصمات البيانات (Database.fingerprint): آخر seq لكل جدول ولكل بائع
+    
+    changelog يحفظ معرف البائع لمعاملاته ولحسابه، فتعرف شاشة كشف الحساب
+    هل تغير شيء عند البائع بقراءة صف واحد من الفهرس.
+    """
+    _add_column(cursor, 'changelog', 'seller_id', 'INTEGER')
+    for table, seller_column in _CHANGELOG_SELLER_COLUMNS.items():
+        for op in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_changelog_{table}_{op}')
+        _create_changelog_triggers(cursor, table, seller_column)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_changelog_table ON changelog(table_name, seq)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_changelog_seller ON changelog(seller_id, seq) WHERE seller_id IS NOT NULL')
+
+
+
+def migration_15_day_page_indexes(cursor):
+    """
+    صفحات وقوائم الدفاتر ترتب برقم اليوم بدلاً من نص التاريخ
+    
+    فهرس (العميل، رقم اليوم) لفواتير العميل، وحذف فهارس التاريخ النصي التي
+    كانت للترتيب فقط ولم يعد يستخدمها أي استعلام.
+    """
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_client_invoices_owner_day ON client_invoices(owner_name, invoice_day)')
+    for index in ('idx_seller_transactions_seller_date', 'idx_expenses_date', 'idx_client_invoices_owner_date'):
+        cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+
+def _scale_archive_prices(path):
+    """تحويل أسعار ملف أرشيف إلى القروش مرة واحدة (user_version الملف يمنع التكرار)"""
+    conn = sqlite3.connect(path)
+    try:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= ARCHIVE_VERSION:
+            return
+        with conn:
+            _scale_to_piasters(conn.cursor(), {
+                'seller_transactions': ('price',),
+                'agriculture_transfers': ('unit_price',),
+            })
+            conn.execute(f'PRAGMA user_version = {ARCHIVE_VERSION}')
+    finally:
+        conn.close()
+
+
+def migration_16_prices_piasters(cursor):
+    """
+    تحويل الأسعار وبنود فواتير العملاء إلى القروش مثل باقي المبالغ
+    
+    بعد الترحيل 10 كانت مبالغ الدفاتر بالقرش والأسعار بجانبها بالجنيه في
+    نفس الصفوف. الآن كل عمود في money.MONEY_COLUMNS بالقرش. ملفات الأرشيف
+    منفصلة عن المعاملة، فيحمي user_version كل ملف من التحويل مرتين.
+    """
+    # قائمة ثابتة مثل الترحيل 10 (commission نسبة نصية وليست مبلغاً)
+    _scale_to_piasters(cursor, {
+        'seller_transactions': ('price',),
+        'agriculture_transfers': ('unit_price',),
+        'meals': ('price_per_kg',),
+        'inventory_items': ('price',),
+        'client_invoices': ('nolon', 'mashal', 'rent', 'cash', 'net_amount', 'final_total'),
+    })
+    
+    main = next(row[2] for row in cursor.execute('PRAGMA database_list').fetchall() if row[1] == 'main')
+    if main:
+        for path in archive_files(main):
+            _scale_archive_prices(path)
+
+
+def migration_17_import_state(cursor):
+    """
+    آخر نسخة مستوردة من كل قاعدة بيانات مصدر (انظر DataSync.import_data)
+    
+    ملف التغييرات يطبق فقط على قاعدة استوردت نسخته الكاملة (base) وكل ملف
+    قبله في السلسلة، أي أن since في رأسه يساوي watermark المحفوظ هنا.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS import_state (
+            source TEXT PRIMARY KEY,        -- database_name في رأس الملف
+            base TEXT NOT NULL,             -- اسم ملف النسخة الكاملة
+            base_date TEXT NOT NULL,        -- export_date للنسخة الكاملة
+            watermark INTEGER,              -- رقم آخر تغيير في آخر ملف مستورد
+            last_file TEXT NOT NULL,
+            imported_at TEXT NOT NULL
+        )
+    ''')
+
+
+def migration_18_order_indexes(cursor):
+    """
+    فهارس بترتيب القوائم نفسه حتى لا يرتب SQLite الصفوف في جدول مؤقت (TEMP B-TREE)
+    
+    كشف حساب البائع (اليوم تصاعدياً ثم id تنازلياً)، وقائمة التحصيلات (id بعد
+    اليوم في فهرس الحالة، ويبقى يغطي مجاميع التحصيل اليومية)، ونقلات العميل
+    ونقلات الفاتورة مرتبة بوقت الإضافة. الفهارس الجديدة تغني عن القديمة التي
+    تحذف (أعمدتها الأولى نفسها).
+    """
+    indexes = [
+        'idx_seller_transactions_statement ON seller_transactions(seller_id, day, id DESC)',
+        'idx_seller_transactions_status_day_id ON seller_transactions(status, day, id, item_name, amount)',
+        'idx_agriculture_transfers_shipment_created ON agriculture_transfers(shipment_name, created_at)',
+        'idx_agriculture_transfers_invoice_created ON agriculture_transfers(invoice_id, created_at)',
+    ]
+    for index in indexes:
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index}')
+    for index in ('idx_seller_transactions_status_day', 'idx_agriculture_transfers_shipment',
+                  'idx_agriculture_transfers_invoice'):
+        cursor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+# (رقم الإصدار، الدالة) - بالترتيب
+MIGRATIONS = [
+    (1, migration_1_base_schema),
+    (2, migration_2_clients_accounts),
+    (3, migration_3_transfer_invoice_link),
+    (4, migration_4_invoice_totals),
+    (5, migration_5_ledger_indexes),
+    (6, migration_6_seller_balances),
+    (7, migration_7_transfer_type_index),
+    (8, migration_8_search_index),
+    (9, migration_9_day_numbers),
+    (10, migration_10_money_piasters),
+    (11, migration_11_archive_state),
+    (12, migration_12_maintenance_log),
+    (13, migration_13_changelog),
+    (14, migration_14_fingerprints),
+    (15, migration_15_day_page_indexes),
+    (16, migration_16_prices_piasters),
+    (17, migration_17_import_state),
+    (18, migration_18_order_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """رقم آخر ترحيل مطبق على قاعدة البيانات"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn):
+    """
+    تطبيق الترحيلات المعلقة بالترتيب
+    
+    كل خطوة تنفذ في معاملة مستقلة مع تحديث user_version، فإذا فشلت
+    خطوة لا يحفظ منها شيء ويعاد تطبيقها في المرة القادمة.
+    
+    Returns:
+        list: أرقام الإصدارات التي تم تطبيقها الآن
+    """
+    applied = []
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return applied
+    
+    for version, step in MIGRATIONS:
+        cursor = conn.cursor()
+        # BEGIN IMMEDIATE يمنع نسختين من البرنامج من تطبيق نفس الخطوة معاً
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            step(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append(version)
+    
+    return applied
@@ -0,0 +1,75 @@
+"""
+المبالغ المالية بالقرش
+
+كل المبالغ والأسعار تحفظ في قاعدة البيانات كعدد صحيح من القروش (1 جنيه = 100 قرش)
+بدلاً من كسور عشرية، لذلك الجمع والطرح دقيق تماماً: المجاميع والملخصات
+(مثل seller_balances) يمكن تحديثها بالفرق فقط بدون تراكم أخطاء التقريب.
+
+البرنامج كله يتعامل بالجنيه؛ التحويل يتم فقط عند الحدود:
+- Database تحول المبالغ إلى قروش عند الكتابة وتقسم على 100 عند القراءة
+- ملفات النسخ الاحتياطي تحفظ وحدة المبالغ (انظر DataSync)
+- ملفات الطباعة تعرض المبالغ بـ format_money
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+PIASTERS_PER_POUND = 100
+
+# وحدة المبالغ في ملفات التصدير الجديدة: كل أعمدة MONEY_COLUMNS بالقرش
+MONEY_UNIT = 'piasters-v2'
+
+# ملفات 'piasters' (بين الترحيل 10 والترحيل 16): مبالغ الدفاتر بالقرش
+# لكن أعمدة PRICE_COLUMNS بالجنيه، والملفات بدون وحدة كلها بالجنيه
+LEDGER_MONEY_UNIT = 'piasters'
+
+# الأسعار وبنود الفواتير (بالقرش منذ الترحيل 16)
+PRICE_COLUMNS = {
+    'seller_transactions': ('price',),
+    'agriculture_transfers': ('unit_price',),
+    'meals': ('price_per_kg',),
+    'inventory_items': ('price',),
+    'client_invoices': ('nolon', 'mashal', 'rent', 'cash', 'net_amount', 'final_total'),
+}
+
+# أعمدة المبالغ المحفوظة بالقرش في كل جدول
+MONEY_COLUMNS = {
+    'sellers_accounts': ('remaining_amount', 'total_credit'),
+    'seller_transactions': ('amount', 'price'),
+    'clients_accounts': ('balance',),
+    'expenses': ('amount',),
+    'daily_reports': ('total_collection', 'remaining_profit', 'total_expenses'),
+    'seller_balances': ('total_goods', 'total_paid', 'total_allowance'),
+    'agriculture_transfers': ('unit_price',),
+    'meals': ('price_per_kg',),
+    'inventory_items': ('price',),
+    'client_invoices': ('nolon', 'mashal', 'rent', 'cash', 'net_amount', 'final_total'),
+}
+
+
+def pound_columns(money_unit, table):
+    """أعمدة جدول قيمها بالجنيه في ملف تصدير وحدته money_unit (تحول عند الاستيراد)"""
+    if money_unit == MONEY_UNIT:
+        return ()
+    if money_unit == LEDGER_MONEY_UNIT:
+        return PRICE_COLUMNS.get(table, ())
+    return MONEY_COLUMNS.get(table, ())
+
+
+def to_piasters(amount):
+    """مبلغ بالجنيه (رقم أو نص) إلى عدد صحيح من القروش، مع تقريب نصف القرش لأعلى"""
+    if amount is None or amount == '':
+        return 0
+    piasters = Decimal(str(amount)) * PIASTERS_PER_POUND
+    return int(piasters.quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_piasters(piasters):
+    """عدد القروش إلى جنيه"""
+    if piasters is None:
+        return None
+    return piasters / PIASTERS_PER_POUND
+
+
+def format_money(amount):
+    """عرض مبلغ بالجنيه بخانتين عشريتين (تقريب صحيح لنصف القرش)"""
+    return f"{from_piasters(to_piasters(amount)):.2f}"
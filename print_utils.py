@@ -8,6 +8,7 @@ from tkinter import ttk, messagebox, filedialog
 import os
 import json
 from datetime import datetime
+from money import format_money
 
 CONFIG_FILE = "config.json"
 
@@ -158,7 +159,7 @@ class PrintPreviewWindow:
             balance_frame.pack(fill=tk.X, padx=40, pady=8)
             tk.Label(
                 balance_frame,
-                text=f"الرصيد السابق: {self.data['old_balance']:.2f} جنيه",
+                text=f"الرصيد السابق: {format_money(self.data['old_balance'])} جنيه",
                 font=('Simplified Arabic', 14, 'bold'),
                 bg='#FFF9E6'
             ).pack(pady=8)
@@ -192,7 +193,7 @@ class PrintPreviewWindow:
             weight = f"{trans[1]:.2f}" if trans[1] else ""
             count = f"{trans[2]:.0f}" if trans[2] else ""
             price = f"{trans[3]:.2f}" if trans[3] else ""
-            amount = f"{trans[4]:.2f}" if trans[4] else "0.00"
+            amount = format_money(trans[4]) if trans[4] else "0.00"
             status = trans[5] if trans[5] else ""
             
             # لون الصف حسب الحالة
@@ -231,9 +232,9 @@ class PrintPreviewWindow:
             tk.Label(row, text=label, font=('Simplified Arabic', 14, 'bold'), 
                     bg=totals_frame['bg']).pack(side=tk.LEFT, padx=5)
         
-        add_total_row("إجمالي الفاتورة:", f"{self.data['total_goods']:.2f} جنيه", '#FFF3CD')
-        add_total_row("المدفوع:", f"{self.data['total_paid']:.2f} جنيه", '#F8D7DA')
-        add_total_row("المتبقي (صافي):", f"{self.data['final_balance']:.2f} جنيه", '#D4EDDA')
+        add_total_row("إجمالي الفاتورة:", f"{format_money(self.data['total_goods'])} جنيه", '#FFF3CD')
+        add_total_row("المدفوع:", f"{format_money(self.data['total_paid'])} جنيه", '#F8D7DA')
+        add_total_row("المتبقي (صافي):", f"{format_money(self.data['final_balance'])} جنيه", '#D4EDDA')
         
         # الفوتر (الأزرار)
         buttons_frame = tk.Frame(self.window, bg='#ECF0F1', pady=15)
@@ -378,7 +379,7 @@ class PrintPreviewWindow:
             if self.data['old_balance'] != 0:
                 y -= 0.6*cm
                 c.setFont(font_name, 8)
-                c.drawRightString(width - 0.3*cm, y, f"الرصيد السابق: {self.data['old_balance']:.2f}")
+                c.drawRightString(width - 0.3*cm, y, f"الرصيد السابق: {format_money(self.data['old_balance'])}")
             
             # جدول المعاملات
             y -= 1*cm
@@ -412,7 +413,7 @@ class PrintPreviewWindow:
                 price = f"{trans[3]:.2f}" if trans[3] else ""
                 weight = f"{trans[1]:.2f}" if trans[1] else ""
                 count = f"{trans[2]:.0f}" if trans[2] else ""
-                amount = f"{trans[4]:.2f}" if trans[4] else "0.00"
+                amount = format_money(trans[4]) if trans[4] else "0.00"
                 
                 c.drawRightString(width - 0.3*cm, y, amount)
                 c.drawRightString(width - 2.3*cm, y, count)
@@ -428,11 +429,11 @@ class PrintPreviewWindow:
             c.line(0.2*cm, y, width - 0.2*cm, y)
             y -= 0.5*cm
             c.setFont(font_name, 8)
-            c.drawRightString(width - 0.3*cm, y, f"إجمالي البضاعة: {self.data['total_goods']:.2f}")
+            c.drawRightString(width - 0.3*cm, y, f"إجمالي البضاعة: {format_money(self.data['total_goods'])}")
             y -= 0.4*cm
-            c.drawRightString(width - 0.3*cm, y, f"المدفوع: {self.data['total_paid']:.2f}")
+            c.drawRightString(width - 0.3*cm, y, f"المدفوع: {format_money(self.data['total_paid'])}")
             y -= 0.4*cm
-            c.drawRightString(width - 0.3*cm, y, f"المتبقي: {self.data['final_balance']:.2f}")
+            c.drawRightString(width - 0.3*cm, y, f"المتبقي: {format_money(self.data['final_balance'])}")
             
             c.save()
             messagebox.showinfo("نجاح", f"تم حفظ PDF بنجاح:\n{filepath}")
@@ -582,7 +583,7 @@ class PrintPreviewWindow:
                     price = f"{trans[3]:.2f}" if trans[3] else ""
                     weight = f"{trans[1]:.2f}" if trans[1] else ""
                     count = f"{trans[2]:.0f}" if trans[2] else ""
-                    amount = f"{trans[4]:.2f}" if trans[4] else ""
+                    amount = format_money(trans[4]) if trans[4] else ""
                     
                     row_vals = [item, price, weight, count, amount]
                     
@@ -609,9 +610,9 @@ class PrintPreviewWindow:
                     draw_text_right(f"{label}: {value}", horz_res - margin_x, y, font_header)
                     y += int(line_height * 1.5)
 
-                draw_total_row("إجمالي البضاعة", f"{self.data['total_goods']:.2f}")
-                draw_total_row("المدفوع", f"{self.data['total_paid']:.2f}")
-                draw_total_row("المتبقي", f"{self.data['final_balance']:.2f}")
+                draw_total_row("إجمالي البضاعة", f"{format_money(self.data['total_goods'])}")
+                draw_total_row("المدفوع", f"{format_money(self.data['total_paid'])}")
+                draw_total_row("المتبقي", f"{format_money(self.data['final_balance'])}")
 
                 hdc.EndPage()
                 hdc.EndDoc()
@@ -0,0 +1,242 @@
+"""
+قياس زمن استعلامات قاعدة البيانات (اختياري)
+
+عند التفعيل يسجل لكل دالة في Database ولكل جملة SQL: عدد المرات، عدد
+الصفوف، والزمن (الوسيط p50 و p95 والأقصى والإجمالي). الجمل التي تتجاوز
+حداً معيناً تكتب في سجل الاستعلامات البطيئة (ملف يتجدد عند امتلائه).
+شاشة التشخيص (diagnostics_page.py) تعرض العدادات أثناء عمل البرنامج.
+
+التفعيل من متغيرات البيئة قبل تشغيل البرنامج:
+    DB_STATS=1          تفعيل القياس
+    DB_SLOW_MS=200      حد الاستعلام البطيء بالمللي ثانية
+
+بدون التفعيل لا يتغير شيء: الاتصالات عادية والدوال غير مغلفة.
+"""
+
+import functools
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from time import perf_counter
+
+SLOW_QUERY_MS = 200
+SLOW_QUERY_LOG = os.path.join('logs', 'slow_queries.log')
+SLOW_QUERY_LOG_BYTES = 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+# عدد آخر القياسات المحفوظة لكل اسم لحساب p50 و p95
+SAMPLES = 512
+
+_SPACES = re.compile(r'\s+')
+
+
+class _Entry:
+    __slots__ = ('calls', 'rows', 'total', 'max', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLES)
+
+
+def _percentile(ordered, fraction):
+    """قيمة الترتيب fraction (0..1) في قائمة مرتبة (nearest rank)"""
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class QueryStats:
+    def __init__(self, slow_ms=SLOW_QUERY_MS, log_path=SLOW_QUERY_LOG):
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._entries = {}   # (kind, name) -> _Entry
+        self._slow_log = None
+
+    @classmethod
+    def from_environment(cls):
+        """QueryStats إذا كان DB_STATS مفعلاً، وإلا None"""
+        if os.environ.get('DB_STATS', '') in ('', '0'):
+            return None
+        return cls(slow_ms=float(os.environ.get('DB_SLOW_MS', SLOW_QUERY_MS)))
+
+    def record(self, kind, name, seconds, rows):
+        """
+        تسجيل تنفيذ واحد
+
+        kind: 'method' لدوال Database أو 'sql' للجمل
+        """
+        with self._lock:
+            entry = self._entries.get((kind, name))
+            if entry is None:
+                entry = self._entries[(kind, name)] = _Entry()
+            entry.calls += 1
+            entry.rows += rows
+            entry.total += seconds
+            entry.max = max(entry.max, seconds)
+            entry.samples.append(seconds)
+        if kind == 'sql' and seconds * 1000 >= self.slow_ms:
+            self._log_slow(name, seconds, rows)
+
+    def _log_slow(self, sql, seconds, rows):
+        if self._slow_log is None:
+            with self._lock:
+                if self._slow_log is None:
+                    os.makedirs(os.path.dirname(self.log_path) or '.', exist_ok=True)
+                    handler = RotatingFileHandler(self.log_path, maxBytes=SLOW_QUERY_LOG_BYTES,
+                                                  backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+                    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+                    logger = logging.getLogger(f'{__name__}.slow.{id(self)}')
+                    logger.propagate = False
+                    logger.setLevel(logging.INFO)
+                    logger.addHandler(handler)
+                    self._slow_log = logger
+        self._slow_log.info('%.1f ms | %d rows | %s', seconds * 1000, rows, sql)
+
+    def snapshot(self):
+        """
+        العدادات الحالية مرتبة بالزمن الإجمالي (الأكبر أولاً)
+
+        كل عنصر dict فيه: kind, name, calls, rows, p50_ms, p95_ms, max_ms, total_ms
+        """
+        with self._lock:
+            items = [(kind, name, entry.calls, entry.rows, entry.total, entry.max, sorted(entry.samples))
+                     for (kind, name), entry in self._entries.items()]
+        result = []
+        for kind, name, calls, rows, total, longest, ordered in items:
+            result.append({
+                'kind': kind,
+                'name': name,
+                'calls': calls,
+                'rows': rows,
+                'p50_ms': _percentile(ordered, 0.50) * 1000,
+                'p95_ms': _percentile(ordered, 0.95) * 1000,
+                'max_ms': longest * 1000,
+                'total_ms': total * 1000,
+            })
+        result.sort(key=lambda item: item['total_ms'], reverse=True)
+        return result
+
+    def reset(self):
+        """تصفير كل العدادات"""
+        with self._lock:
+            self._entries.clear()
+
+    def connection_factory(self):
+        """فئة اتصال sqlite3 تقيس كل جملة (تمرر كـ factory إلى sqlite3.connect)"""
+        stats = self
+
+        class StatsCursor(sqlite3.Cursor):
+            # جملة SELECT تنتظر جلب صفوفها: [النص، الزمن حتى الآن]
+            _pending = None
+
+            def _flush(self, seconds=0.0, rows=0):
+                pending, self._pending = self._pending, None
+                if pending is not None:
+                    stats.record('sql', pending[0], pending[1] + seconds, rows)
+
+            def _run(self, method, sql, *args):
+                self._flush()
+                start = perf_counter()
+                method(sql, *args)
+                elapsed = perf_counter() - start
+                sql = _SPACES.sub(' ', sql).strip()
+                if self.description is None:
+                    stats.record('sql', sql, elapsed, max(self.rowcount, 0))
+                else:
+                    self._pending = [sql, elapsed]
+                return self
+
+            def execute(self, sql, parameters=()):
+                return self._run(super().execute, sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self._run(super().executemany, sql, seq_of_parameters)
+
+            def executescript(self, sql_script):
+                return self._run(super().executescript, sql_script)
+
+            def fetchone(self):
+                start = perf_counter()
+                row = super().fetchone()
+                self._flush(perf_counter() - start, 0 if row is None else 1)
+                return row
+
+            def fetchmany(self, size=None):
+                start = perf_counter()
+                rows = super().fetchmany(self.arraysize if size is None else size)
+                self._flush(perf_counter() - start, len(rows))
+                return rows
+
+            def fetchall(self):
+                start = perf_counter()
+                rows = super().fetchall()
+                self._flush(perf_counter() - start, len(rows))
+                return rows
+
+            def close(self):
+                self._flush()
+                super().close()
+
+        class StatsConnection(sqlite3.Connection):
+            def cursor(self, factory=StatsCursor):
+                return super().cursor(factory)
+
+            # execute في sqlite3.Connection لا يمر على Cursor.execute
+            def execute(self, sql, parameters=()):
+                return self.cursor().execute(sql, parameters)
+
+            def executemany(self, sql, seq_of_parameters):
+                return self.cursor().executemany(sql, seq_of_parameters)
+
+            def executescript(self, sql_script):
+                return self.cursor().executescript(sql_script)
+
+            def commit(self):
+                start = perf_counter()
+                super().commit()
+                stats.record('sql', 'COMMIT', perf_counter() - start, 0)
+
+        return StatsConnection
+
+
+def _count_rows(result):
+    """عدد الصفوف في نتيجة دالة من Database"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    # (الصفوف، رمز الصفحة) من دوال *_page
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return 1
+
+
+def instrument_methods(obj, stats, skip=()):
+    """تغليف كل الدوال العامة في obj (على الكائن نفسه) لتسجل زمنها في stats"""
+    for name in dir(type(obj)):
+        if name.startswith('_') or name in skip:
+            continue
+        method = getattr(obj, name)
+        if not callable(method):
+            continue
+
+        def wrap(method, name):
+            @functools.wraps(method)
+            def timed(*args, **kwargs):
+                start = perf_counter()
+                result = method(*args, **kwargs)
+                stats.record('method', name, perf_counter() - start, _count_rows(result))
+                return result
+            return timed
+
+        setattr(obj, name, wrap(method, name))
@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
 from utils import ColorManager
 from datetime import datetime
 
 class ReadyInvoicesPage:
-    def __init__(self, parent_window, transfer_data=None, deductions=None, **kwargs):
-        self.db = Database()
+    def __init__(self, parent_window, transfer_data=None, deductions=None, db=None, **kwargs):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         
         self.transfer_data = transfer_data  # Data from selected transfer (or list of transfers)
@@ -316,25 +316,26 @@ class ReadyInvoicesPage:
             # Get values
             vals = self.current_values
             
-            # Save to DB
-            if self.invoice_id:
-                self.db.update_client_invoice(
-                    self.invoice_id, owner_name, vals['nolon'], vals['commission_str'], 
-                    vals['mashal'], vals['rent'], vals['cash'], invoice_date, 
-                    vals['total_goods'], vals['final_total']
-                )
-                invoice_id = self.invoice_id
-            else:
-                invoice_id = self.db.save_client_invoice(
-                    owner_name, vals['nolon'], vals['commission_str'], 
-                    vals['mashal'], vals['rent'], vals['cash'], invoice_date, 
-                    vals['total_goods'], vals['final_total']
-                )
-            
-            # Link transfers
-            if self.is_multi and self.transfer_data:
-                transfer_ids = [str(t[0]) for t in self.transfer_data]
-                self.db.link_transfers_to_invoice(invoice_id, transfer_ids)
+            # Save to DB (invoice and transfer links in one transaction)
+            with self.db.transaction():
+                if self.invoice_id:
+                    self.db.update_client_invoice(
+                        self.invoice_id, owner_name, vals['nolon'], vals['commission_str'], 
+                        vals['mashal'], vals['rent'], vals['cash'], invoice_date, 
+                        vals['total_goods'], vals['final_total']
+                    )
+                    invoice_id = self.invoice_id
+                else:
+                    invoice_id = self.db.save_client_invoice(
+                        owner_name, vals['nolon'], vals['commission_str'], 
+                        vals['mashal'], vals['rent'], vals['cash'], invoice_date, 
+                        vals['total_goods'], vals['final_total']
+                    )
+                
+                # Link transfers
+                if self.is_multi and self.transfer_data:
+                    transfer_ids = [str(t[0]) for t in self.transfer_data]
+                    self.db.link_transfers_to_invoice(invoice_id, transfer_ids)
             
             if print_after:
                 self.print_invoice(owner_name, invoice_date, vals)
@@ -0,0 +1,74 @@
+"""
+سجلات صفوف قاعدة البيانات
+
+كل صف يرجع من Database يبنى مباشرة في واحدة من هذه الفئات عن طريق
+row_factory الخاص بـ sqlite3، بدلاً من tuple عادية.
+
+الفئات مبنية على namedtuple مع __slots__ = () لذلك:
+- لا يوجد __dict__ لكل صف (نفس حجم tuple تقريباً في الذاكرة)
+- الوصول بالاسم (trans.status) والوصول بالرقم (trans[2]) كلاهما يعمل،
+  فالكود القديم الذي يستخدم الأرقام لا يحتاج تعديل
+- يمكن تمريرها مباشرة إلى Treeview كقيم
+
+الأعمدة التي لها قيمة افتراضية في آخر السجل لا تجلبها كل الاستعلامات.
+"""
+
+from collections import namedtuple
+
+
+class SellerTransaction(namedtuple('SellerTransaction', [
+        'id', 'amount', 'status', 'count', 'weight', 'price', 'item_name',
+        'date', 'day_name', 'equipment', 'note', 'seller_name'], defaults=(None,))):
+    """معاملة في حساب بائع (بضاعة، مدفوع، سماح)"""
+    __slots__ = ()
+
+
+class Transfer(namedtuple('Transfer', [
+        'id', 'shipment_name', 'seller_name', 'item_name', 'unit_price',
+        'weight', 'count', 'equipment', 'transfer_type'])):
+    """نقلة زراعة (transfer_type = 'in' وارد أو 'out' منصرف)"""
+    __slots__ = ()
+
+
+class SellerAccount(namedtuple('SellerAccount', [
+        'id', 'seller_name', 'remaining_amount', 'total_credit', 'phone',
+        'last_payment_date', 'last_transaction_date'], defaults=(None, None, None))):
+    """حساب بائع، مع الرصيد المحسوب وآخر التواريخ عند جلبها"""
+    __slots__ = ()
+
+
+class Expense(namedtuple('Expense', [
+        'id', 'description', 'amount', 'expense_date', 'note'])):
+    """مصروف يومي"""
+    __slots__ = ()
+
+
+class ClientInvoice(namedtuple('ClientInvoice', [
+        'id', 'owner_name', 'nolon', 'commission', 'mashal', 'rent', 'cash',
+        'invoice_date', 'net_amount', 'final_total'], defaults=(None, None))):
+    """فاتورة عميل"""
+    __slots__ = ()
+
+
+class SearchMatch(namedtuple('SearchMatch', ['kind', 'ref_id', 'rank'])):
+    """نتيجة بحث: نوع الصف (seller, client...) ومعرفه في جدوله، والأقل rank هو الأقرب"""
+    __slots__ = ()
+
+
+class MaintenanceRun(namedtuple('MaintenanceRun', [
+        'id', 'run_at', 'reason', 'task', 'duration_ms', 'result',
+        'pages_before', 'pages_after', 'free_pages_before', 'free_pages_after'])):
+    """تشغيل مهمة صيانة واحدة (maintenance.py) وحجم الملف بالصفحات قبلها وبعدها"""
+    __slots__ = ()
+
+
+class ChangeEntry(namedtuple('ChangeEntry', ['seq', 'table_name', 'row_id', 'op'])):
+    """تغيير في صف (changelog): op = 'I' إضافة، 'U' تعديل، 'D' حذف"""
+    __slots__ = ()
+
+
+def record_factory(record_class):
+    """row_factory يبني كل صف في record_class مباشرة"""
+    def factory(cursor, row):
+        return record_class(*row)
+    return factory
@@ -0,0 +1,65 @@
+"""
+ذاكرة مؤقتة للجداول المرجعية
+
+جداول الوجبات والعدة وحسابات البائعين والعملاء صغيرة وتقرأ كثيراً جداً
+(كل صفحة وكل حفظ صف يحتاج قائمة الأسماء). هنا تحفظ نسخة منها في الذاكرة
+مع فهرس بالاسم للبحث الفوري بدلاً من الرجوع لقاعدة البيانات كل مرة.
+
+Database يفرغ الجدول من الذاكرة بعد أي كتابة عليه (انظر Database._write).
+"""
+
+import threading
+
+
+class ReferenceCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}       # table -> (rows, index)
+        self._generations = {}   # table -> عدد مرات التفريغ
+        self._stats = {}         # table -> {'hits': n, 'misses': n}
+
+    def _count(self, table, kind):
+        counters = self._stats.setdefault(table, {'hits': 0, 'misses': 0})
+        counters[kind] += 1
+
+    def get(self, table, loader, key_func, bypass=False):
+        """
+        (الصفوف، فهرس بالاسم) لجدول معين
+
+        loader يجلب الصفوف من قاعدة البيانات عند عدم وجودها في الذاكرة،
+        و key_func يحدد مفتاح الفهرس لكل صف.
+        bypass=True يقرأ من قاعدة البيانات مباشرة بدون حفظ (مثلاً داخل معاملة
+        كتبت على الجدول ولم تحفظ بعد).
+        """
+        with self._lock:
+            entry = None if bypass else self._entries.get(table)
+            if entry is not None:
+                self._count(table, 'hits')
+                return entry
+            self._count(table, 'misses')
+            generation = self._generations.get(table, 0)
+
+        rows = loader()
+        index = {}
+        for row in rows:
+            # أول صف بنفس المفتاح هو المعتمد (نفس نتيجة LIMIT 1)
+            index.setdefault(key_func(row), row)
+        entry = (rows, index)
+
+        with self._lock:
+            # لا نحفظ إذا تم تفريغ الجدول أثناء القراءة (البيانات قد تكون قديمة)
+            if not bypass and self._generations.get(table, 0) == generation:
+                self._entries[table] = entry
+        return entry
+
+    def invalidate(self, *tables):
+        """تفريغ جداول معينة من الذاكرة (أو كل الجداول بدون معاملات)"""
+        with self._lock:
+            for table in tables or set(self._entries) | set(self._stats):
+                self._entries.pop(table, None)
+                self._generations[table] = self._generations.get(table, 0) + 1
+
+    def stats(self):
+        """عدادات الإصابة والإخفاق لكل جدول"""
+        with self._lock:
+            return {table: dict(counters) for table, counters in self._stats.items()}
@@ -1,12 +1,26 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database, day_number, day_to_date
+from money import to_piasters, from_piasters
 from datetime import datetime, timedelta
 import calendar
 
+def merge_daily_rows(saved, live):
+    """
+    صف واحد (التاريخ، التحصيل، المتبقي، المنصرفات) لكل يوم مرتب بالتاريخ
+
+    الأرقام المحسوبة الآن هي المعتمدة، والتقارير المحفوظة تكمل الأيام التي
+    لم تعد لها معاملات. المفتاح رقم اليوم لأن التقرير المحفوظ قد يكون بتاريخ
+    2025/03/01 والصف المحسوب لنفس اليوم بتاريخ 2025-03-01.
+    """
+    by_day = {day_number(row[0]): row for row in saved}
+    by_day.update((day_number(row[0]), row) for row in live)
+    return [(day_to_date(day),) + tuple(by_day[day][1:]) for day in sorted(by_day)]
+
+
 class DailyReportsPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         
         self.colors = {
             'bg': '#FFB347',
@@ -103,7 +117,7 @@ class DailyReportsPage:
         
         self.month_var = tk.StringVar(value=str(current_date.month))
         month_combo = ttk.Combobox(month_frame, textvariable=self.month_var,
-                                   values=[str(i) for i in range(1, 13)],
+                                   values=['الكل'] + [str(i) for i in range(1, 13)],
                                    width=5, justify='center', state='readonly')
         month_combo.pack(side=tk.RIGHT, padx=5)
         
@@ -171,8 +185,20 @@ class DailyReportsPage:
         self.date_var.set(today)
         self.load_selected_date_report()
     
+    def get_selected_date(self):
+        """التاريخ المكتوب بعد التحقق من صحته (أو None مع رسالة خطأ)"""
+        target_date = self.date_var.get().strip()
+        try:
+            datetime.strptime(target_date, "%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("خطأ", "تنسيق التاريخ غير صحيح (YYYY-MM-DD)")
+            return None
+        return target_date
+    
     def load_selected_date_report(self):
-        target_date = self.date_var.get()
+        target_date = self.get_selected_date()
+        if not target_date:
+            return
         
         # Try to load saved report
         report = self.db.get_daily_report(target_date)
@@ -193,7 +219,9 @@ class DailyReportsPage:
         self.remaining_label.config(text=f"{remaining:,.2f} ج.م")
     
     def auto_calculate(self):
-        target_date = self.date_var.get()
+        target_date = self.get_selected_date()
+        if not target_date:
+            return
         totals = self.db.calculate_daily_totals(target_date)
         
         collection = totals['total_collection']
@@ -207,7 +235,9 @@ class DailyReportsPage:
         messagebox.showinfo("نجاح", "تم حساب البيانات تلقائياً من المعاملات")
     
     def save_current_report(self):
-        target_date = self.date_var.get()
+        target_date = self.get_selected_date()
+        if not target_date:
+            return
         
         # Get current values
         totals = self.db.calculate_daily_totals(target_date)
@@ -224,7 +254,8 @@ class DailyReportsPage:
     def load_monthly_report(self):
         try:
             year = int(self.year_var.get())
-            month = int(self.month_var.get())
+            # "الكل" = السنة كلها
+            month = None if self.month_var.get() == 'الكل' else int(self.month_var.get())
         except ValueError:
             messagebox.showerror("خطأ", "الرجاء إدخال سنة وشهر صحيحين")
             return
@@ -233,9 +264,17 @@ class DailyReportsPage:
         for item in self.tree.get_children():
             self.tree.delete(item)
         
-        # Get monthly reports
-        reports = self.db.get_monthly_reports(year, month)
+        # Period range
+        if month is None:
+            start_date, end_date = f"{year}-01-01", f"{year}-12-31"
+        else:
+            last_day = calendar.monthrange(year, month)[1]
+            start_date, end_date = f"{year}-{month:02d}-01", f"{year}-{month:02d}-{last_day:02d}"
+        
+        reports = merge_daily_rows(self.db.get_daily_reports_range(start_date, end_date),
+                                   self.db.calculate_range_totals(start_date, end_date))
         
+        # Running totals in piasters so pound fractions add up exactly
         total_collection = 0
         total_remaining = 0
         total_expenses = 0
@@ -253,14 +292,14 @@ class DailyReportsPage:
                 f"{remaining:,.2f}"
             ))
             
-            total_collection += collection
-            total_remaining += remaining
-            total_expenses += expenses
+            total_collection += to_piasters(collection)
+            total_remaining += to_piasters(remaining)
+            total_expenses += to_piasters(expenses)
         
         # Update totals
         self.monthly_totals_label.config(
-            text=f"التحصيل: {total_collection:,.2f} | المصاريف: {total_expenses:,.2f} | الباقي: {total_remaining:,.2f}"
+            text=f"التحصيل: {from_piasters(total_collection):,.2f} | المصاريف: {from_piasters(total_expenses):,.2f} | الباقي: {from_piasters(total_remaining):,.2f}"
         )
         
         if not reports:
-            messagebox.showinfo("تنبيه", "لا توجد تقارير لهذا الشهر")
+            messagebox.showinfo("تنبيه", "لا توجد تقارير لهذه الفترة")
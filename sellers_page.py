@@ -1,12 +1,12 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from database import Database
+from database import get_database
 from utils import ColorManager
 from datetime import datetime
 
 class SellersPage:
-    def __init__(self, parent_window):
-        self.db = Database()
+    def __init__(self, parent_window, db=None):
+        self.db = db or get_database()
         self.color_manager = ColorManager()
         self.theme = self.color_manager.get_random_theme()
         
@@ -37,9 +37,13 @@ class SellersPage:
         
         self.selected_row_id = None
         self.table_rows = []
+        self.loaded_fingerprint = None  # transfers version shown in the table
         
         self.setup_ui()
         
+        # Rebuild on return to the window only if transfers changed meanwhile
+        self.window.bind('<FocusIn>', self.refresh_if_changed)
+        
     def setup_ui(self):
         # Header with Close Button
         header_frame = tk.Frame(self.window, bg=self.colors['header_bg'], height=80)
@@ -110,8 +114,25 @@ class SellersPage:
         # Load data rows
         self.load_data(scrollable_frame, header_colors)
         
+    def refresh_if_changed(self, event=None):
+        fingerprint = self.db.fingerprint(('agriculture_transfers',))
+        if fingerprint == self.loaded_fingerprint:
+            return
+        # Rebuild once, after the focus event finishes (its widget is destroyed too)
+        self.loaded_fingerprint = fingerprint
+        self.window.after_idle(self.rebuild)
+
+    def rebuild(self):
+        if not self.window.winfo_exists():
+            return
+        for widget in self.window.winfo_children():
+            widget.destroy()
+        self.table_rows = []
+        self.setup_ui()
+
     def load_data(self, parent, colors):
         # Get data from agriculture transfers
+        self.loaded_fingerprint = self.db.fingerprint(('agriculture_transfers',))
         transfers = self.db.get_agriculture_transfers()
         
         entry_style = {
@@ -0,0 +1,118 @@
+"""
+اختبار أرشفة المواسم المغلقة (archive.py و Database.archive_before)
+
+يتأكد أن الأرصدة وكشوف الحساب والمجاميع اليومية لا تتغير بعد نقل
+المعاملات القديمة إلى ملفات الأرشيف، وأن البائع غير المسدد لا يؤرشف.
+
+التشغيل: python -m pytest -q test_archive.py
+"""
+
+import os
+
+import pytest
+
+from archive import archive_path
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'archive.db'))
+    database.add_seller_account('مسدد', 50, 0)
+    database.add_seller_account('مدين', 0, 0)
+    settled = database.get_seller_by_name('مسدد').id
+    open_ = database.get_seller_by_name('مدين').id
+    with database.transaction() as tx:
+        for year in (2023, 2024):
+            for month in range(1, 13):
+                date = f'{year}-{month:02d}-10'
+                tx.add_seller_transaction(settled, 100.25, 'متبقي', 1, 1, 1, 'صنف', date, '', '', '')
+                tx.add_seller_transaction(settled, 95.25, 'مدفوع', 0, 0, 0, 'نقدي', date, '', '', '')
+                tx.add_seller_transaction(settled, 5, 'مدفوع', 0, 0, 0, 'سماح', date, '', '', '')
+                tx.add_seller_transaction(open_, 40, 'متبقي', 1, 1, 1, 'صنف', date, '', '', '')
+                tx.add_seller_transaction(open_, 10, 'مدفوع', 0, 0, 0, 'نقدي', date, '', '', '')
+        # المسدد يدفع الرصيد الافتتاحي في آخر 2023
+        tx.add_seller_transaction(settled, 50, 'مدفوع', 0, 0, 0, 'نقدي', '2023-12-31', '', '', '')
+        tx.add_seller_transaction(settled, 70, 'متبقي', 1, 1, 1, 'صنف', '2025-02-01', '', '', '')
+        for i in range(3):
+            tx.add_agriculture_transfer('عميل', 'مسدد', 'صنف', 2, 10, 1, '', 'in')
+    transfer_ids = [t.id for t in database.get_uninvoiced_transfers('عميل')]
+    database.link_transfers_to_invoice(7, transfer_ids)
+    database.get_connection().execute(
+        "UPDATE agriculture_transfers SET created_at = '2024-03-01 10:00:00'")
+    database.get_connection().commit()
+    yield database, settled, open_
+    database.close()
+
+
+def snapshot(database, seller_ids):
+    result = {'balances': database.get_sellers_with_balances(),
+              'range': database.calculate_range_totals('2023-01-01', '2025-12-31'),
+              'may': database.calculate_range_totals('2024-05-01', '2024-05-31'),
+              'transfers': database.get_transfers_by_invoice_id(7),
+              'sales': database.get_sales_summary()}
+    for seller_id in seller_ids:
+        for start, end in (('2023-01-01', '2025-12-31'), ('2024-06-01', '2025-03-01'), ('2025-01-01', '2025-12-31')):
+            result[seller_id, start] = (database.get_seller_transactions_between(seller_id, start, end),
+                                        database.get_seller_balance_before(seller_id, start))
+    return result
+
+
+def test_archive_keeps_balances_and_reports(db):
+    database, settled, open_ = db
+    before = snapshot(database, (settled, open_))
+
+    stats = database.archive_before('2025-01-01')
+
+    assert stats == {'sellers': 1, 'transactions': 73, 'transfers': 3, 'years': [2023, 2024]}
+    for year in (2023, 2024):
+        assert os.path.exists(archive_path(database.db_name, year))
+    assert snapshot(database, (settled, open_)) == before
+
+    # المتبقي في القاعدة: معاملات الترحيل + معاملة 2025، والبائع المدين كما هو
+    conn = database.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ?', (settled,)).fetchone()[0] == 4
+    assert conn.execute('SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ?', (open_,)).fetchone()[0] == 48
+    assert conn.execute('SELECT COUNT(*) FROM agriculture_transfers').fetchone()[0] == 0
+
+
+def test_archive_again_folds_old_carries(db):
+    database, settled, open_ = db
+    before = snapshot(database, (settled, open_))
+    assert database.archive_before('2024-01-01')['transactions'] == 37
+    assert snapshot(database, (settled, open_)) == before
+    database.archive_before('2025-01-01')
+
+    assert snapshot(database, (settled, open_)) == before
+    conn = database.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM seller_transactions WHERE carry_forward = 1').fetchone()[0] == 3
+
+
+def test_seller_settled_by_allowance_is_archived(db):
+    database, settled, open_ = db
+    database.add_seller_account('مسامح', 0, 0)
+    forgiven = database.get_seller_by_name('مسامح').id
+    database.add_seller_transaction(forgiven, 100, 'متبقي', 1, 1, 1, 'صنف', '2024-04-01', '', '', '')
+    database.add_seller_transaction(forgiven, 80, 'مدفوع', 0, 0, 0, 'نقدي', '2024-04-05', '', '', '')
+    # باقي الرصيد يسقط بمعاملة حالتها سماح (كما تضيفها صفحة الحسابات)
+    database.add_seller_transaction(forgiven, 20, 'سماح', 0, 0, 0, 'سماح', '2024-04-06', '', '', '')
+    before = snapshot(database, (forgiven,))
+    assert database.get_seller_balance_before(forgiven, '2025-01-01') == 0
+
+    assert database.archive_before('2025-01-01')['sellers'] == 2
+    assert snapshot(database, (forgiven,)) == before
+    conn = database.get_connection()
+    assert conn.execute('SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ? AND carry_forward = 0',
+                        (forgiven,)).fetchone()[0] == 0
+
+
+def test_archive_merge_sorts_by_stored_day(db):
+    database, settled, open_ = db
+    database.archive_before('2025-01-01')
+    # SQLite يقبل تاريخاً بوقت ويحسب رقم يومه، لكن نصه لا يحلل كـ YYYY-MM-DD
+    database.add_seller_transaction(settled, 5, 'متبقي', 1, 1, 1, 'صنف', '2025-02-02 09:15', '', '', '')
+
+    rows = database.get_seller_transactions_between(settled, '2024-06-01', '2025-03-01')
+    assert rows[0].date == '2025-02-02 09:15'
+    assert rows[1].date == '2025-02-01'
+    assert rows[-1].date == '2024-06-10'
@@ -0,0 +1,111 @@
+"""
+اختبار سجل التغييرات (changelog و Database.changes_since)
+
+التشغيل: python -m pytest -q test_changelog.py
+"""
+
+import pytest
+
+from database import Database
+from migrations import CHANGELOG_TABLES
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'changelog.db'))
+    yield database
+    database.close()
+
+
+def test_every_write_is_logged_in_order(db):
+    start = db.get_changelog_seq()
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    db.add_seller_transaction(seller_id, 10, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+    trans_id = db.get_seller_statement(seller_id)[0].id
+    db.update_seller_transaction(trans_id, 20, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+    db.delete_seller_transaction(trans_id)
+
+    changes = db.changes_since(start)
+    assert [(c.table_name, c.row_id, c.op) for c in changes] == [
+        ('sellers_accounts', seller_id, 'I'),
+        ('seller_transactions', trans_id, 'I'),
+        ('seller_transactions', trans_id, 'U'),
+        ('seller_transactions', trans_id, 'D'),
+    ]
+    assert [c.seq for c in changes] == sorted(c.seq for c in changes)
+    assert db.get_changelog_seq() == changes[-1].seq
+    assert db.changes_since(changes[1].seq, limit=1) == [changes[2]]
+
+
+def test_rolled_back_writes_leave_no_entries(db):
+    start = db.get_changelog_seq()
+    with pytest.raises(ValueError):
+        with db.transaction():
+            db.add_expense('مصروف', 5, '2025-01-01')
+            raise ValueError('stop')
+    assert db.changes_since(start) == []
+
+
+def test_all_tables_have_triggers(db):
+    names = {row[0] for row in db.get_connection().execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_changelog_%'")}
+    for table in CHANGELOG_TABLES:
+        for op in ('insert', 'update', 'delete'):
+            assert f'trg_changelog_{table}_{op}' in names
+
+
+def test_pruned_changes_raise(db):
+    for i in range(10):
+        db.add_expense(f'مصروف {i}', i, '2025-01-01')
+    last = db.get_changelog_seq()
+    assert db.prune_changelog(keep=3) == 7
+    assert len(db.changes_since(last - 3)) == 3
+    with pytest.raises(ValueError):
+        db.changes_since(last - 5)
+    # الرقم يستمر بعد الحذف
+    db.add_expense('جديد', 1, '2025-01-02')
+    assert db.get_changelog_seq() == last + 1
+
+
+def test_fingerprint_changes_only_with_its_data(db):
+    db.add_seller_account('أ', 0, 0)
+    db.add_seller_account('ب', 0, 0)
+    first, second = db.get_seller_by_name('أ').id, db.get_seller_by_name('ب').id
+    tables = ('sellers_accounts', 'seller_transactions')
+
+    before = db.fingerprint(tables, seller_id=first)
+    expenses = db.fingerprint(('expenses',))
+    assert db.fingerprint(tables, seller_id=first) == before
+
+    db.add_seller_transaction(second, 10, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+    # الجدول تغير، لكن حساب البائع الأول لم يتغير
+    after = db.fingerprint(tables, seller_id=first)
+    assert after[:2] != before[:2]
+    assert after[2] == before[2]
+    assert db.fingerprint(('expenses',)) == expenses
+
+    # نقل المعاملة للبائع الأول يغير بصمة البائعين معاً
+    trans_id = db.get_seller_statement(second)[0].id
+    old_second = db.fingerprint(seller_id=second)
+    with db.transaction():
+        db.get_connection().execute('UPDATE seller_transactions SET seller_id = ? WHERE id = ?', (first, trans_id))
+    assert db.fingerprint(seller_id=first) != after[2:]
+    assert db.fingerprint(seller_id=second) != old_second
+
+
+def test_fingerprint_sees_other_connections(db):
+    before = db.fingerprint(('expenses',))
+    other = Database(db.db_name)
+    other.get_connection().execute(
+        "INSERT INTO expenses (description, amount, expense_date) VALUES ('مصروف', 100, '2025-01-01')")
+    other.get_connection().commit()
+    try:
+        assert db.fingerprint(('expenses',)) != before
+    finally:
+        other.close()
+
+
+def test_fingerprint_rejects_untracked_tables(db):
+    with pytest.raises(ValueError):
+        db.fingerprint(('seller_balances',))
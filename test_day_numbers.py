@@ -0,0 +1,79 @@
+"""
+اختبار أعمدة رقم اليوم المحسوبة (DAY_NUMBER_SQL في migrations.py)
+
+الصفحات ما زالت تكتب التواريخ بالصيغة YYYY/MM/DD في بعض الأماكن، فيجب
+أن تعطي نفس رقم اليوم مثل YYYY-MM-DD وأن تدخل في استعلامات الفترات.
+
+التشغيل: python -m pytest -q test_day_numbers.py
+"""
+
+from datetime import date, datetime
+
+import pytest
+
+from database import Database, day_number, day_to_date
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'days.db'))
+    database.add_seller_account('بائع', 0, 0)
+    seller_id = database.get_seller_by_name('بائع').id
+    yield database, seller_id
+    database.close()
+
+
+def test_day_number_helpers():
+    expected = date(2025, 3, 1).toordinal()
+    assert day_number('2025-03-01') == day_number('2025/03/01') == day_number(' 2025/03/01 ') == expected
+    assert day_number(date(2025, 3, 1)) == expected
+    assert day_to_date(expected) == '2025-03-01'
+    with pytest.raises(ValueError):
+        day_number('01/03/2025')
+
+
+@pytest.mark.parametrize('table, date_column, day_column, insert', [
+    ('seller_transactions', 'date', 'day',
+     "INSERT INTO seller_transactions (seller_id, amount, status, date) VALUES (1, 1, 'مدفوع', ?)"),
+    ('expenses', 'expense_date', 'expense_day',
+     "INSERT INTO expenses (description, amount, expense_date) VALUES ('م', 1, ?)"),
+    ('daily_reports', 'report_date', 'report_day',
+     "INSERT INTO daily_reports (report_date, total_collection, remaining_profit, total_expenses) VALUES (?, 0, 0, 0)"),
+    ('client_invoices', 'invoice_date', 'invoice_day',
+     "INSERT INTO client_invoices (owner_name, invoice_date) VALUES ('ع', ?)"),
+])
+def test_generated_columns_accept_both_forms(db, table, date_column, day_column, insert):
+    database, seller_id = db
+    conn = database.get_connection()
+    for value in ('2025-03-01', '2025/03/01', ' 2025/03/01 ', '2024-02-29', 'بدون تاريخ'):
+        conn.execute(insert, (value,))
+    conn.commit()
+    days = dict(conn.execute(f'SELECT {date_column}, {day_column} FROM {table}'))
+    expected = date(2025, 3, 1).toordinal()
+    assert days['2025-03-01'] == days['2025/03/01'] == days[' 2025/03/01 '] == expected
+    assert days['2024-02-29'] == day_number('2024-02-29')
+    # نص ليس تاريخاً لا يدخل في أي فترة
+    assert days['بدون تاريخ'] is None
+
+
+def test_range_queries_include_both_forms(db):
+    database, seller_id = db
+    today_slash = datetime(2025, 3, 1).strftime("%Y/%m/%d")
+    with database.transaction() as tx:
+        tx.add_seller_transaction(seller_id, 10, 'متبقي', 1, 1, 1, 'صنف', '2025-02-28', '', '', '')
+        tx.add_seller_transaction(seller_id, 20, 'متبقي', 1, 1, 1, 'صنف', today_slash, '', '', '')
+        tx.add_seller_transaction(seller_id, 30, 'متبقي', 1, 1, 1, 'صنف', '2025-03-01', '', '', '')
+        tx.add_seller_transaction(seller_id, 40, 'متبقي', 1, 1, 1, 'صنف', '2025/03/02', '', '', '')
+        tx.add_expense('شرطة', 1, '2025-03-01')
+        tx.add_expense('مائلة', 2, today_slash)
+        tx.add_expense('بعد', 3, '2025/03/02')
+        tx.save_client_invoice('ع', 0, 0, 0, 0, 0, today_slash)
+        tx.save_client_invoice('ع', 0, 0, 0, 0, 0, '2025-03-01')
+
+    between = database.get_seller_transactions_between(seller_id, '2025-03-01', '2025/03/01')
+    assert sorted(t.amount for t in between) == [20, 30]
+    assert database.get_seller_balance_before(seller_id, '2025/03/01') == 10
+    assert database.get_seller_balance_before(seller_id, '2025-03-02') == 60
+
+    assert sorted(e.description for e in database.get_expenses_between('2025/03/01', '2025-03-01')) == ['شرطة', 'مائلة']
+    assert len(database.get_client_invoices_between('2025-03-01', '2025-03-01')) == 2
@@ -0,0 +1,59 @@
+"""
+اختبار خيوط قاعدة البيانات في الخلفية
+
+التشغيل: python -m pytest -q test_db_worker.py
+"""
+
+import sqlite3
+
+import pytest
+
+from database import Database
+from db_worker import DatabaseWorker
+
+
+@pytest.fixture
+def worker(tmp_path):
+    database = Database(str(tmp_path / 'worker.db'))
+    database.add_seller_account('بائع', 0, 0)
+    worker = DatabaseWorker(database)
+    yield worker
+    worker.close()
+    database.close()
+
+
+def test_writes_run_in_order_and_reads_see_them(worker):
+    db = worker.db
+    seller_id = db.get_seller_by_name('بائع').id
+    futures = [worker.write(db.add_seller_transaction, seller_id, i, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', str(i))
+               for i in range(20)]
+    for future in futures:
+        assert future.result(timeout=5) is None
+
+    rows = worker.read(db.get_seller_statement, seller_id).result(timeout=5)
+    assert sorted(int(row.note) for row in rows) == list(range(20))
+    assert worker.read(db.get_sellers_with_balances).result(timeout=5)[0].remaining_amount == sum(range(20))
+
+
+def test_write_errors_reach_the_future(worker):
+    def fail():
+        with worker.db.transaction():
+            worker.db.add_expense('مصروف', 5, '2025-01-01')
+            raise ValueError('stop')
+
+    with pytest.raises(ValueError):
+        worker.write(fail).result(timeout=5)
+    # المعاملة تراجعت كلها
+    assert worker.read(worker.db.count_expenses).result(timeout=5) == 0
+
+
+def test_reader_connections_are_read_only(worker):
+    future = worker.read(worker.db.add_expense, 'مصروف', 5, '2025-01-01')
+    with pytest.raises(sqlite3.OperationalError):
+        future.result(timeout=5)
+
+
+def test_closed_worker_rejects_jobs(worker):
+    worker.close()
+    with pytest.raises(RuntimeError):
+        worker.write(worker.db.count_expenses)
@@ -0,0 +1,234 @@
+"""
+اختبار ملفات النسخ الاحتياطية: التغييرات فقط (DataSync.export_delta)
+والقراءة والكتابة دفعة بدفعة (NDJSON)
+
+التشغيل: python -m pytest -q test_delta_export.py
+"""
+
+import json
+import os
+import sqlite3
+import tracemalloc
+
+import pytest
+
+import data_sync as data_sync_module
+from data_sync import DataSync, EXPORT_TABLES, read_backup
+from database import Database
+
+
+@pytest.fixture
+def sync(tmp_path, monkeypatch):
+    # مجلد التصدير data_exports ينشأ في المجلد الحالي
+    monkeypatch.chdir(tmp_path)
+    db = Database(str(tmp_path / 'sync.db'))
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    with db.transaction() as tx:
+        for i in range(50):
+            tx.add_seller_transaction(seller_id, i, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+            tx.add_expense(f'مصروف {i}', i, '2025-01-01')
+    yield DataSync(db.db_name), db, seller_id
+    db.close()
+
+
+def load_backup(path):
+    """الملف بشكل ملفات .json القديمة: بيانات الرأس و tables"""
+    content = {'tables': {}}
+    for kind, table, value in read_backup(path):
+        if kind == 'header':
+            content.update(value)
+        elif kind == 'table':
+            content['tables'][table] = {'columns': value, 'data': []}
+        elif kind == 'rows':
+            content['tables'][table]['data'].extend(value)
+        else:
+            content['tables'][table].update(row_count=value['row_count'], deleted=value.get('deleted'))
+    return content
+
+
+def empty_database(path):
+    database = Database(path)
+    database.get_connection()
+    database.close()
+
+
+def table_rows(path):
+    conn = Database(path).get_connection()
+    result = {}
+    for table in EXPORT_TABLES:
+        result[table] = conn.execute(f'SELECT * FROM {table} ORDER BY id').fetchall()
+    return result
+
+
+def test_delta_holds_only_changes_and_replays(sync, tmp_path):
+    data_sync, db, seller_id = sync
+    base = data_sync.create_daily_backup()
+    assert load_backup(base)['export_type'] == 'full'
+    with sqlite3.connect(str(tmp_path / 'replica.db')) as replica:
+        db.get_connection().backup(replica)
+
+    rows = db.get_seller_statement(seller_id)
+    db.update_seller_transaction(rows[0].id, 999, 'متبقي', 0, 0, 0, 'صنف', '2025-01-02', '', '', 'تعديل')
+    db.delete_seller_transaction(rows[1].id)
+    db.add_expense('جديد', 7, '2025-01-02')
+
+    delta = data_sync.create_daily_backup()
+    content = load_backup(delta)
+    assert content['export_type'] == 'delta'
+    assert content['base'] == os.path.basename(base)
+    assert content['previous'] == os.path.basename(base)
+    transactions = content['tables']['seller_transactions']
+    assert [row['id'] for row in transactions['data']] == [rows[0].id]
+    assert transactions['deleted'] == [rows[1].id]
+    assert content['tables']['expenses']['row_count'] == 1
+    assert set(content['tables']) == {'seller_transactions', 'expenses'}
+
+    # ملف بدون تغييرات صغير، والسلسلة تستمر منه
+    empty = data_sync.create_daily_backup()
+    empty_content = load_backup(empty)
+    assert empty_content['tables'] == {}
+    assert empty_content['previous'] == os.path.basename(delta)
+    assert empty != delta
+
+    # النسخة المطابقة لم تستورد الملف الكامل: تنبيه بدلاً من رفض
+    stats = DataSync(str(tmp_path / 'replica.db')).import_data(delta)
+    assert len(stats['warnings']) == 1
+    assert table_rows(str(tmp_path / 'replica.db')) == table_rows(db.db_name)
+
+
+def test_delta_must_follow_imported_chain(sync, tmp_path):
+    data_sync, db, seller_id = sync
+    base = data_sync.create_daily_backup()
+    db.add_expense('أول', 1, '2025-01-02')
+    first = data_sync.create_daily_backup()
+    db.add_expense('ثاني', 2, '2025-01-03')
+    second = data_sync.create_daily_backup()
+
+    replica = str(tmp_path / 'replica.db')
+    empty_database(replica)
+    target = DataSync(replica)
+    target.import_data(base)
+    # ملف ناقص قبله في السلسلة
+    with pytest.raises(ValueError):
+        target.import_data(second)
+    assert not target.import_data(first)['warnings']
+    # نفس الملف مرتين
+    with pytest.raises(ValueError):
+        target.import_data(first)
+    target.import_data(second)
+    assert table_rows(replica) == table_rows(db.db_name)
+
+    # سلسلة جديدة من نسخة كاملة لم تستورد في القاعدة الهدف
+    data_sync.export_all_data()
+    db.add_expense('ثالث', 3, '2025-01-04')
+    other = data_sync.create_daily_backup()
+    assert load_backup(other)['export_type'] == 'delta'
+    with pytest.raises(ValueError):
+        target.import_data(other)
+    assert [row[1] for row in table_rows(replica)['expenses']][-1] == 'ثاني'
+
+
+def test_full_export_when_chain_is_broken(sync):
+    data_sync, db, seller_id = sync
+    base = data_sync.create_daily_backup()
+    os.remove(base)
+    db.add_expense('جديد', 7, '2025-01-02')
+    assert load_backup(data_sync.create_daily_backup())['export_type'] == 'full'
+
+
+def test_cleanup_keeps_current_chain(sync):
+    data_sync, db, seller_id = sync
+    base = data_sync.create_daily_backup()
+    delta = data_sync.create_daily_backup()
+    old = 0  # كل الملفات أقدم من keep_days
+    for path in (base, delta):
+        os.utime(path, (old, old))
+    data_sync.cleanup_old_backups(keep_days=1)
+    assert os.path.exists(base) and os.path.exists(delta)
+    assert all(backup['filename'] != 'export_state.json' for backup in data_sync.list_backups())
+
+
+def test_ndjson_round_trip_in_batches(sync, tmp_path, monkeypatch):
+    data_sync, db, seller_id = sync
+    monkeypatch.setattr(data_sync_module, 'BATCH_ROWS', 7)
+    path = data_sync.export_all_data()
+    assert path.endswith('.ndjson.gz')
+    batches = [len(value) for kind, table, value in read_backup(path) if kind == 'rows' and table == 'expenses']
+    assert batches == [7] * 7 + [1]
+
+    empty_database(str(tmp_path / 'copy.db'))
+    DataSync(str(tmp_path / 'copy.db')).import_data(path)
+    assert table_rows(str(tmp_path / 'copy.db')) == table_rows(db.db_name)
+
+
+def test_import_old_json_backup(sync, tmp_path):
+    data_sync, db, seller_id = sync
+    old = {
+        'export_date': '2025-12-02T10:17:03',
+        'database_name': 'company_accounts.db',
+        'tables': {'expenses': {
+            'columns': ['id', 'description', 'amount', 'expense_date'],
+            'data': [{'id': 500, 'description': 'قديم', 'amount': 12.5, 'expense_date': '2025-12-01'}],
+        }},
+    }
+    path = tmp_path / 'old.json'
+    path.write_text(json.dumps(old, ensure_ascii=False), encoding='utf-8')
+    stats = data_sync.import_data(str(path))
+    assert stats['rows_inserted'] == 1 and not stats['errors']
+    # المبالغ في الملفات القديمة بالجنيه
+    row = db.get_connection().execute("SELECT amount FROM expenses WHERE description = 'قديم'").fetchone()
+    assert row[0] == 1250
+
+
+def peak_memory(action):
+    tracemalloc.start()
+    try:
+        action()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_does_not_grow_with_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    peaks = []
+    for count in (2000, 20000):
+        db = Database(str(tmp_path / f'rows_{count}.db'))
+        db.get_connection().executemany(
+            "INSERT INTO expenses (description, amount, expense_date) VALUES (?, ?, '2025-01-01')",
+            ((f'مصروف رقم {i}', i) for i in range(count)))
+        db.get_connection().commit()
+        sync = DataSync(db.db_name)
+        path = sync.export_all_data(f'rows_{count}.ndjson')
+        empty_database(str(tmp_path / f'copy_{count}.db'))
+        target = DataSync(str(tmp_path / f'copy_{count}.db'))
+        peaks.append(peak_memory(lambda: (sync.export_all_data(f'again_{count}.ndjson'), target.import_data(path))))
+        db.close()
+    assert peaks[1] < peaks[0] * 2
+
+
+@pytest.mark.parametrize('compression', [None, 'gzip', 'lzma'])
+def test_compressed_backups(sync, tmp_path, compression):
+    data_sync, db, seller_id = sync
+    exporter = DataSync(db.db_name, compression=compression, compression_level=1)
+    path = exporter.export_all_data()
+    assert path.endswith({None: '.ndjson', 'gzip': '.ndjson.gz', 'lzma': '.ndjson.xz'}[compression])
+    assert load_backup(path)['tables']['expenses']['row_count'] == 50
+    assert os.path.basename(path) in [backup['filename'] for backup in exporter.list_backups()]
+
+    empty_database(str(tmp_path / 'copy.db'))
+    DataSync(str(tmp_path / 'copy.db')).import_data(path)
+    assert table_rows(str(tmp_path / 'copy.db')) == table_rows(db.db_name)
+
+
+def test_compression_shrinks_backup(sync):
+    data_sync, db, seller_id = sync
+    plain = DataSync(db.db_name, compression=None).export_all_data('plain.ndjson')
+    packed = data_sync.export_all_data('packed.ndjson.gz')
+    assert os.path.getsize(packed) < os.path.getsize(plain) / 3
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        DataSync('x.db', compression='zip')
@@ -0,0 +1,71 @@
+"""
+اختبار المفاتيح الأجنبية (PRAGMA foreign_keys = ON في كل اتصال)
+
+حذف حساب بائع يحذف معاملاته وملخص رصيده (ON DELETE CASCADE في المخطط)،
+ومعاملة لبائع غير موجود ترفض بدلاً من بقائها يتيمة. الاستيراد يسجل الصف
+اليتيم كخطأ ويكمل الباقي.
+
+التشغيل: python -m pytest -q test_foreign_keys.py
+"""
+
+import sqlite3
+
+import pytest
+
+from data_sync import DataSync
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'keys.db'))
+    for name in ('أول', 'ثاني'):
+        database.add_seller_account(name, 0, 0)
+    first, second = (database.get_seller_by_name(name).id for name in ('أول', 'ثاني'))
+    for seller_id in (first, second):
+        database.add_seller_transaction(seller_id, 10, 'متبقي', 1, 1, 1, 'صنف', '2025-03-01', '', '', '')
+        database.add_seller_transaction(seller_id, 4, 'مدفوع', 0, 0, 0, 'نقدي', '2025-03-02', '', '', '')
+    yield database, first, second
+    database.close()
+
+
+def count(database, sql, *params):
+    return database.get_connection().execute(sql, params).fetchone()[0]
+
+
+def test_delete_seller_cascades(db):
+    database, first, second = db
+    database.delete_seller_account(first)
+
+    assert count(database, 'SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ?', first) == 0
+    assert count(database, 'SELECT COUNT(*) FROM seller_balances WHERE seller_id = ?', first) == 0
+    # البائع الآخر كما هو
+    assert count(database, 'SELECT COUNT(*) FROM seller_transactions WHERE seller_id = ?', second) == 2
+    assert [s.remaining_amount for s in database.get_sellers_with_balances()] == [6]
+
+
+def test_orphan_transaction_rejected(db):
+    database, first, second = db
+    with pytest.raises(sqlite3.IntegrityError):
+        database.add_seller_transaction(9999, 10, 'متبقي', 1, 1, 1, 'صنف', '2025-03-01', '', '', '')
+    assert count(database, 'SELECT COUNT(*) FROM seller_transactions WHERE seller_id = 9999') == 0
+    assert not database.get_connection().in_transaction
+
+
+def test_import_skips_orphan_rows(db, tmp_path, monkeypatch):
+    database, first, second = db
+    monkeypatch.chdir(tmp_path)
+    # نسخة قديمة (قبل تفعيل المفاتيح) فيها معاملة لبائع محذوف
+    conn = database.get_connection()
+    conn.execute('PRAGMA foreign_keys = OFF')
+    conn.execute("INSERT INTO seller_transactions (seller_id, amount, status, date) VALUES (9999, 500, 'متبقي', '2025-03-03')")
+    conn.commit()
+    conn.execute('PRAGMA foreign_keys = ON')
+    path = DataSync(database.db_name).export_all_data()
+
+    target = Database(str(tmp_path / 'target.db'))
+    target.get_connection()
+    stats = DataSync(target.db_name).import_data(path, 'update')
+    assert len(stats['errors']) == 1 and 'FOREIGN KEY' in stats['errors'][0]
+    assert count(target, 'SELECT COUNT(*) FROM seller_transactions') == 4
+    target.close()
@@ -0,0 +1,93 @@
+"""
+اختبار استيراد النسخ الاحتياطية (DataSync.import_data)
+
+كل دفعة تكتب بجملة INSERT ... ON CONFLICT(id) واحدة، والتأكد من طرق
+الدمج الثلاث، والإحصائيات لكل جدول، وأن الصف الخاطئ لا يوقف باقي الدفعة.
+
+التشغيل: python -m pytest -q test_import.py
+"""
+
+import json
+
+import pytest
+
+import data_sync as data_sync_module
+from data_sync import DataSync
+from database import Database
+
+
+@pytest.fixture
+def backup(tmp_path, monkeypatch):
+    # مجلد التصدير data_exports ينشأ في المجلد الحالي
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data_sync_module, 'BATCH_ROWS', 8)
+    source = Database(str(tmp_path / 'source.db'))
+    with source.transaction() as tx:
+        for i in range(30):
+            tx.add_expense(f'مصروف {i}', i, '2025-01-01')
+    path = DataSync(source.db_name).export_all_data()
+    source.close()
+
+    target = Database(str(tmp_path / 'target.db'))
+    conn = target.get_connection()
+    conn.execute("INSERT INTO expenses (id, description, amount, expense_date, created_at) "
+                 "VALUES (1, 'محلي', 5, '2024-01-01', '2020-01-01 00:00:00')")
+    conn.commit()
+    yield path, target
+    target.close()
+
+
+def expense(target, expense_id):
+    return target.get_connection().execute(
+        'SELECT description, amount, created_at FROM expenses WHERE id = ?', (expense_id,)).fetchone()
+
+
+def test_update_mode(backup):
+    path, target = backup
+    stats = DataSync(target.db_name).import_data(path, 'update')
+    assert (stats['rows_inserted'], stats['rows_updated'], stats['errors']) == (29, 1, [])
+    # الصف الموجود يحدث مع بقاء تاريخ إنشائه، والجديد يحتفظ بمعرفه من الملف
+    assert expense(target, 1) == ('مصروف 0', 0, '2020-01-01 00:00:00')
+    assert expense(target, 30)[:2] == ('مصروف 29', 2900)
+    table = stats['tables']['expenses']
+    assert table['rows'] == 30 and table['rows_per_second'] > 0
+    assert stats['tables_processed'] == 8
+
+
+def test_skip_mode(backup):
+    path, target = backup
+    stats = DataSync(target.db_name).import_data(path, 'skip')
+    assert (stats['rows_inserted'], stats['rows_skipped']) == (29, 1)
+    assert expense(target, 1) == ('محلي', 5, '2020-01-01 00:00:00')
+
+
+def test_replace_mode(backup):
+    path, target = backup
+    stats = DataSync(target.db_name).import_data(path, 'replace')
+    assert (stats['rows_inserted'], stats['rows_updated']) == (29, 1)
+    description, amount, created_at = expense(target, 1)
+    assert (description, amount) == ('مصروف 0', 0) and created_at != '2020-01-01 00:00:00'
+
+
+def test_bad_row_only_fails_itself(backup, tmp_path):
+    path, target = backup
+    lines = [
+        {'record': 'header', 'export_date': '2025-01-01T00:00:00', 'money_unit': data_sync_module.MONEY_UNIT,
+         'export_type': 'full', 'watermark': 0},
+        {'record': 'table', 'table': 'expenses', 'columns': ['id', 'description', 'amount', 'expense_date']},
+        [100, 'أول', 1, '2025-01-01'],
+        [101, None, 1, '2025-01-01'],
+        [102, 'ثالث', 1, '2025-01-01'],
+        {'record': 'end', 'table': 'expenses', 'row_count': 3},
+    ]
+    bad = tmp_path / 'bad.ndjson'
+    bad.write_text(''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines), encoding='utf-8')
+    stats = DataSync(target.db_name).import_data(str(bad))
+    assert stats['rows_inserted'] == 2 and len(stats['errors']) == 1
+    assert expense(target, 101) is None and expense(target, 102)[0] == 'ثالث'
+
+
+def test_unknown_merge_mode(backup):
+    path, target = backup
+    with pytest.raises(ValueError):
+        DataSync(target.db_name).import_data(path, 'merge')
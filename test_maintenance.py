@@ -0,0 +1,92 @@
+"""
+اختبار مهام صيانة قاعدة البيانات (maintenance.py)
+
+التشغيل: python -m pytest -q test_maintenance.py
+"""
+
+import sqlite3
+
+import pytest
+
+from database import Database
+from maintenance import enable_auto_vacuum, run_maintenance, SHUTDOWN_TASKS
+
+
+def fill(database):
+    with database.transaction() as tx:
+        for i in range(2000):
+            tx.add_expense(f'مصروف {i} ' + 'x' * 200, i, '2025-01-01')
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'maintenance.db'))
+    fill(database)
+    yield database
+    database.close()
+
+
+@pytest.fixture
+def old_db(tmp_path):
+    # ملف أنشئ قبل ضبط auto_vacuum في إعدادات الاتصال
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE legacy (id INTEGER)')
+    conn.close()
+    database = Database(path)
+    fill(database)
+    yield database
+    database.close()
+
+
+def auto_vacuum(database):
+    return database.get_connection().execute('PRAGMA auto_vacuum').fetchone()[0]
+
+
+def test_shutdown_runs_incremental_vacuum_and_logs(db):
+    # الملف الجديد ينشأ بـ auto_vacuum = INCREMENTAL
+    assert auto_vacuum(db) == 2
+    results = run_maintenance(db, 'shutdown')
+
+    assert [task for task, _, _ in results] == list(SHUTDOWN_TASKS)
+    assert dict((task, result) for task, _, result in results)['integrity_check'] == 'ok'
+    conn = db.get_connection()
+    assert len(db.get_maintenance_log()) == len(SHUTDOWN_TASKS)
+
+    # الصفحات الفارغة بعد الحذف تعود للنظام
+    conn.execute('DELETE FROM expenses')
+    conn.commit()
+    run_maintenance(db, 'shutdown')
+    vacuum = next(run for run in db.get_maintenance_log() if run.task == 'incremental_vacuum')
+    assert vacuum.free_pages_before > 0
+    assert vacuum.free_pages_after == 0
+    assert vacuum.pages_after < vacuum.pages_before
+
+
+def test_heavy_tasks_wait_for_their_interval(db):
+    run_maintenance(db, 'shutdown')
+    tasks = [task for task, _, _ in run_maintenance(db, 'shutdown')]
+    assert 'analyze' not in tasks
+    assert 'integrity_check' not in tasks
+    assert 'optimize' in tasks
+
+
+def test_idle_and_shutdown_skip_full_vacuum(old_db):
+    results = dict((task, result) for task, _, result in run_maintenance(old_db, 'idle'))
+    assert set(results) == {'optimize', 'incremental_vacuum', 'checkpoint'}
+    run_maintenance(old_db, 'shutdown')
+    assert auto_vacuum(old_db) == 0
+
+
+def test_enable_auto_vacuum_on_request(old_db):
+    conn = old_db.get_connection()
+    conn.execute('DELETE FROM expenses')
+    conn.commit()
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] > 0
+
+    results = enable_auto_vacuum(old_db)
+    assert [task for task, _, _ in results] == ['enable_auto_vacuum', 'checkpoint']
+    assert auto_vacuum(old_db) == 2
+    assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+    assert enable_auto_vacuum(old_db)[0][2] == 'auto_vacuum مفعل بالفعل'
+    assert {run.reason for run in old_db.get_maintenance_log()} == {'manual'}
@@ -0,0 +1,71 @@
+"""
+اختبار تطبيق ترحيلات المخطط (migrations.apply_migrations)
+
+التشغيل: python -m pytest -q test_migrations.py
+"""
+
+import sqlite3
+
+import pytest
+
+import migrations
+from database import connect
+from migrations import MIGRATIONS, SCHEMA_VERSION, apply_migrations, get_schema_version
+
+
+@pytest.fixture
+def conn(tmp_path):
+    # connect يسجل arabic_normalize التي تحتاجها triggers فهرس البحث
+    connection = connect(str(tmp_path / 'scratch.db'))
+    yield connection
+    connection.close()
+
+
+def schema(connection):
+    return connection.execute('SELECT type, name, sql FROM sqlite_master ORDER BY type, name').fetchall()
+
+
+def test_migrates_empty_database_to_latest(conn):
+    assert get_schema_version(conn) == 0
+    assert apply_migrations(conn) == [version for version, _ in MIGRATIONS]
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    names = {name for _, name, _ in schema(conn)}
+    for table in ('sellers_accounts', 'seller_transactions', 'seller_balances', 'expenses', 'daily_reports',
+                  'archive_state', 'maintenance_log', 'changelog', 'import_state'):
+        assert table in names
+    assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+
+
+def test_second_run_is_a_no_op(conn):
+    apply_migrations(conn)
+    before = schema(conn)
+    assert apply_migrations(conn) == []
+    assert schema(conn) == before
+    assert get_schema_version(conn) == SCHEMA_VERSION
+
+
+def test_resumes_after_last_applied_version(conn):
+    middle = MIGRATIONS[5][0]
+    conn.execute('BEGIN IMMEDIATE')
+    for version, step in MIGRATIONS[:6]:
+        step(conn.cursor())
+    conn.execute(f'PRAGMA user_version = {middle}')
+    conn.commit()
+
+    assert apply_migrations(conn) == [version for version, _ in MIGRATIONS[6:]]
+    assert get_schema_version(conn) == SCHEMA_VERSION
+
+
+def test_failed_step_is_rolled_back(conn, monkeypatch):
+    apply_migrations(conn)
+
+    def broken(cursor):
+        cursor.execute('CREATE TABLE half_done (id INTEGER)')
+        cursor.execute('SELECT * FROM missing_table')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS + [(SCHEMA_VERSION + 1, broken)])
+    monkeypatch.setattr(migrations, 'SCHEMA_VERSION', SCHEMA_VERSION + 1)
+    with pytest.raises(sqlite3.Error):
+        apply_migrations(conn)
+    assert get_schema_version(conn) == SCHEMA_VERSION
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
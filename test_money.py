@@ -0,0 +1,164 @@
+"""
+اختبار حفظ المبالغ بالقرش
+
+التشغيل: python -m pytest -q test_money.py
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+import migrations
+from archive import archive_path, create_archive_schema
+from data_sync import DataSync
+from database import Database, connect
+from money import LEDGER_MONEY_UNIT, to_piasters, format_money
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'money.db'))
+    yield database
+    database.close()
+
+
+@pytest.mark.parametrize('amount, piasters', [
+    (0.1, 10),
+    ('12.345', 1235),
+    (2.675, 268),
+    (-0.005, -1),
+    ('', 0),
+    (None, 0),
+])
+def test_to_piasters(amount, piasters):
+    assert to_piasters(amount) == piasters
+
+
+def test_format_money_rounds_half_up():
+    assert format_money(2.675) == '2.68'
+    assert format_money(1.005) == '1.01'
+
+
+def test_balances_are_exact(db):
+    db.add_seller_account('بائع', 0.3, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    with db.transaction() as tx:
+        for _ in range(1000):
+            tx.add_seller_transaction(seller_id, 0.1, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+            tx.add_seller_transaction(seller_id, 0.07, 'مدفوع', 0, 0, 0, 'نقدية', '2025-01-01', '', '', '')
+
+    [seller] = db.get_sellers_with_balances()
+    # 0.3 + 1000 * 0.1 - 1000 * 0.07
+    assert seller.remaining_amount == 30.3
+    assert db.get_seller_balance_before(seller_id, '2025-01-02') == 30.0
+
+    # حذف كل المعاملات يرجع الملخص للصفر تماماً
+    for trans in db.get_seller_transactions(seller_id):
+        db.delete_seller_transaction(trans.id)
+    [seller] = db.get_sellers_with_balances()
+    assert seller.remaining_amount == 0.3
+
+
+def test_daily_totals(db):
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    for _ in range(3):
+        db.add_seller_transaction(seller_id, 0.1, 'مدفوع', 0, 0, 0, 'نقدية', '2025-01-01', '', '', '')
+    db.add_expense('مصروف', 0.2, '2025-01-01')
+
+    assert db.calculate_daily_totals('2025-01-01') == {
+        'total_collection': 0.3,
+        'remaining_profit': 0.1,
+        'total_expenses': 0.2,
+    }
+    db.save_daily_report('2025-01-01', 0.3, 0.1, 0.2)
+    assert db.get_daily_report('2025-01-01') == ('2025-01-01', 0.3, 0.1, 0.2)
+
+
+def raw(database, sql):
+    return database.get_connection().execute(sql).fetchone()
+
+
+def test_prices_stored_in_piasters(db):
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    db.add_seller_transaction(seller_id, 25, 'متبقي', 1, 2, 12.5, 'صنف', '2025-01-01', '', '', '')
+    db.add_meal('بلطي', 7.25)
+    db.add_inventory_item('صندوق', 3, 0.35)
+    db.add_agriculture_transfer('عميل', 'بائع', 'صنف', 4.1, 3, 1, '', 'in')
+    invoice_id = db.save_client_invoice('عميل', 1.5, '10%', 2.25, 3, 4.75, '2025-01-01', 12.3, 0.55)
+
+    # نفس الصف لا يخلط وحدتين: المبلغ والسعر كلاهما بالقرش
+    assert raw(db, 'SELECT amount, price FROM seller_transactions') == (2500, 1250)
+    assert raw(db, 'SELECT price_per_kg FROM meals') == (725,)
+    assert raw(db, 'SELECT price FROM inventory_items') == (35,)
+    assert raw(db, 'SELECT unit_price FROM agriculture_transfers') == (410,)
+    assert raw(db, 'SELECT nolon, commission, mashal, rent, cash, net_amount, final_total FROM client_invoices') == \
+        (150, '10%', 225, 300, 475, 1230, 55)
+
+    # والقراءة بالجنيه كما كانت
+    assert db.get_seller_transactions(seller_id)[0].price == 12.5
+    assert db.find_meal_by_name('بلطي')[2] == 7.25
+    assert db.get_all_inventory()[0][3] == 0.35
+    assert db.get_agriculture_transfers()[0].unit_price == 4.1
+    assert db.get_sales_summary() == [('صنف', 3.0, 12.3)]
+    invoice = db.get_latest_invoice_by_client('عميل')
+    assert (invoice.id, invoice.nolon, invoice.commission, invoice.cash, invoice.final_total) == \
+        (invoice_id, 1.5, '10%', 4.75, 0.55)
+
+
+def test_price_migration_converts_archives_once(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = connect(path)
+    conn.execute('BEGIN IMMEDIATE')
+    for version, step in migrations.MIGRATIONS:
+        if version < 16:
+            step(conn.cursor())
+    conn.execute('PRAGMA user_version = 15')
+    conn.commit()
+    conn.execute("INSERT INTO sellers_accounts (id, seller_name) VALUES (1, 'بائع')")
+    conn.execute("INSERT INTO seller_transactions (seller_id, amount, status, price, date) VALUES (1, 500, 'متبقي', 2.5, '2025-01-01')")
+    conn.execute("INSERT INTO meals (name, price_per_kg) VALUES ('بلطي', 7.25)")
+    conn.commit()
+
+    # ملف أرشيف قديم (قبل الترحيل 16) أسعاره بالجنيه
+    archive = sqlite3.connect(archive_path(path, 2023))
+    create_archive_schema(archive, 'main')
+    archive.execute('PRAGMA user_version = 0')
+    archive.execute("INSERT INTO seller_transactions (id, seller_id, amount, price, date) VALUES (7, 1, 300, 1.5, '2023-01-01')")
+    archive.execute("INSERT INTO agriculture_transfers (id, unit_price) VALUES (8, 3.2)")
+    archive.commit()
+    archive.close()
+
+    assert 16 in migrations.apply_migrations(conn)
+    assert conn.execute('SELECT amount, price FROM seller_transactions').fetchone() == (500, 250)
+    assert conn.execute('SELECT price_per_kg FROM meals').fetchone() == (725,)
+    conn.close()
+
+    # إعادة الخطوة (مثلاً بعد فشل المعاملة الرئيسية) لا تضرب الأرشيف مرتين
+    migrations._scale_archive_prices(archive_path(path, 2023))
+    archive = sqlite3.connect(archive_path(path, 2023))
+    assert archive.execute('SELECT amount, price FROM seller_transactions').fetchone() == (300, 150)
+    assert archive.execute('SELECT unit_price FROM agriculture_transfers').fetchone() == (320,)
+    assert archive.execute('PRAGMA user_version').fetchone() == (1,)
+    archive.close()
+
+
+@pytest.mark.parametrize('money_unit, amount, price', [
+    (None, 2500, 1250),
+    (LEDGER_MONEY_UNIT, 25, 1250),
+])
+def test_import_older_money_units(db, tmp_path, money_unit, amount, price):
+    db.add_seller_account('بائع', 0, 0)
+    lines = [
+        {'record': 'header', 'export_date': '2025-01-01T00:00:00', 'money_unit': money_unit, 'export_type': 'full'},
+        {'record': 'table', 'table': 'seller_transactions',
+         'columns': ['id', 'seller_id', 'amount', 'status', 'price', 'date']},
+        [1, 1, 25, 'متبقي', 12.5, '2025-01-01'],
+        {'record': 'end', 'table': 'seller_transactions', 'row_count': 1},
+    ]
+    old = tmp_path / 'old.ndjson'
+    old.write_text(''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines), encoding='utf-8')
+    assert DataSync(db.db_name).import_data(str(old))['errors'] == []
+    assert raw(db, 'SELECT amount, price FROM seller_transactions') == (amount, price)
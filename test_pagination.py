@@ -0,0 +1,105 @@
+"""
+اختبار صفحات الدفاتر (keyset pagination)
+
+يتأكد أن المرور على كل الصفحات يعطي نفس صفوف الدالة الكاملة بنفس الترتيب
+(بما فيها الصفوف بدون تاريخ)، وأن استعلامات الصفحات تبحث في الفهرس
+ولا تقرأ الجدول كاملاً.
+
+التشغيل: python -m pytest -q test_pagination.py
+"""
+
+import random
+import re
+
+import pytest
+
+from database import Database, day_number
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'pages.db'))
+    rng = random.Random(7)
+    # نفس الأيام بصيغتي التاريخ: الترتيب برقم اليوم وليس بالنص
+    dates = ['2025-01-0%d' % d for d in range(1, 6)] + ['2025/01/0%d' % d for d in range(1, 6)] + [None]
+
+    database.add_seller_account('بائع', 0, 0)
+    seller_id = database.get_seller_by_name('بائع').id
+    with database.transaction() as tx:
+        for i in range(57):
+            date = rng.choice(dates)
+            tx.add_seller_transaction(seller_id, i, 'متبقي', 0, 0, 0, 'صنف', date, '', '', '')
+            tx.add_expense(f'مصروف {i}', i, date or '2025-01-03')
+            tx.save_client_invoice('عميل', 0, '', 0, 0, 0, date)
+            tx.add_agriculture_transfer('عميل', 'بائع', 'صنف', 1, 1, 0, '', 'in')
+    yield database, seller_id
+    database.close()
+
+
+def walk(fetch_page, limit):
+    """كل صفوف كل الصفحات بالترتيب"""
+    rows, token = fetch_page(limit=limit, token=None)
+    pages = 1
+    while token:
+        page, token = fetch_page(limit=limit, token=token)
+        assert page
+        rows += page
+        pages += 1
+    return rows, pages
+
+
+def sort_newest_first(rows, key):
+    """نفس ترتيب الصفحات: المؤرخ من الأحدث ثم غير المؤرخ، والأكبر id أولاً"""
+    dated = sorted((r for r in rows if key(r) is not None), key=lambda r: (day_number(key(r)), r.id), reverse=True)
+    undated = sorted((r for r in rows if key(r) is None), key=lambda r: r.id, reverse=True)
+    return dated + undated
+
+
+@pytest.mark.parametrize('limit', [1, 7, 57, 100])
+def test_pages_cover_all_rows_in_order(db, limit):
+    database, seller_id = db
+
+    rows, pages = walk(lambda **kw: database.get_seller_transactions_page(seller_id, **kw), limit)
+    assert rows == sort_newest_first(database.get_seller_transactions(seller_id), lambda r: r.date)
+    assert pages == max(1, -(-57 // limit))
+    assert database.count_seller_transactions(seller_id) == 57
+
+    rows, _ = walk(database.get_expenses_page, limit)
+    assert rows == sort_newest_first(database.get_all_expenses(), lambda r: r.expense_date)
+    assert database.count_expenses() == 57
+
+    rows, _ = walk(lambda **kw: database.get_client_invoices_page('عميل', **kw), limit)
+    assert rows == sort_newest_first(database.get_client_invoices('عميل'), lambda r: r.invoice_date)
+    assert database.count_client_invoices('عميل') == 57
+
+    rows, _ = walk(database.get_agriculture_transfers_page, limit)
+    assert sorted(r.id for r in rows) == sorted(t.id for t in database.get_agriculture_transfers())
+    assert database.count_agriculture_transfers() == 57
+
+
+def test_invalid_token(db):
+    database, _ = db
+    with pytest.raises(ValueError):
+        database.get_expenses_page(token='not-a-token')
+
+
+def test_page_queries_use_indexes(db):
+    database, seller_id = db
+    conn = database.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        for fetch in (lambda **kw: database.get_seller_transactions_page(seller_id, **kw),
+                      database.get_expenses_page,
+                      lambda **kw: database.get_client_invoices_page('عميل', **kw),
+                      database.get_agriculture_transfers_page):
+            walk(fetch, 5)
+    finally:
+        conn.set_trace_callback(None)
+
+    # الاستعلامات المسجلة تحتوي القيم الفعلية بدلاً من ?
+    for sql in {s for s in statements if s.lstrip().upper().startswith('SELECT')}:
+        for row in conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall():
+            assert not FULL_SCAN.match(row[3]), f"{row[3]}\n{sql}"
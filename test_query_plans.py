@@ -0,0 +1,216 @@
+"""
+اختبار خطط الاستعلامات
+
+يشغل EXPLAIN QUERY PLAN على كل جملة SQL ثابتة في database.py، وعلى الجمل
+التي تنفذها فعلاً دوال القراءة والصفحات والأرشيف (تلتقط بـ set_trace_callback،
+فتشمل جمل f-string)، ويفشل إذا قرأ أي استعلام جدولاً كاملاً بدون فهرس أو
+رتب الصفوف في جدول مؤقت (USE TEMP B-TREE) بدلاً من ترتيب الفهرس.
+
+التشغيل: python -m pytest -q test_query_plans.py
+"""
+
+import ast
+import os
+import re
+
+import pytest
+
+from archive import archive_path
+from database import Database
+
+DATABASE_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database.py')
+
+SQL_KEYWORDS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+
+# استعلامات مسموح لها بقراءة الجدول بالترتيب مع سبب ذلك
+ALLOWED_SCANS = {
+    # ORDER BY id DESC LIMIT 1 يقرأ صفاً واحداً من نهاية الجدول
+    'get_latest_client_invoice': 'client_invoices',
+    # ORDER BY id DESC LIMIT ? يقرأ آخر الصفوف فقط
+    'get_maintenance_log': 'maintenance_log',
+}
+
+# استعلامات مسموح لها بالترتيب في جدول مؤقت مع سبب ذلك
+ALLOWED_TEMP_BTREES = {
+    # التجميع لصفوف قليلة مختارة بقائمة معرفات، مرة واحدة لكل أرشفة
+    'archive_before',
+}
+
+# SCAN <table> بدون USING INDEX = قراءة الجدول كاملاً
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+# اسم ملف أرشيف داخل الاتصال في جملة SQL (archive.archive_alias)
+ARCHIVE_ALIAS = re.compile(r'\barchive_(\d{4})\.')
+
+
+def collect_sql_statements():
+    """(اسم الدالة، جملة SQL) لكل نص ثابت في database.py يبدأ بأمر SQL"""
+    with open(DATABASE_SOURCE, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+
+    statements = []
+    for func in ast.walk(tree):
+        if not isinstance(func, ast.FunctionDef):
+            continue
+        # أجزاء f-string ليست جملاً كاملة
+        fragments = {id(part) for node in ast.walk(func) if isinstance(node, ast.JoinedStr) for part in node.values}
+        for node in ast.walk(func):
+            if (isinstance(node, ast.Constant) and isinstance(node.value, str)
+                    and id(node) not in fragments
+                    and node.value.strip().upper().startswith(SQL_KEYWORDS)):
+                statements.append((func.name, node.value))
+    return statements
+
+
+STATEMENTS = collect_sql_statements()
+
+
+@pytest.fixture(scope='module')
+def connection(tmp_path_factory):
+    db = Database(str(tmp_path_factory.mktemp('plans') / 'plans.db'))
+    yield db.get_connection()
+    db.close()
+
+
+def test_statements_found():
+    """التأكد من أن الاستخراج يعمل فعلاً"""
+    assert len(STATEMENTS) > 30
+
+
+def check_plan(conn, func_name, sql, params=()):
+    """الفشل إذا قرأ الاستعلام جدولاً كاملاً أو رتب في جدول مؤقت"""
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+
+    for row in plan:
+        detail = row[3]
+        match = FULL_SCAN.match(detail)
+        if match and ALLOWED_SCANS.get(func_name) != match.group(1):
+            pytest.fail(f"{func_name}: {detail}\n{sql}")
+        if TEMP_BTREE in detail and func_name not in ALLOWED_TEMP_BTREES:
+            pytest.fail(f"{func_name}: {detail}\n{sql}")
+
+
+@pytest.mark.parametrize('func_name, sql', STATEMENTS, ids=[name for name, _ in STATEMENTS])
+def test_no_full_table_scan(connection, func_name, sql):
+    """لا يوجد استعلام ثابت يقرأ جدولاً كاملاً بدون فهرس أو يرتب في جدول مؤقت"""
+    check_plan(connection, func_name, sql, [None] * sql.count('?'))
+
+
+@pytest.fixture(scope='module')
+def ledger(tmp_path_factory):
+    """قاعدة بيانات فيها صفوف في كل دفتر وأرشيف لسنة 2023"""
+    db = Database(str(tmp_path_factory.mktemp('traced') / 'traced.db'))
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    with db.transaction() as tx:
+        for date in ('2023-03-01', '2025-03-01', '2025/03/02'):
+            tx.add_seller_transaction(seller_id, 10, 'متبقي', 1, 1, 1, 'صنف', date, '', '', '')
+            tx.add_seller_transaction(seller_id, 10, 'مدفوع', 0, 0, 0, 'نقدي', date, '', '', '')
+            tx.add_expense('منصرف', 5, date)
+        tx.add_agriculture_transfer('عميل', 'بائع', 'صنف', 2, 10, 1, '', 'in')
+        tx.save_client_invoice('عميل', 1, '', 1, 1, 1, '2025-03-01')
+    db.link_transfers_to_invoice(1, [t.id for t in db.get_uninvoiced_transfers('عميل')])
+    db.get_connection().execute("UPDATE agriculture_transfers SET created_at = '2023-03-01 10:00:00'")
+    db.get_connection().commit()
+    db.archive_before('2024-01-01')
+    yield db, seller_id
+    db.close()
+
+
+# دوال القراءة كما تستدعيها الشاشات، ومنها فترات تقرأ من ملفات الأرشيف
+TRACED_CALLS = {
+    'get_sellers_with_balances': lambda db, seller: db.get_sellers_with_balances(),
+    'get_seller_transactions': lambda db, seller: db.get_seller_transactions(seller),
+    'get_seller_statement': lambda db, seller: db.get_seller_statement(seller),
+    'get_paid_transactions': lambda db, seller: db.get_paid_transactions(),
+    'get_seller_transactions_between': lambda db, seller: db.get_seller_transactions_between(seller, '2023-01-01', '2025-12-31'),
+    'get_seller_balance_before': lambda db, seller: db.get_seller_balance_before(seller, '2023-06-01'),
+    'get_overdue_seller_ids': lambda db, seller: db.get_overdue_seller_ids('2025-04-01'),
+    'get_sales_summary': lambda db, seller: db.get_sales_summary(),
+    'get_expenses_between': lambda db, seller: db.get_expenses_between('2025-03-01', '2025-03-31'),
+    'get_all_expenses': lambda db, seller: db.get_all_expenses(),
+    'get_client_invoices_between': lambda db, seller: db.get_client_invoices_between('2025-03-01', '2025-03-31'),
+    'get_client_invoices': lambda db, seller: db.get_client_invoices('عميل'),
+    'get_latest_invoice_by_client': lambda db, seller: db.get_latest_invoice_by_client('عميل'),
+    'get_daily_reports_range': lambda db, seller: db.get_daily_reports_range('2025-03-01', '2025-03-31'),
+    'calculate_range_totals': lambda db, seller: db.calculate_range_totals('2023-01-01', '2025-12-31'),
+    'get_uninvoiced_transfers': lambda db, seller: db.get_uninvoiced_transfers('عميل'),
+    'get_transfers_by_invoice_id': lambda db, seller: db.get_transfers_by_invoice_id(1),
+    'get_seller_transactions_page': lambda db, seller: db.get_seller_transactions_page(
+        seller, 1, db.get_seller_transactions_page(seller, 1)[1]),
+    'get_expenses_page': lambda db, seller: db.get_expenses_page(1, db.get_expenses_page(1)[1]),
+    'get_client_invoices_page': lambda db, seller: db.get_client_invoices_page('عميل'),
+    'get_agriculture_transfers_page': lambda db, seller: db.get_agriculture_transfers_page(),
+    'changes_since': lambda db, seller: db.changes_since(0),
+    'fingerprint': lambda db, seller: db.fingerprint(('expenses',), seller),
+    'search': lambda db, seller: db.search('صنف'),
+}
+
+
+@pytest.mark.parametrize('func_name', TRACED_CALLS)
+def test_executed_statements_use_indexes(ledger, func_name):
+    """الجمل المنفذة فعلاً (ومنها f-string وجمل الأرشيف) لا تقرأ جدولاً كاملاً ولا ترتب في جدول مؤقت"""
+    db, seller_id = ledger
+    conn = db.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        TRACED_CALLS[func_name](db, seller_id)
+    finally:
+        conn.set_trace_callback(None)
+
+    statements = [sql for sql in statements if sql.strip().upper().startswith(SQL_KEYWORDS)]
+    assert statements
+    for sql in statements:
+        # ملفات الأرشيف تفتح أثناء الاستدعاء فقط
+        aliases = sorted(set(ARCHIVE_ALIAS.findall(sql)))
+        for year in aliases:
+            conn.execute(f'ATTACH DATABASE ? AS archive_{year}', (archive_path(db.db_name, int(year)),))
+        try:
+            check_plan(conn, func_name, sql)
+        finally:
+            for year in aliases:
+                conn.execute(f'DETACH DATABASE archive_{year}')
+
+
+def test_archive_statements_traced(ledger):
+    """الفترات المختارة تقرأ فعلاً من ملف الأرشيف"""
+    db, seller_id = ledger
+    conn = db.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        for name in ('get_seller_transactions_between', 'calculate_range_totals', 'get_transfers_by_invoice_id'):
+            TRACED_CALLS[name](db, seller_id)
+    finally:
+        conn.set_trace_callback(None)
+    assert sum(1 for sql in statements if ARCHIVE_ALIAS.search(sql)) >= 3
+
+
+# استعلامات find_agriculture_transfers تبنى حسب الشروط، لذلك تختبر بأشكال الاستدعاء الفعلية
+TRANSFER_FILTERS = [
+    {'transfer_type': 'in'},
+    {'transfer_type': 'in', 'search': 'x', 'item_name': 'x'},
+    {'transfer_type': 'in', 'client_name': 'x'},
+    {'transfer_type': 'in', 'transfer_id': 1},
+    {'transfer_id': 1},
+    {'client_name': 'x', 'invoiced': False},
+]
+
+
+@pytest.mark.parametrize('filters', TRANSFER_FILTERS, ids=lambda f: ','.join(f))
+def test_transfer_filters_use_indexes(tmp_path, filters):
+    db = Database(str(tmp_path / 'filters.db'))
+    conn = db.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        db.find_agriculture_transfers(**filters)
+    finally:
+        conn.set_trace_callback(None)
+
+    sql = next(s for s in statements if 'FROM agriculture_transfers' in s)
+    check_plan(conn, 'find_agriculture_transfers', sql)
+    db.close()
@@ -0,0 +1,64 @@
+"""
+اختبار قياس زمن الاستعلامات
+
+التشغيل: python -m pytest -q test_query_stats.py
+"""
+
+import pytest
+
+from database import Database
+from query_stats import QueryStats, _percentile
+
+
+@pytest.fixture
+def db(tmp_path):
+    stats = QueryStats(slow_ms=0, log_path=str(tmp_path / 'logs' / 'slow.log'))
+    database = Database(str(tmp_path / 'stats.db'), stats=stats)
+    yield database
+    database.close()
+
+
+def by_name(stats, kind):
+    return {item['name']: item for item in stats.snapshot() if item['kind'] == kind}
+
+
+def test_methods_and_statements_are_counted(db):
+    db.add_seller_account('بائع', 0, 0)
+    seller_id = db.get_seller_by_name('بائع').id
+    for i in range(3):
+        db.add_seller_transaction(seller_id, i, 'متبقي', 0, 0, 0, 'صنف', '2025-01-01', '', '', '')
+    assert len(db.get_seller_transactions(seller_id)) == 3
+
+    methods = by_name(db.stats, 'method')
+    assert methods['add_seller_transaction']['calls'] == 3
+    assert methods['get_seller_transactions']['rows'] == 3
+    assert methods['get_seller_transactions']['p95_ms'] <= methods['get_seller_transactions']['max_ms']
+    assert 'transaction' not in methods
+
+    statements = by_name(db.stats, 'sql')
+    [select] = [item for name, item in statements.items() if name.startswith('SELECT id, amount / 100.0')]
+    assert select['rows'] == 3
+    assert statements['COMMIT']['calls'] >= 4
+
+    # slow_ms=0: كل جملة تكتب في السجل
+    with open(db.stats.log_path, encoding='utf-8') as f:
+        assert 'seller_transactions' in f.read()
+
+    db.stats.reset()
+    assert db.stats.snapshot() == []
+
+
+def test_disabled_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv('DB_STATS', raising=False)
+    database = Database(str(tmp_path / 'plain.db'))
+    assert database.stats is None
+    assert 'get_all_expenses' not in vars(database)
+    database.close()
+
+
+def test_percentile():
+    ordered = list(range(1, 101))
+    assert _percentile(ordered, 0.50) == 50
+    assert _percentile(ordered, 0.95) == 95
+    assert _percentile([7], 0.95) == 7
+    assert _percentile([], 0.5) == 0.0
@@ -0,0 +1,102 @@
+"""
+اختبار الذاكرة المؤقتة للجداول المرجعية (reference_cache.py)
+
+التفريغ بعد الحفظ، عدم بقاء صفوف ملغاة بعد التراجع، القراءة المباشرة داخل
+معاملة كتبت على الجدول، وعدادات الإصابة والإخفاق.
+
+التشغيل: python -m pytest -q test_reference_cache.py
+"""
+
+import pytest
+
+from database import Database
+from reference_cache import ReferenceCache
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'cache.db'))
+    database.add_seller_account('أحمد', 0, 0)
+    yield database
+    database.close()
+
+
+def seller_names(database):
+    return [seller.seller_name for seller in database.get_all_sellers_accounts()]
+
+
+def counters(database, table='sellers_accounts'):
+    return database.cache_stats().get(table, {'hits': 0, 'misses': 0})
+
+
+def test_commit_invalidates(db):
+    assert seller_names(db) == ['أحمد']
+    assert seller_names(db) == ['أحمد']
+    assert counters(db) == {'hits': 1, 'misses': 1}
+
+    db.add_seller_account('بكر', 0, 0)
+    assert seller_names(db) == ['أحمد', 'بكر']
+    assert db.get_seller_by_name('بكر') is not None
+    assert counters(db) == {'hits': 2, 'misses': 2}
+
+    # الكتابة على جدول آخر لا تفرغ حسابات البائعين
+    db.add_client_account('عميل')
+    seller_names(db)
+    assert counters(db) == {'hits': 3, 'misses': 2}
+
+
+def test_rollback_leaves_no_stale_rows(db):
+    seller_names(db)
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_seller_account('مؤقت', 0, 0)
+            assert 'مؤقت' in seller_names(db)
+            raise RuntimeError('إلغاء')
+    assert seller_names(db) == ['أحمد']
+    assert db.get_seller_by_name('مؤقت') is None
+
+
+def test_reads_bypass_cache_after_write_in_transaction(db):
+    seller_names(db)
+    with db.transaction():
+        # لم تكتب المعاملة على الجدول بعد: القراءة من الذاكرة
+        db.add_expense('منصرف', 10, '2025-03-01')
+        assert seller_names(db) == ['أحمد']
+        assert counters(db) == {'hits': 1, 'misses': 1}
+
+        db.add_seller_account('بكر', 0, 0)
+        assert seller_names(db) == ['أحمد', 'بكر']
+        assert seller_names(db) == ['أحمد', 'بكر']
+        # كل قراءة بعد الكتابة تذهب لقاعدة البيانات
+        assert counters(db) == {'hits': 1, 'misses': 3}
+    # ما قرئ داخل المعاملة لم يحفظ؛ أول قراءة بعد الحفظ تجلب من جديد
+    assert seller_names(db) == ['أحمد', 'بكر']
+    assert seller_names(db) == ['أحمد', 'بكر']
+    assert counters(db) == {'hits': 2, 'misses': 4}
+
+
+def test_counters_per_table(db):
+    db.add_meal('بلطي', 20)
+    db.get_all_meals()
+    db.find_meal_by_name(' بلطي ')
+    db.get_all_meals()
+    db.get_all_inventory()
+    assert db.cache_stats() == {
+        'meals': {'hits': 2, 'misses': 1},
+        'inventory_items': {'hits': 0, 'misses': 1},
+    }
+
+
+def test_invalidate_during_load_is_not_stored():
+    cache = ReferenceCache()
+
+    def load():
+        # كتابة انتهت أثناء القراءة: النتيجة قد تكون قديمة
+        cache.invalidate('meals')
+        return [('قديم',)]
+
+    rows, index = cache.get('meals', load, lambda row: row[0])
+    assert rows == [('قديم',)] and index == {'قديم': ('قديم',)}
+    rows, _ = cache.get('meals', lambda: [('جديد',)], lambda row: row[0])
+    assert rows == [('جديد',)]
+    assert cache.stats() == {'meals': {'hits': 0, 'misses': 2}}
@@ -0,0 +1,76 @@
+"""
+اختبار مجاميع التقارير اليومية (calculate_range_totals و get_daily_reports_range)
+ودمج التقارير المحفوظة مع المجاميع الحالية في صفحة التقارير
+
+التشغيل: python -m pytest -q test_reports.py
+"""
+
+import pytest
+
+from database import Database
+from reports_page import merge_daily_rows
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'reports.db'))
+    database.add_seller_account('بائع', 0, 0)
+    seller_id = database.get_seller_by_name('بائع').id
+    with database.transaction() as tx:
+        tx.add_seller_transaction(seller_id, 100.25, 'مدفوع', 0, 0, 0, 'نقدي', '2025-03-01', '', '', '')
+        # نفس اليوم بالصيغة القديمة التي تكتبها الصفحات
+        tx.add_seller_transaction(seller_id, 50, 'مدفوع', 0, 0, 0, 'نقدي', '2025/03/01', '', '', '')
+        # السماح ليس تحصيلاً، والبضاعة ليست تحصيلاً
+        tx.add_seller_transaction(seller_id, 7, 'مدفوع', 0, 0, 0, 'سماح', '2025-03-01', '', '', '')
+        tx.add_seller_transaction(seller_id, 300, 'متبقي', 1, 1, 1, 'صنف', '2025-03-01', '', '', '')
+        tx.add_seller_transaction(seller_id, 20, 'مدفوع', 0, 0, 0, 'نقدي', '2025/03/31', '', '', '')
+        tx.add_seller_transaction(seller_id, 999, 'مدفوع', 0, 0, 0, 'نقدي', '2025-04-01', '', '', '')
+        tx.add_expense('مصروف', 30.1, '2025/03/01')
+        tx.add_expense('مصروف', 15, '2025-03-15')
+        tx.add_expense('مصروف', 1, '2025-02-28')
+    yield database
+    database.close()
+
+
+def test_range_totals_per_day(db):
+    assert db.calculate_range_totals('2025-03-01', '2025-03-31') == [
+        ('2025-03-01', 150.25, 120.15, 30.1),
+        ('2025-03-15', 0.0, -15.0, 15.0),
+        ('2025-03-31', 20.0, 20.0, 0.0),
+    ]
+    # حدود الفترة بأي صيغة، والأيام خارجها لا تدخل
+    assert db.calculate_range_totals('2025/03/31', '2025/04/01') == [
+        ('2025-03-31', 20.0, 20.0, 0.0),
+        ('2025-04-01', 999.0, 999.0, 0.0),
+    ]
+    assert db.calculate_range_totals('2025-05-01', '2025-05-31') == []
+    assert db.calculate_daily_totals('2025-03-01') == {
+        'total_collection': 150.25, 'remaining_profit': 120.15, 'total_expenses': 30.1}
+
+
+def test_saved_reports_range(db):
+    db.save_daily_report('2025/03/01', 10, 5, 5)
+    db.save_daily_report('2025-03-02', 1, 1, 0)
+    db.save_daily_report('2025-04-01', 2, 2, 0)
+    assert db.get_daily_reports_range('2025-03-01', '2025-03-31') == [
+        ('2025/03/01', 10.0, 5.0, 5.0),
+        ('2025-03-02', 1.0, 1.0, 0.0),
+    ]
+    assert db.get_daily_reports_range('2025-03-02', '2025-04-01') == [
+        ('2025-03-02', 1.0, 1.0, 0.0),
+        ('2025-04-01', 2.0, 2.0, 0.0),
+    ]
+
+
+def test_merge_counts_each_day_once(db):
+    db.save_daily_report('2025/03/01', 10, 5, 5)
+    db.save_daily_report('2025-03-02', 1, 1, 0)
+    rows = merge_daily_rows(db.get_daily_reports_range('2025-03-01', '2025-03-31'),
+                            db.calculate_range_totals('2025-03-01', '2025-03-31'))
+    # اليوم المحفوظ بالشرطة المائلة يأخذ المجاميع الحالية ولا يتكرر
+    assert rows == [
+        ('2025-03-01', 150.25, 120.15, 30.1),
+        ('2025-03-02', 1.0, 1.0, 0.0),
+        ('2025-03-15', 0.0, -15.0, 15.0),
+        ('2025-03-31', 20.0, 20.0, 0.0),
+    ]
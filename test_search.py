@@ -0,0 +1,67 @@
+"""
+اختبار فهرس البحث search_index
+
+التشغيل: python -m pytest -q test_search.py
+"""
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'search.db'))
+    yield database
+    database.close()
+
+
+def found(db, text, kind):
+    return [match.ref_id for match in db.search(text, kinds=(kind,))]
+
+
+@pytest.mark.parametrize('stored, typed', [
+    ('أحمد', 'احمد'),
+    ('إبراهيم', 'ابراهيم'),
+    ('فاطمة', 'فاطمه'),
+    ('مصطفى', 'مصطفي'),
+    ('محمّد', 'محمد'),
+])
+def test_spelling_variants(db, stored, typed):
+    db.add_seller_account(stored, 0, 0)
+    seller_id = db.get_seller_by_name(stored).id
+    assert found(db, typed, 'seller') == [seller_id]
+    assert found(db, stored, 'seller') == [seller_id]
+
+
+def test_triggers_keep_index_in_sync(db):
+    db.add_seller_account('فاطمة', 0, 0)
+    seller = db.get_seller_by_name('فاطمة')
+    db.add_seller_transaction(seller.id, 10, 'متبقي', 0, 0, 0, 'طماطم', '2025-01-01', '', '', 'نقلة')
+    assert found(db, 'طماطم', 'transaction') != []
+
+    db.update_seller_account(seller.id, 'زينب', 0, 0)
+    assert found(db, 'فاطمه', 'seller') == []
+    assert found(db, 'زينب', 'seller') == [seller.id]
+
+    # حذف البائع يحذف معاملاته (cascade) ومن الفهرس معها
+    db.delete_seller_account(seller.id)
+    assert db.search('زينب') == []
+    assert db.search('طماطم') == []
+
+    conn = db.get_connection()
+    conn.execute("INSERT INTO search_index (search_index) VALUES ('integrity-check')")
+
+
+def test_transfer_search_matches_client_or_seller(db):
+    db.add_agriculture_transfer('مصطفى', 'أحمد علي', 'خيار', 1, 1, 0, '', 'in')
+    db.add_agriculture_transfer('سعيد', 'خالد', 'خيار', 1, 1, 0, '', 'in')
+
+    assert [t.shipment_name for t in db.find_agriculture_transfers(transfer_type='in', search='مصطفي')] == ['مصطفى']
+    assert [t.seller_name for t in db.find_agriculture_transfers(transfer_type='in', search='احمد')] == ['أحمد علي']
+    # اسم الصنف ليس من أعمدة البحث في هذه الشاشة
+    assert db.find_agriculture_transfers(transfer_type='in', search='خيار') == []
+
+
+def test_empty_query(db):
+    assert db.search('  ') == []
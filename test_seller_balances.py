@@ -0,0 +1,129 @@
+"""
+اختبار ملخص أرصدة البائعين seller_balances (triggers الترحيل 6)
+
+بعد كل إضافة أو تعديل أو حذف أو نقل معاملة لبائع آخر يجب أن يساوي الملخص
+نفس المجاميع محسوبة من جديد من seller_transactions.
+
+التشغيل: python -m pytest -q test_seller_balances.py
+"""
+
+import pytest
+
+from database import Database
+
+# نفس تصنيف المعاملات في migrations.py، محسوباً مباشرة من المعاملات
+FRESH_SQL = '''
+    SELECT s.id,
+           COALESCE(SUM(CASE WHEN t.status != 'مدفوع' THEN t.amount END), 0),
+           COALESCE(SUM(CASE WHEN t.status = 'مدفوع' THEN t.amount END), 0),
+           COALESCE(SUM(CASE WHEN t.item_name LIKE '%سماح%' THEN t.amount END), 0),
+           MAX(CASE WHEN t.status = 'مدفوع' THEN t.date END),
+           MAX(t.date)
+    FROM sellers_accounts s
+    LEFT JOIN seller_transactions t ON t.seller_id = s.id
+    GROUP BY s.id
+    ORDER BY s.id
+'''
+
+SUMMARY_SQL = '''
+    SELECT s.id, COALESCE(b.total_goods, 0), COALESCE(b.total_paid, 0), COALESCE(b.total_allowance, 0),
+           b.last_payment_date, b.last_transaction_date
+    FROM sellers_accounts s
+    LEFT JOIN seller_balances b ON b.seller_id = s.id
+    ORDER BY s.id
+'''
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'balances.db'))
+    for name in ('أول', 'ثاني', 'ثالث'):
+        database.add_seller_account(name, 0, 0)
+    ids = [database.get_seller_by_name(name).id for name in ('أول', 'ثاني', 'ثالث')]
+    yield database, ids
+    database.close()
+
+
+def assert_balances_match(database):
+    conn = database.get_connection()
+    assert conn.execute(SUMMARY_SQL).fetchall() == conn.execute(FRESH_SQL).fetchall()
+
+
+def add(database, seller_id, amount, status, item, date):
+    database.add_seller_transaction(seller_id, amount, status, 1, 1, 1, item, date, '', '', '')
+    return database.get_connection().execute('SELECT MAX(id) FROM seller_transactions').fetchone()[0]
+
+
+def test_insert_update_delete(db):
+    database, (first, second, third) = db
+    goods = add(database, first, 100.5, 'متبقي', 'صنف', '2025-03-05')
+    paid = add(database, first, 40, 'مدفوع', 'نقدي', '2025-03-10')
+    allowance = add(database, first, 3, 'مدفوع', 'سماح', '2025-03-01')
+    add(database, second, 70, 'متبقي', 'صنف', '2025-02-01')
+    assert_balances_match(database)
+
+    # تغيير المبلغ ثم الحالة ثم الصنف
+    database.update_seller_transaction(goods, 120, 'متبقي', 1, 1, 1, 'صنف', '2025-03-05', '', '', '')
+    assert_balances_match(database)
+    database.update_seller_transaction(paid, 40, 'متبقي', 1, 1, 1, 'نقدي', '2025-03-10', '', '', '')
+    assert_balances_match(database)
+    database.update_seller_transaction(goods, 120, 'متبقي', 1, 1, 1, 'سماح إضافي', '2025-03-05', '', '', '')
+    assert_balances_match(database)
+
+    # تاريخ أقدم لآخر معاملة: آخر تاريخ يحسب من جديد
+    database.update_seller_transaction(paid, 40, 'مدفوع', 1, 1, 1, 'نقدي', '2025-01-01', '', '', '')
+    assert_balances_match(database)
+
+    database.delete_seller_transaction(allowance)
+    assert_balances_match(database)
+    database.delete_seller_transaction(paid)
+    assert_balances_match(database)
+
+
+def test_move_transaction_between_sellers(db):
+    database, (first, second, third) = db
+    moved = add(database, first, 50, 'مدفوع', 'نقدي', '2025-03-20')
+    add(database, first, 200, 'متبقي', 'صنف', '2025-03-01')
+    add(database, second, 30, 'متبقي', 'صنف', '2025-03-02')
+    conn = database.get_connection()
+
+    # نقل آخر دفعة للبائع الأول إلى الثاني: يتغير ملخص الاثنين وتواريخهما
+    conn.execute('UPDATE seller_transactions SET seller_id = ? WHERE id = ?', (second, moved))
+    conn.commit()
+    assert_balances_match(database)
+
+    # نقل مع تغيير المبلغ والحالة معاً، إلى بائع بدون ملخص سابق
+    conn.execute("UPDATE seller_transactions SET seller_id = ?, amount = 1500, status = 'متبقي' WHERE id = ?",
+                 (third, moved))
+    conn.commit()
+    assert_balances_match(database)
+
+    # نقل كل معاملات البائع الأول: يبقى ملخصه أصفاراً بدون تواريخ
+    conn.execute('UPDATE seller_transactions SET seller_id = ? WHERE seller_id = ?', (third, first))
+    conn.commit()
+    assert_balances_match(database)
+    assert conn.execute('SELECT last_transaction_date FROM seller_balances WHERE seller_id = ?',
+                        (first,)).fetchone()[0] is None
+
+
+def test_bulk_changes_and_rollback(db):
+    database, (first, second, third) = db
+    with database.transaction() as tx:
+        for day in range(1, 29):
+            tx.add_seller_transaction((first, second, third)[day % 3], day * 10, ('متبقي', 'مدفوع')[day % 2],
+                                      1, 1, 1, 'صنف' if day % 5 else 'سماح', f'2025-02-{day:02d}', '', '', '')
+    assert_balances_match(database)
+
+    conn = database.get_connection()
+    conn.execute("UPDATE seller_transactions SET amount = amount * 2 WHERE status = 'مدفوع'")
+    conn.execute("DELETE FROM seller_transactions WHERE date > '2025-02-20'")
+    conn.commit()
+    assert_balances_match(database)
+
+    before = conn.execute(SUMMARY_SQL).fetchall()
+    with pytest.raises(RuntimeError):
+        with database.transaction() as tx:
+            tx.add_seller_transaction(first, 999, 'مدفوع', 1, 1, 1, 'نقدي', '2025-12-31', '', '', '')
+            raise RuntimeError('تراجع')
+    assert conn.execute(SUMMARY_SQL).fetchall() == before
+    assert_balances_match(database)
@@ -0,0 +1,80 @@
+"""
+اختبار النسخة الكاملة من ملف قاعدة البيانات (DataSync.snapshot و restore_snapshot)
+
+التشغيل: python -m pytest -q test_snapshot.py
+"""
+
+import os
+
+import pytest
+
+import data_sync as data_sync_module
+from data_sync import DataSync
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # مجلد التصدير data_exports ينشأ في المجلد الحالي
+    monkeypatch.chdir(tmp_path)
+    database = Database(str(tmp_path / 'live.db'))
+    with database.transaction() as tx:
+        for i in range(2000):
+            tx.add_expense(f'مصروف {i}', i, '2025-01-01')
+    database.save_daily_report('2025-01-01', 100, 20, 30)
+    yield database
+    database.close()
+
+
+def dump(path):
+    database = Database(path)
+    conn = database.get_connection()
+    result = {table: conn.execute(f'SELECT * FROM {table} ORDER BY rowid').fetchall()
+              for table in ('expenses', 'daily_reports', 'changelog')}
+    database.close()
+    return result
+
+
+def test_snapshot_copies_every_table_with_progress(db, monkeypatch):
+    monkeypatch.setattr(data_sync_module, 'SNAPSHOT_PAGES', 4)
+    steps = []
+    path = DataSync(db.db_name).snapshot(progress=lambda copied, total: steps.append((copied, total)))
+
+    assert path.endswith('.db') and not os.path.exists(path + '.tmp')
+    assert len(steps) > 1 and steps[-1][0] == steps[-1][1]
+    # daily_reports ليس في جداول التصدير لكنه في النسخة الكاملة
+    assert dump(path) == dump(db.db_name)
+    assert dump(path)['daily_reports']
+    assert os.path.basename(path) in [backup['filename'] for backup in DataSync(db.db_name).list_backups()]
+
+
+def test_restore_swaps_database_file(db):
+    sync = DataSync(db.db_name)
+    path = sync.snapshot()
+    before = dump(db.db_name)
+    db.add_expense('بعد النسخة', 1, '2025-01-02')
+    after = dump(db.db_name)
+    db.close()
+
+    previous = sync.restore_snapshot(path)
+
+    assert dump(db.db_name) == before
+    assert dump(previous) == after
+    assert os.path.exists(path)
+
+
+def test_restore_rejects_bad_file(db, tmp_path):
+    bad = tmp_path / 'bad.db'
+    bad.write_bytes(b'not a database' * 100)
+    before = dump(db.db_name)
+    db.close()
+    with pytest.raises(ValueError):
+        DataSync(db.db_name).restore_snapshot(str(bad))
+    assert dump(db.db_name) == before
+    assert not os.path.exists(db.db_name + '.before_restore')
+
+
+def test_import_rejects_snapshot(db):
+    path = DataSync(db.db_name).snapshot()
+    with pytest.raises(ValueError):
+        DataSync(db.db_name).import_data(path)
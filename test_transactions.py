@@ -0,0 +1,84 @@
+"""
+اختبار كتل المعاملات Database.transaction() و Database._write()
+
+الكتلة الداخلية SAVEPOINT يتراجع وحده عند الخطأ، والخطأ في الكتلة الخارجية
+يلغي كل شيء، ودوال الكتابة داخل كتلة مفتوحة لا تحفظ قبل نهايتها.
+
+التشغيل: python -m pytest -q test_transactions.py
+"""
+
+import sqlite3
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / 'transactions.db'))
+    database.get_connection()
+    yield database
+    database.close()
+
+
+def committed(database, sql='SELECT description FROM expenses ORDER BY id'):
+    """ما تم حفظه فعلاً، من اتصال منفصل لا يرى التعديلات غير المحفوظة"""
+    conn = sqlite3.connect(database.db_name)
+    try:
+        return [row[0] for row in conn.execute(sql)]
+    finally:
+        conn.close()
+
+
+def test_inner_error_keeps_outer_work(db):
+    with db.transaction():
+        db.add_expense('خارجي', 10, '2025-03-01')
+        with pytest.raises(ValueError):
+            with db.transaction():
+                db.add_expense('داخلي', 20, '2025-03-01')
+                raise ValueError('فشل داخلي')
+        db.add_expense('بعد الخطأ', 30, '2025-03-02')
+    assert committed(db) == ['خارجي', 'بعد الخطأ']
+
+
+def test_outer_error_rolls_back_everything(db):
+    db.add_expense('سابق', 5, '2025-02-28')
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.add_expense('خارجي', 10, '2025-03-01')
+            # كتلة داخلية انتهت بنجاح لا تحفظ إذا فشلت الخارجية
+            with db.transaction():
+                db.add_expense('داخلي', 20, '2025-03-01')
+            raise RuntimeError('فشل خارجي')
+    assert committed(db) == ['سابق']
+
+    # المستوى عاد للصفر: الكتابة التالية تحفظ فوراً
+    assert not db.get_connection().in_transaction
+    db.add_expense('لاحق', 7, '2025-03-03')
+    assert committed(db) == ['سابق', 'لاحق']
+
+
+def test_write_joins_open_transaction(db):
+    with db.transaction():
+        db.add_expense('أول', 10, '2025-03-01')
+        db.add_expense('ثاني', 20, '2025-03-02')
+        assert db.get_connection().in_transaction
+        assert committed(db) == []
+    assert committed(db) == ['أول', 'ثاني']
+
+    with pytest.raises(KeyError):
+        with db.transaction():
+            db.add_expense('ثالث', 30, '2025-03-03')
+            raise KeyError('إلغاء')
+    assert committed(db) == ['أول', 'ثاني']
+
+
+def test_failed_write_inside_transaction(db):
+    items = 'SELECT name FROM inventory_items ORDER BY id'
+    with db.transaction():
+        assert db.add_inventory_item('صندوق', 5)
+        # الاسم مكرر: يتراجع _write عن عمليته فقط وتبقى المعاملة الخارجية سليمة
+        assert not db.add_inventory_item('صندوق', 9)
+        assert db.add_inventory_item('شبكة', 2)
+    assert committed(db, items) == ['صندوق', 'شبكة']
@@ -0,0 +1,53 @@
+"""
+توحيد النص العربي للبحث
+
+نفس الاسم يكتب بأكثر من شكل (أحمد / احمد، فاطمة / فاطمه، مصطفى / مصطفي).
+الدالة normalize_arabic تحول كل الأشكال إلى شكل واحد، وتسجل في كل اتصال
+بقاعدة البيانات باسم arabic_normalize حتى تستخدمها الـ triggers التي تملأ
+فهرس البحث search_index (انظر migrations.py).
+
+نفس الدالة تطبق على نص البحث، لذلك "احمد" يجد "أحمد" والعكس.
+"""
+
+import re
+
+# رقم كل نوع في فهرس البحث: rowid = ref_id * SEARCH_KIND_SLOTS + رقم النوع
+SEARCH_KINDS = {
+    'seller': 1,        # sellers_accounts.seller_name
+    'client': 2,        # clients_accounts.client_name
+    'meal': 3,          # meals.name
+    'transfer': 4,      # agriculture_transfers: العميل والبائع والصنف
+    'transaction': 5,   # seller_transactions: الصنف والملاحظات
+}
+SEARCH_KIND_SLOTS = 8
+
+_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ة': 'ه',
+    'ى': 'ي',
+})
+
+# التشكيل (فتحة، ضمة، كسرة، شدة، سكون...) والتطويل
+_MARKS = re.compile('[\u064B-\u0652\u0670\u0640]')
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize_arabic(text):
+    """توحيد أشكال الحروف وحذف التشكيل والتطويل وتحويل الحروف اللاتينية لصغيرة"""
+    if text is None:
+        return ''
+    return _MARKS.sub('', str(text)).translate(_LETTERS).lower()
+
+
+def build_match_query(text):
+    """
+    تحويل نص البحث إلى تعبير MATCH لـ FTS5
+
+    كل كلمة تطابق بدايات الكلمات ("احم" يجد "أحمد")، وكل الكلمات مطلوبة.
+    يرجع None إذا لم يحتو النص على كلمات.
+    """
+    words = _WORD.findall(normalize_arabic(text))
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)